@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark for X9k3Segmenter.inject_scte35_markers
+Times marker placement on large generated playlists against the old replace-per-marker approach
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import generate_markers, generate_playlist, load_script
+
+
+def legacy_inject(m3u8_file, markers, output_file):
+    """The previous implementation: one full-playlist replace per marker"""
+    with open(m3u8_file, 'r') as f:
+        content = f.read()
+    for marker in markers:
+        content = content.replace('#EXTINF:', f'#EXT-X-SCTE35:{marker["data"]}\n' + '#EXTINF:')
+    with open(output_file, 'w') as f:
+        f.write(content)
+
+
+def run(segments, markers, legacy):
+    segmenter = load_script('x9k3-segmenter').X9k3Segmenter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        playlist = Path(tmp) / 'bench.m3u8'
+        generate_playlist(playlist, segments)
+        marker_list = generate_markers(markers, segments * 6.0)
+
+        started = time.perf_counter()
+        segmenter.inject_scte35_markers(str(playlist), marker_list, str(Path(tmp) / 'out.m3u8'))
+        elapsed = time.perf_counter() - started
+        print(f"inject_scte35_markers: {segments} segments, {markers} markers: {elapsed * 1000:.1f} ms")
+
+        if legacy:
+            started = time.perf_counter()
+            legacy_inject(playlist, marker_list, Path(tmp) / 'legacy.m3u8')
+            legacy_elapsed = time.perf_counter() - started
+            print(f"legacy replace-per-marker: {segments} segments, {markers} markers: {legacy_elapsed * 1000:.1f} ms "
+                  f"({legacy_elapsed / elapsed:.0f}x slower)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SCTE-35 marker injection')
+    parser.add_argument('--segments', type=int, default=10000, help='Segments in the generated playlist')
+    parser.add_argument('--markers', type=int, default=1000, help='Markers to inject')
+    parser.add_argument('--legacy', action='store_true', help='Also time the old approach (quadratic, use small sizes)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    run(args.segments, args.markers, args.legacy)
+
+
+if __name__ == '__main__':
+    main()
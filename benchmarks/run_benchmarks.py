@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+SCTE-35 Tool Benchmark Suite
+Times the script hot paths at several input sizes on locally generated data, writes the
+results as JSON and compares them against a stored baseline
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from synthetic import (
+    generate_ad_breaks,
+    generate_markers,
+    generate_playlist,
+    generate_ts,
+    load_script,
+    splice_insert_section
+)
+
+SIZES = ('small', 'medium', 'large')
+
+
+def bench_parse_mpegts(tmp, size):
+    packets, cues = {'small': (20000, 20), 'medium': (200000, 200), 'large': (1000000, 1000)}[size]
+    path = tmp / f'parse_{size}.ts'
+    generate_ts(path, packets, cues)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    return (lambda: tools.parse_scte35_from_mpegts(str(path))), packets, 'packets'
+
+
+def bench_scan_mpegts(tmp, size):
+    packets, cues = {'small': (20000, 20), 'medium': (200000, 200), 'large': (1000000, 1000)}[size]
+    path = tmp / f'scan_{size}.ts'
+    generate_ts(path, packets, cues)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    return (lambda: tools.scan_scte35_from_mpegts(str(path))), packets, 'packets'
+
+
+def bench_inject_scte35_into_hls(tmp, size):
+    import threefive
+
+    segments, cues = {'small': (1000, 10), 'medium': (10000, 100), 'large': (100000, 1000)}[size]
+    playlist = tmp / f'inject_hls_{size}.m3u8'
+    generate_playlist(playlist, segments)
+    step = segments * 6.0 / (cues + 1)
+    scte35_cues = []
+    for i in range(cues):
+        cue = threefive.Cue(splice_insert_section(i + 1, step * (i + 1)))
+        cue.decode()
+        scte35_cues.append(cue)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    output = str(tmp / f'inject_hls_{size}_out.m3u8')
+    return (lambda: tools.inject_scte35_into_hls(str(playlist), scte35_cues, output)), segments, 'segments'
+
+
+def bench_inject_scte35_markers(tmp, size):
+    segments, markers = {'small': (1000, 100), 'medium': (10000, 1000), 'large': (100000, 10000)}[size]
+    playlist = tmp / f'inject_markers_{size}.m3u8'
+    generate_playlist(playlist, segments)
+    marker_list = generate_markers(markers, segments * 6.0)
+    segmenter = load_script('x9k3-segmenter').X9k3Segmenter()
+    output = str(tmp / f'inject_markers_{size}_out.m3u8')
+    return (lambda: segmenter.inject_scte35_markers(str(playlist), marker_list, output)), segments, 'segments'
+
+
+def bench_generate_scte35_markers(tmp, size):
+    count = {'small': 1000, 'medium': 10000, 'large': 100000}[size]
+    ad_breaks = generate_ad_breaks(count)
+    segmenter = load_script('x9k3-segmenter').X9k3Segmenter()
+    return (lambda: segmenter.generate_scte35_markers(ad_breaks)), count, 'ad breaks'
+
+
+def bench_schedule_ad_breaks(tmp, size):
+    count = {'small': 1000, 'medium': 10000, 'large': 100000}[size]
+    ad_breaks = generate_ad_breaks(count)
+    generator = load_script('adbreak-generator').AdBreakGenerator()
+    return (lambda: generator.schedule_ad_breaks(ad_breaks)), count, 'ad breaks'
+
+
+def bench_validate_ad_breaks(tmp, size):
+    count = {'small': 1000, 'medium': 10000, 'large': 100000}[size]
+    ad_breaks = generate_ad_breaks(count)
+    generator = load_script('adbreak-generator').AdBreakGenerator()
+    return (lambda: generator.validate_ad_breaks(ad_breaks)), count, 'ad breaks'
+
+
+BENCHMARKS = {
+    'parse_scte35_from_mpegts': bench_parse_mpegts,
+    'scan_scte35_from_mpegts': bench_scan_mpegts,
+    'inject_scte35_into_hls': bench_inject_scte35_into_hls,
+    'inject_scte35_markers': bench_inject_scte35_markers,
+    'generate_scte35_markers': bench_generate_scte35_markers,
+    'schedule_ad_breaks': bench_schedule_ad_breaks,
+    'validate_ad_breaks': bench_validate_ad_breaks
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=Path(__file__).parent
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_case(name, size, repeat, tmp):
+    """Set up one benchmark and time it repeat times; failures are recorded, not raised"""
+    # Some library paths print every cue; keep the report readable
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        return _run_case(name, size, repeat, tmp)
+
+
+def _run_case(name, size, repeat, tmp):
+    try:
+        func, items, unit = BENCHMARKS[name](tmp, size)
+        func()  # warm-up: imports, template caches, page cache
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+    median = statistics.median(timings)
+    return {
+        'items': items,
+        'unit': unit,
+        'repeat': repeat,
+        'min': min(timings),
+        'median': median,
+        'max': max(timings),
+        'items_per_sec': items / median if median > 0 else None
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return (name, size, baseline_median, median, ratio) for every case slower than the threshold"""
+    regressions = []
+    for name, sizes in results['results'].items():
+        for size, result in sizes.items():
+            base = baseline.get('results', {}).get(name, {}).get(size)
+            if not base or 'median' not in base or 'median' not in result:
+                continue
+            ratio = result['median'] / base['median']
+            result['baseline_median'] = base['median']
+            result['ratio'] = ratio
+            if ratio > 1 + threshold:
+                regressions.append((name, size, base['median'], result['median'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SCTE-35 tool hot paths')
+    parser.add_argument('--bench', nargs='+', choices=sorted(BENCHMARKS), help='Benchmarks to run (default: all)')
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=['small', 'medium'], help='Input sizes to run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case (the median is reported)')
+    parser.add_argument('--output', default=str(Path(__file__).parent / 'results.json'), help='Results JSON file')
+    parser.add_argument('--baseline', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed slowdown against the baseline (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': {}
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.bench or list(BENCHMARKS):
+            for size in args.sizes:
+                result = run_case(name, size, args.repeat, Path(tmp))
+                results['results'].setdefault(name, {})[size] = result
+                if 'error' in result:
+                    print(f"{name:28} {size:7} skipped: {result['error']}")
+                else:
+                    print(f"{name:28} {size:7} {result['median'] * 1000:10.2f} ms  "
+                          f"{result['items_per_sec']:14,.0f} {result['unit']}/s")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, size, base, median, ratio in regressions:
+            print(f"REGRESSION {name} {size}: {base * 1000:.2f} ms -> {median * 1000:.2f} ms ({ratio:.2f}x)")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results: {args.output}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
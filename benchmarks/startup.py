@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+SCTE-35 Script Startup Benchmark
+Times cold starts of each script command, checks their `-X importtime` totals against a
+budget and that no command imports a heavy library it does not use, and times repeated
+in-process calls through scripts/toolkit.py
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from synthetic import SCRIPTS_DIR, generate_ad_breaks
+
+# Cumulative import time budget per command, in milliseconds, as reported by -X importtime.
+# Validating a JSON schedule builds the columnar table, so it is the one that pays for numpy
+IMPORT_BUDGET_MS = {
+    'tools_help': 150,
+    'tools_sidecar': 150,
+    'segmenter_help': 150,
+    'generator_validate': 250,
+    'generator_validate_ndjson': 150,
+    'analyzer_help': 150
+}
+
+# Libraries each command must not import at all
+FORBIDDEN = {
+    'tools_help': ('threefive', 'm3ufu', 'numpy', 'urllib.request'),
+    'tools_sidecar': ('threefive', 'm3ufu', 'urllib.request'),
+    'segmenter_help': ('x9k3', 'threefive'),
+    'generator_validate': ('threefive', 'adbreak3', 'asyncio'),
+    'generator_validate_ndjson': ('threefive', 'adbreak3', 'asyncio', 'numpy'),
+    'analyzer_help': ('x9k3', 'threefive', 'numpy', 'asyncio', 'http.server')
+}
+
+
+# Runs a script and reports the modules actually loaded at exit; modules from
+# lazy_imports.lazy_import that were never touched are left out
+LOADED_PROBE = '''
+import atexit, json, runpy, sys
+def report():
+    loaded = [name for name, module in list(sys.modules.items()) if type(module).__name__ != '_LazyModule']
+    sys.stderr.write('LOADED ' + json.dumps(loaded) + '\\n')
+atexit.register(report)
+sys.argv = sys.argv[1:]
+sys.path.insert(0, sys.argv[0].rsplit('/', 1)[0])
+runpy.run_path(sys.argv[0], run_name='__main__')
+'''
+
+
+def commands(tmp):
+    """Command name -> argv (after the interpreter) for every case"""
+    ad_breaks = generate_ad_breaks(100)
+    schedule = tmp / 'schedule.json'
+    with open(schedule, 'w') as f:
+        json.dump(ad_breaks, f, default=str)
+    ndjson = tmp / 'schedule.ndjson'
+    with open(ndjson, 'w') as f:
+        for ad_break in ad_breaks:
+            f.write(json.dumps(ad_break, default=str) + '\n')
+
+    return {
+        'tools_help': [str(SCRIPTS_DIR / 'scte35-tools.py'), '--help'],
+        'tools_sidecar': [str(SCRIPTS_DIR / 'scte35-tools.py'), 'sidecar', str(ndjson), '--output', str(tmp / 'sidecar.json')],
+        'segmenter_help': [str(SCRIPTS_DIR / 'x9k3-segmenter.py'), '--help'],
+        'generator_validate': [str(SCRIPTS_DIR / 'adbreak-generator.py'), 'validate', str(schedule)],
+        'generator_validate_ndjson': [str(SCRIPTS_DIR / 'adbreak-generator.py'), 'validate', str(ndjson)],
+        'analyzer_help': [str(SCRIPTS_DIR / 'scte35-analyzer.py'), '--help']
+    }
+
+
+def parse_importtime(stderr):
+    """Return (total_us, {module: cumulative_us}) for the top-level imports in -X importtime output
+
+    Nested imports are already included in their parent's cumulative time. A lazily
+    loaded package does not appear itself, but its submodules do, at the top level.
+    """
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if len(name) - len(name.lstrip()) == 1:
+            top_level[name.strip()] = top_level.get(name.strip(), 0) + int(cumulative)
+    return sum(top_level.values()), top_level
+
+
+def time_command(argv, repeat):
+    """Run argv repeat times and return (wall_times, importtime_stderr, returncode)"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    walls = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+        walls.append(time.perf_counter() - started)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env
+    )
+    return walls, result.stderr, result.returncode
+
+
+def loaded_modules(argv):
+    """Names of the modules argv has actually loaded by the time it exits"""
+    result = subprocess.run(
+        [sys.executable, '-c', LOADED_PROBE] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    for line in result.stderr.splitlines():
+        if line.startswith('LOADED '):
+            return set(json.loads(line[len('LOADED '):]))
+    return set()
+
+
+def bench_in_process(tmp, repeat):
+    """Median latency of validate + schedule through the importable toolkit, after the first call"""
+    sys.path.insert(0, str(SCRIPTS_DIR))
+    import toolkit
+
+    logging.disable(logging.CRITICAL)
+
+    ad_breaks = generate_ad_breaks(100)
+    started = time.perf_counter()
+    generator = toolkit.AdBreakGenerator()
+    generator.validate_ad_breaks(ad_breaks)
+    first = time.perf_counter() - started
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        generator.validate_ad_breaks(ad_breaks)
+        generator.schedule_ad_breaks(ad_breaks)
+        timings.append(time.perf_counter() - started)
+    return {'first_call': first, 'median': statistics.median(timings), 'max': max(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SCTE-35 script startup and import cost')
+    parser.add_argument('--command', nargs='+', choices=sorted(IMPORT_BUDGET_MS), help='Commands to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='Cold starts per command (the median is reported)')
+    parser.add_argument('--top', type=int, default=5, help='Heaviest imports to list per command')
+    parser.add_argument('--output', default=str(Path(__file__).parent / 'startup.json'), help='Results JSON file')
+    args = parser.parse_args()
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'commands': {}
+    }
+    failures = []
+
+    baseline, _, _ = time_command(['-c', 'pass'], args.repeat)
+    results['interpreter_median'] = statistics.median(baseline)
+    print(f"{'interpreter':26} {results['interpreter_median'] * 1000:8.1f} ms wall")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        argvs = commands(tmp)
+        for name in args.command or list(IMPORT_BUDGET_MS):
+            walls, stderr, returncode = time_command(argvs[name], args.repeat)
+            import_us, modules = parse_importtime(stderr)
+            heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            loaded = loaded_modules(argvs[name])
+            forbidden = [module for module in FORBIDDEN.get(name, ()) if module in loaded]
+            budget = IMPORT_BUDGET_MS[name]
+
+            result = {
+                'wall_median': statistics.median(walls),
+                'wall_min': min(walls),
+                'import_ms': import_us / 1000,
+                'import_budget_ms': budget,
+                'heaviest_imports_ms': {module: us / 1000 for module, us in heaviest},
+                'forbidden_imports': forbidden,
+                'returncode': returncode
+            }
+            results['commands'][name] = result
+            print(f"{name:26} {result['wall_median'] * 1000:8.1f} ms wall  {result['import_ms']:7.1f} ms imports "
+                  f"(budget {budget})  " + ' '.join(f'{module}:{ms:.0f}' for module, ms in result['heaviest_imports_ms'].items()))
+
+            if returncode != 0:
+                failures.append(f"{name}: exited with {returncode}")
+            if result['import_ms'] > budget:
+                failures.append(f"{name}: imports took {result['import_ms']:.1f} ms, budget {budget} ms")
+            if forbidden:
+                failures.append(f"{name}: imported {', '.join(forbidden)}")
+
+        try:
+            results['in_process'] = bench_in_process(tmp, args.repeat)
+            print(f"{'in-process validate+schedule':26} {results['in_process']['median'] * 1000:8.1f} ms "
+                  f"(first call {results['in_process']['first_call'] * 1000:.1f} ms)")
+        except Exception as e:
+            results['in_process'] = {'error': f'{type(e).__name__}: {e}'}
+            print(f"in-process skipped: {results['in_process']['error']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results: {args.output}")
+
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Synthetic Benchmark Inputs
+Locally generated MPEG-TS files, HLS playlists and ad-break schedules for the benchmarks
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+
+TS_PACKET_SIZE = 188
+VIDEO_PID = 0x100
+SCTE35_PID = 0x1F4
+PMT_PID = 0x1000
+
+# splice_insert with event id 7, PTS 12.5 s, 30 s auto-return break; event id, PTS and CRC are patched per cue
+SPLICE_INSERT_TEMPLATE = bytes.fromhex('fc302500000000000000fff01405000000077feffe00112a88fe002932e0000001010000c8c31e6a')
+
+
+def load_script(name):
+    """Import one of the hyphenated scripts under scripts/ as a module"""
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), SCRIPTS_DIR / f'{name}.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def splice_insert_section(splice_event_id, pts_time):
+    """Return a splice_insert section for one break without going through threefive"""
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+    from cue_encoder import SPLICE_INSERT_EVENT_ID_OFFSET, SPLICE_INSERT_PTS_OFFSET, _patch_pts, crc32_mpeg2
+
+    data = bytearray(SPLICE_INSERT_TEMPLATE)
+    data[SPLICE_INSERT_EVENT_ID_OFFSET:SPLICE_INSERT_EVENT_ID_OFFSET + 4] = splice_event_id.to_bytes(4, 'big')
+    _patch_pts(data, SPLICE_INSERT_PTS_OFFSET, pts_time)
+    data[-4:] = crc32_mpeg2(data[:-4]).to_bytes(4, 'big')
+    return bytes(data)
+
+
+def _packet(pid, payload, continuity_counter, payload_unit_start=False):
+    header = bytes([
+        0x47,
+        (0x40 if payload_unit_start else 0) | (pid >> 8),
+        pid & 0xFF,
+        0x10 | (continuity_counter & 0x0F)
+    ])
+    return header + payload[:184] + b'\xff' * (184 - len(payload[:184]))
+
+
+def _psi_section(table_id, table_id_extension, body):
+    """Wrap a PSI body in a section header (CRC left as zeros; scanners do not check it)"""
+    length = 5 + len(body) + 4
+    return bytes([
+        table_id, 0xB0 | (length >> 8), length & 0xFF,
+        table_id_extension >> 8, table_id_extension & 0xFF, 0xC1, 0x00, 0x00
+    ]) + body + b'\x00\x00\x00\x00'
+
+
+def generate_ts(path, packets, cues, psi_interval=1000):
+    """Write a TS file with one H.264 and one SCTE-35 PID and evenly spaced cues
+
+    Returns the splice times (seconds) of the cues written.
+    """
+    pat = _psi_section(0x00, 1, bytes([0x00, 0x01, 0xE0 | (PMT_PID >> 8), PMT_PID & 0xFF]))
+    streams = bytes([
+        0x1B, 0xE0 | (VIDEO_PID >> 8), VIDEO_PID & 0xFF, 0xF0, 0x00,
+        0x86, 0xE0 | (SCTE35_PID >> 8), SCTE35_PID & 0xFF, 0xF0, 0x00
+    ])
+    pmt = _psi_section(0x02, 1, bytes([0xE0 | (VIDEO_PID >> 8), VIDEO_PID & 0xFF, 0xF0, 0x00]) + streams)
+    filler = b'\x00' * 184
+    cue_every = max(1, packets // (cues + 1))
+    counters = {}
+    splice_times = []
+
+    def write(f, pid, payload, start=False):
+        counter = counters.get(pid, 0)
+        counters[pid] = counter + 1
+        f.write(_packet(pid, payload, counter, start))
+
+    with open(path, 'wb') as f:
+        for i in range(packets):
+            if i % psi_interval == 0:
+                write(f, 0x0000, b'\x00' + pat, True)
+                write(f, PMT_PID, b'\x00' + pmt, True)
+            if i % cue_every == cue_every - 1 and len(splice_times) < cues:
+                splice_time = 10.0 + len(splice_times) * 60.0
+                write(f, SCTE35_PID, b'\x00' + splice_insert_section(len(splice_times) + 1, splice_time), True)
+                splice_times.append(splice_time)
+            write(f, VIDEO_PID, filler)
+    return splice_times
+
+
+def generate_playlist(path, segments, segment_duration=6.0, program_date_time=None):
+    """Write a VOD media playlist with the given number of segments"""
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{int(segment_duration)}', '#EXT-X-MEDIA-SEQUENCE:0']
+    if program_date_time is not None:
+        lines.append(f'#EXT-X-PROGRAM-DATE-TIME:{program_date_time.isoformat()}')
+    for i in range(segments):
+        lines.append(f'#EXTINF:{segment_duration:.3f},')
+        lines.append(f'segment_{i:06d}.ts')
+    lines.append('#EXT-X-ENDLIST')
+    Path(path).write_text('\n'.join(lines) + '\n')
+
+
+def generate_markers(count, total_duration):
+    """Spread markers evenly over the playlist duration"""
+    step = total_duration / (count + 1)
+    return [
+        {'id': f'ad{i}', 'scheduled_time': step * (i + 1), 'duration': 30, 'data': SPLICE_INSERT_TEMPLATE.hex()}
+        for i in range(count)
+    ]
+
+
+def generate_ad_breaks(count, start=None, spacing=600):
+    """Ad-break schedule entries in the adbreak-generator input format"""
+    start = start or datetime.now(timezone.utc).replace(microsecond=0) + timedelta(hours=1)
+    return [
+        {
+            'id': f'ad{i + 1}',
+            'name': f'Break {i + 1}',
+            'scheduled_time': (start + timedelta(seconds=i * spacing)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'duration': 30 + (i % 4) * 15,
+            'ad_id': f'creative-{i % 50}',
+            'pts_time': 10.0 + i * spacing
+        }
+        for i in range(count)
+    ]
+
+
+def write_ad_breaks(path, count, start=None, spacing=600):
+    """Write a generated schedule as JSON, NDJSON or CSV, chosen by the file suffix"""
+    ad_breaks = generate_ad_breaks(count, start, spacing)
+    suffix = Path(path).suffix.lower()
+    with open(path, 'w', newline='' if suffix == '.csv' else None) as f:
+        if suffix == '.csv':
+            writer = csv.DictWriter(f, fieldnames=list(ad_breaks[0]) if ad_breaks else ['id'])
+            writer.writeheader()
+            writer.writerows(ad_breaks)
+        elif suffix in ('.ndjson', '.jsonl'):
+            for ad_break in ad_breaks:
+                f.write(json.dumps(ad_break) + '\n')
+        else:
+            json.dump({'ad_breaks': ad_breaks}, f, indent=2)
+    return len(ad_breaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic benchmark inputs')
+    subparsers = parser.add_subparsers(dest='command')
+
+    schedule_parser = subparsers.add_parser('schedule', help='Write an ad-break schedule (.json, .ndjson or .csv)')
+    schedule_parser.add_argument('output', help='Output file; the suffix picks the format')
+    schedule_parser.add_argument('--count', type=int, default=100000, help='Ad breaks to generate')
+    schedule_parser.add_argument('--spacing', type=int, default=600, help='Seconds between breaks')
+
+    playlist_parser = subparsers.add_parser('playlist', help='Write a VOD media playlist')
+    playlist_parser.add_argument('output', help='Output .m3u8 file')
+    playlist_parser.add_argument('--segments', type=int, default=10000, help='Segments in the playlist')
+
+    ts_parser = subparsers.add_parser('ts', help='Write an MPEG-TS file with SCTE-35 cues')
+    ts_parser.add_argument('output', help='Output .ts file')
+    ts_parser.add_argument('--packets', type=int, default=200000, help='TS packets to write')
+    ts_parser.add_argument('--cues', type=int, default=100, help='SCTE-35 cues to insert')
+
+    args = parser.parse_args()
+
+    if args.command == 'schedule':
+        count = write_ad_breaks(args.output, args.count, spacing=args.spacing)
+        print(f"Wrote {count} ad breaks to {args.output}")
+    elif args.command == 'playlist':
+        generate_playlist(args.output, args.segments)
+        print(f"Wrote {args.segments} segments to {args.output}")
+    elif args.command == 'ts':
+        cues = generate_ts(args.output, args.packets, args.cues)
+        print(f"Wrote {args.packets} packets with {len(cues)} cues to {args.output}")
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
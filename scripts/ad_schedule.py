@@ -0,0 +1,505 @@
+"""
+Columnar Ad-Break Schedule
+Ad breaks held as NumPy columns (start epoch, duration, event id) with interned string
+tables, validated with vectorized masks and scheduled with one comparison and argsort
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from datetime import timezone
+from lazy_imports import lazy_import
+from schedule_time import ScheduledTimeParser
+
+# Loaded when the first table is built; the streaming stages never touch it
+np = lazy_import('numpy')
+
+REQUIRED_FIELDS = ('id', 'scheduled_time', 'duration', 'ad_id')
+
+DEFAULT_PROVIDER_ID = '0x1'
+DEFAULT_PROVIDER_NAME = 'YourProvider'
+
+# Breaks shorter than one segment cannot be placed on a segment boundary (x9k3 default)
+DEFAULT_SEGMENT_DURATION = 6.0
+
+
+class StringTable:
+    """Interned strings: each distinct value is stored once and rows hold int32 codes"""
+
+    def __init__(self):
+        self._codes = {}
+        self.values = []
+
+    def encode(self, values):
+        """Return the int32 codes for a column of values, interning new ones"""
+        codes = self._codes
+        for value in dict.fromkeys(values):
+            if value not in codes:
+                codes[value] = len(self.values)
+                self.values.append(value)
+        return np.fromiter(map(codes.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+
+def event_id_for(ad_break_id):
+    """splice_event_id for an ad break id such as 'ad12', or -1 if it has no numeric part"""
+    try:
+        return int(str(ad_break_id).replace('ad', ''))
+    except ValueError:
+        return -1
+
+
+def parse_epochs(values, parser):
+    """Parse scheduled times to float64 epoch seconds; unparseable entries become NaN
+
+    A schedule of UTC 'Z' timestamps is parsed in one NumPy call. Anything else (offsets,
+    naive local times, relative seconds, datetimes) goes through the ScheduledTimeParser.
+    """
+    if values and all(type(value) is str and value[-1:] == 'Z' for value in values):
+        try:
+            moments = np.array([value[:-1] for value in values], dtype='datetime64[us]')
+            return moments.astype(np.int64) / 1e6
+        except ValueError:
+            pass
+
+    epochs = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            epochs[i] = parser.parse(value).timestamp()
+        except (ValueError, TypeError, OverflowError):
+            epochs[i] = np.nan
+    return epochs
+
+
+class AdBreakTable:
+    """Ad-break schedule in columnar form
+
+    start (epoch seconds, NaN when unparseable), duration, event_id and pts_time (NaN when
+    absent) are NumPy columns; ad_id, provider_id, provider_name, channel and cue_type (the
+    break's 'type') are int32 codes into a shared StringTable. ids and names are mostly
+    unique, so they stay plain lists.
+    """
+
+    def __init__(self, ids, start, duration, event_id, ad_id, provider_id, provider_name, name, strings,
+                 missing=None, time_errors=None, channel=None, pts_time=None, cue_type=None):
+        self.ids = ids
+        self.start = start
+        self.duration = duration
+        self.event_id = event_id
+        self.ad_id = ad_id
+        self.provider_id = provider_id
+        self.provider_name = provider_name
+        self.name = name
+        self.strings = strings
+        self.missing = missing if missing is not None else {}
+        self.time_errors = time_errors if time_errors is not None else {}
+        if channel is None:
+            channel = np.full(len(ids), strings.encode([None])[0], dtype=np.int32)
+        self.channel = channel
+        self.pts_time = pts_time if pts_time is not None else np.full(len(ids), np.nan)
+        if cue_type is None:
+            cue_type = np.full(len(ids), strings.encode([None])[0], dtype=np.int32)
+        self.cue_type = cue_type
+
+    @classmethod
+    def from_records(cls, ad_breaks, parser=None):
+        """Load ad-break dicts column by column"""
+        parser = parser or ScheduledTimeParser()
+        if not isinstance(ad_breaks, list):
+            ad_breaks = list(ad_breaks)
+        count = len(ad_breaks)
+        required = frozenset(REQUIRED_FIELDS)
+        incomplete = [i for i, ad_break in enumerate(ad_breaks) if not required <= ad_break.keys()]
+        missing = {
+            field: np.array([i for i in incomplete if field not in ad_breaks[i]], dtype=np.int64)
+            for field in REQUIRED_FIELDS
+        }
+
+        ids = [ad_break.get('id') for ad_break in ad_breaks]
+        explicit_ids = [ad_break.get('splice_event_id') for ad_break in ad_breaks]
+        try:
+            # Common case: no explicit splice_event_id and ids of the form 'ad<number>'
+            if any(explicit is not None for explicit in explicit_ids):
+                raise ValueError('explicit splice_event_id')
+            event_ids = [int(ad_break_id[2:]) if ad_break_id[:2] == 'ad' else int(ad_break_id) for ad_break_id in ids]
+        except (ValueError, TypeError):
+            event_ids = [
+                explicit if explicit is not None else event_id_for(ad_break_id)
+                for explicit, ad_break_id in zip(explicit_ids, ids)
+            ]
+
+        durations = [ad_break.get('duration') for ad_break in ad_breaks]
+        try:
+            duration = np.array(durations, dtype=np.float64)
+        except (ValueError, TypeError):
+            duration = np.array([
+                value if isinstance(value, (int, float)) else math.nan for value in durations
+            ], dtype=np.float64)
+
+        pts_time = np.array([
+            value if isinstance(value, (int, float)) else math.nan
+            for value in (ad_break.get('pts_time') for ad_break in ad_breaks)
+        ], dtype=np.float64)
+
+        has_time = np.ones(count, dtype=bool)
+        has_time[missing['scheduled_time']] = False
+        start = np.full(count, np.nan)
+        if has_time.all():
+            start = parse_epochs([ad_break['scheduled_time'] for ad_break in ad_breaks], parser)
+        elif has_time.any():
+            start[has_time] = parse_epochs([ad_breaks[i]['scheduled_time'] for i in np.flatnonzero(has_time)], parser)
+
+        # Re-parse only the failures, to report why each one was rejected
+        time_errors = {}
+        for i in np.flatnonzero(has_time & np.isnan(start)).tolist():
+            try:
+                parser.parse(ad_breaks[i]['scheduled_time'])
+                time_errors[i] = 'out of range'
+            except Exception as e:
+                time_errors[i] = str(e)
+
+        strings = StringTable()
+        return cls(
+            ids,
+            start,
+            duration,
+            np.array(event_ids, dtype=np.int64),
+            strings.encode([ad_break.get('ad_id') for ad_break in ad_breaks]),
+            strings.encode([ad_break.get('provider_id', DEFAULT_PROVIDER_ID) for ad_break in ad_breaks]),
+            strings.encode([ad_break.get('provider_name', DEFAULT_PROVIDER_NAME) for ad_break in ad_breaks]),
+            [ad_break.get('name') for ad_break in ad_breaks],
+            strings,
+            missing,
+            time_errors,
+            strings.encode([ad_break.get('channel') for ad_break in ad_breaks]),
+            pts_time,
+            strings.encode([ad_break.get('type') for ad_break in ad_breaks])
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, rows):
+        """New table with the given rows, in that order"""
+        ids, names, indices = self.ids, self.name, rows.tolist()
+        return AdBreakTable(
+            [ids[i] for i in indices],
+            self.start[rows],
+            self.duration[rows],
+            self.event_id[rows],
+            self.ad_id[rows],
+            self.provider_id[rows],
+            self.provider_name[rows],
+            [names[i] for i in indices],
+            self.strings,
+            channel=self.channel[rows],
+            pts_time=self.pts_time[rows],
+            cue_type=self.cue_type[rows]
+        )
+
+    def validate(self):
+        """Return error messages from vectorized checks, in row order"""
+        errors = []
+        for field in REQUIRED_FIELDS:
+            errors.extend((int(i), f"Ad break {i}: Missing '{field}' field") for i in self.missing.get(field, ()))
+
+        has_duration = np.ones(len(self), dtype=bool)
+        has_duration[self.missing.get('duration', [])] = False
+        has_time = np.ones(len(self), dtype=bool)
+        has_time[self.missing.get('scheduled_time', [])] = False
+
+        with np.errstate(invalid='ignore'):
+            bad_duration = has_duration & ~(self.duration > 0)
+        errors.extend((int(i), f"Ad break {i}: Duration must be positive") for i in np.flatnonzero(bad_duration))
+        errors.extend(
+            (int(i), f"Ad break {i}: Invalid scheduled time - {self.time_errors.get(int(i), 'unparseable')}")
+            for i in np.flatnonzero(has_time & np.isnan(self.start))
+        )
+
+        errors.sort(key=lambda error: error[0])
+        return [message for _, message in errors]
+
+    def conflicts(self, min_duration=DEFAULT_SEGMENT_DURATION):
+        """Find overlapping breaks, duplicate splice_event_ids and breaks shorter than a segment
+
+        Sorting by (channel, start) and by (channel, event_id) makes this O(n log n + k) for
+        k conflicts. Every conflicting pair is reported once, against the earlier break: the
+        same pairs ConflictIndex.check finds when the breaks are added in that order. Rows
+        with an invalid time or duration are left to validate().
+        """
+        found = []
+        valid = np.flatnonzero(~np.isnan(self.start) & ~np.isnan(self.duration))
+
+        order = valid[np.lexsort((self.start[valid], self.channel[valid]))]
+        for rows in _channel_runs(order, self.channel[order]):
+            start = self.start[rows]
+            end = start + self.duration[rows]
+            reach = np.maximum.accumulate(end)
+            # Breaks starting before this window cannot reach the one at each position
+            window = np.searchsorted(start, start - self.duration[rows].max()).tolist()
+            start, end = start.tolist(), end.tolist()
+            for i in (np.flatnonzero(np.asarray(start[1:]) < reach[:-1]) + 1).tolist():
+                for j in range(window[i], i):
+                    if end[j] > start[i] and start[j] < end[i]:
+                        found.append(self._conflict('overlap', rows[i], rows[j]))
+
+        with_id = valid[self.event_id[valid] >= 0]
+        order = with_id[np.lexsort((self.event_id[with_id], self.channel[with_id]))]
+        if len(order) > 1:
+            channel, event_id = self.channel[order], self.event_id[order]
+            repeat = np.r_[False, (channel[1:] == channel[:-1]) & (event_id[1:] == event_id[:-1])]
+            first = np.maximum.accumulate(np.where(repeat, 0, np.arange(len(order)))).tolist()
+            for i in np.flatnonzero(repeat).tolist():
+                for j in range(first[i], i):
+                    found.append(self._conflict('duplicate_event_id', order[i], order[j]))
+
+        if min_duration:
+            for i in valid[(self.duration[valid] > 0) & (self.duration[valid] < min_duration)].tolist():
+                found.append(self._conflict('short', i, None, min_duration))
+
+        found.sort(key=lambda conflict: conflict['row'])
+        return found
+
+    def _conflict(self, kind, row, other_row, min_duration=None):
+        row = int(row)
+        other_id = self.ids[int(other_row)] if other_row is not None else None
+        channel = self.strings[self.channel[row]]
+        return make_conflict(kind, self.ids[row], other_id, channel, row,
+                             event_id=int(self.event_id[row]), duration=float(self.duration[row]),
+                             min_duration=min_duration)
+
+    def schedule(self, reference_epoch):
+        """Drop breaks before reference_epoch and sort the rest by start time
+
+        Returns the scheduled table and the number of past breaks dropped.
+        """
+        upcoming = np.flatnonzero(self.start >= reference_epoch)
+        order = upcoming[np.argsort(self.start[upcoming], kind='stable')]
+        return self.take(order), len(self) - len(upcoming)
+
+    def iter_records(self, reference_epoch=None):
+        """Yield ad-break dicts with timezone-aware UTC scheduled_time values
+
+        A row whose time could not be parsed (NaN start) gets a scheduled_time of None;
+        schedule() drops such rows, so scheduled tables never have one.
+        """
+        values = self.strings.values
+        utc = timezone.utc
+        # tolist() converts each column once, instead of boxing NumPy scalars per row
+        moments = (self.start * 1e6).astype('datetime64[us]').tolist()
+        columns = zip(
+            self.ids, self.start.tolist(), moments, self.duration.tolist(), self.ad_id.tolist(), self.name,
+            self.provider_id.tolist(), self.provider_name.tolist(), self.channel.tolist(),
+            self.pts_time.tolist(), self.cue_type.tolist()
+        )
+        for ad_break_id, start, moment, duration, ad_id, name, provider_id, provider_name, channel, pts_time, cue_type in columns:
+            record = {
+                'id': ad_break_id,
+                'scheduled_time': moment.replace(tzinfo=utc) if moment is not None else None,
+                'duration': duration,
+                'ad_id': values[ad_id],
+                'name': name,
+                'provider_id': values[provider_id],
+                'provider_name': values[provider_name]
+            }
+            if values[channel] is not None:
+                record['channel'] = values[channel]
+            if not math.isnan(pts_time):
+                record['pts_time'] = pts_time
+            if values[cue_type] is not None:
+                record['type'] = values[cue_type]
+            if reference_epoch is not None:
+                record['time_from_reference'] = start - reference_epoch
+            yield record
+
+    def to_records(self, reference_epoch=None):
+        """List of ad-break dicts, as produced by iter_records"""
+        return list(self.iter_records(reference_epoch))
+
+
+def _channel_runs(order, channels):
+    """Split rows already sorted by channel into one array per channel"""
+    if not len(order):
+        return []
+    bounds = np.flatnonzero(channels[1:] != channels[:-1]) + 1
+    return np.split(order, bounds)
+
+
+def make_conflict(kind, ad_break_id, other_id, channel, row=None, event_id=None, duration=None, min_duration=None):
+    """Conflict record shared by AdBreakTable.conflicts and ConflictIndex"""
+    where = f" on channel {channel}" if channel is not None else ''
+    if kind == 'overlap':
+        message = f"Ad break {ad_break_id} overlaps ad break {other_id}{where}"
+    elif kind == 'duplicate_event_id':
+        message = f"Ad break {ad_break_id} reuses splice_event_id {event_id} of ad break {other_id}{where}"
+    else:
+        message = f"Ad break {ad_break_id} is {duration:g}s, shorter than one {min_duration:g}s segment"
+    return {
+        'type': kind,
+        'row': row,
+        'id': ad_break_id,
+        'other_id': other_id,
+        'channel': channel,
+        'message': message
+    }
+
+
+class _ChannelIndex:
+    """Breaks on one channel as parallel lists sorted by start time"""
+
+    __slots__ = ('starts', 'ends', 'ids', 'event_ids', 'max_duration', 'holders', 'extra_holders')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.event_ids = []
+        self.max_duration = 0.0
+        # splice_event_id -> first break using it; later users only when the id is reused
+        self.holders = {}
+        self.extra_holders = {}
+
+    def users(self, event_id):
+        holder = self.holders.get(event_id)
+        if holder is None:
+            return ()
+        return [holder, *self.extra_holders.get(event_id, ())]
+
+    def claim(self, event_id, ad_break_id):
+        if event_id < 0:
+            return
+        if event_id not in self.holders:
+            self.holders[event_id] = ad_break_id
+        else:
+            self.extra_holders.setdefault(event_id, set()).add(ad_break_id)
+
+    def release(self, event_id, ad_break_id):
+        if event_id < 0:
+            return
+        extra = self.extra_holders.get(event_id)
+        if self.holders.get(event_id) == ad_break_id:
+            if extra:
+                self.holders[event_id] = extra.pop()
+            else:
+                del self.holders[event_id]
+        elif extra:
+            extra.discard(ad_break_id)
+        if extra is not None and not extra:
+            del self.extra_holders[event_id]
+
+
+class ConflictIndex:
+    """Incremental conflict checks for a schedule that is edited one break at a time
+
+    Each channel keeps its breaks sorted by start time plus the longest duration seen, so
+    an overlap query only bisects to the window that could reach the new break:
+    O(log n + k) per add, edit or check instead of rescanning the whole schedule.
+    """
+
+    def __init__(self, min_duration=DEFAULT_SEGMENT_DURATION, parser=None):
+        self.min_duration = min_duration
+        self.parser = parser or ScheduledTimeParser()
+        self._channels = {}
+        self._channel_of = {}
+        self._start_of = {}
+
+    @classmethod
+    def from_table(cls, table, min_duration=DEFAULT_SEGMENT_DURATION, parser=None):
+        """Build the index from a loaded AdBreakTable in O(n log n)"""
+        index = cls(min_duration, parser)
+        valid = np.flatnonzero(~np.isnan(table.start) & ~np.isnan(table.duration))
+        order = valid[np.lexsort((table.start[valid], table.channel[valid]))]
+        for rows in _channel_runs(order, table.channel[order]):
+            channel = table.strings[table.channel[rows[0]]]
+            state = index._state(channel)
+            # Rows arrive in start order, so the lists are already sorted
+            state.ids = [table.ids[row] for row in rows.tolist()]
+            state.starts = table.start[rows].tolist()
+            state.ends = (table.start[rows] + table.duration[rows]).tolist()
+            state.event_ids = table.event_id[rows].tolist()
+            state.max_duration = float(table.duration[rows].max())
+            for ad_break_id, event_id in zip(state.ids, state.event_ids):
+                state.claim(event_id, ad_break_id)
+            index._channel_of.update(dict.fromkeys(state.ids, channel))
+            index._start_of.update(zip(state.ids, state.starts))
+        return index
+
+    def __len__(self):
+        return len(self._channel_of)
+
+    def __contains__(self, ad_break_id):
+        return ad_break_id in self._channel_of
+
+    def _state(self, channel):
+        state = self._channels.get(channel)
+        if state is None:
+            state = self._channels[channel] = _ChannelIndex()
+        return state
+
+    def _span(self, ad_break):
+        start = self.parser.parse(ad_break['scheduled_time']).timestamp()
+        event_id = ad_break.get('splice_event_id')
+        if event_id is None:
+            event_id = event_id_for(ad_break['id'])
+        return ad_break.get('channel'), start, float(ad_break['duration']), event_id
+
+    def check(self, ad_break):
+        """Return the conflicts ad_break would have, without changing the index
+
+        An entry with the same id is ignored, so editing a break does not conflict with
+        its previous version.
+        """
+        ad_break_id = ad_break['id']
+        channel, start, duration, event_id = self._span(ad_break)
+        found = []
+
+        state = self._channels.get(channel)
+        if state is not None:
+            starts, ends, ids = state.starts, state.ends, state.ids
+            lo = bisect_left(starts, start - state.max_duration)
+            hi = bisect_left(starts, start + duration)
+            for j in range(lo, hi):
+                if ends[j] > start and ids[j] != ad_break_id:
+                    found.append(make_conflict('overlap', ad_break_id, ids[j], channel))
+            if event_id >= 0:
+                for other_id in state.users(event_id):
+                    if other_id != ad_break_id:
+                        found.append(make_conflict('duplicate_event_id', ad_break_id, other_id, channel, event_id=event_id))
+
+        if self.min_duration and 0 < duration < self.min_duration:
+            found.append(make_conflict('short', ad_break_id, None, channel, duration=duration, min_duration=self.min_duration))
+        return found
+
+    def add(self, ad_break):
+        """Insert or replace ad_break and return its conflicts"""
+        found = self.check(ad_break)
+        ad_break_id = ad_break['id']
+        channel, start, duration, event_id = self._span(ad_break)
+        self.remove(ad_break_id)
+
+        state = self._state(channel)
+        position = bisect_right(state.starts, start)
+        state.starts.insert(position, start)
+        state.ends.insert(position, start + duration)
+        state.ids.insert(position, ad_break_id)
+        state.event_ids.insert(position, event_id)
+        # Never shrinks on remove; a stale maximum only widens the search window
+        state.max_duration = max(state.max_duration, duration)
+        state.claim(event_id, ad_break_id)
+        self._channel_of[ad_break_id] = channel
+        self._start_of[ad_break_id] = start
+        return found
+
+    def remove(self, ad_break_id):
+        """Drop a break from the index; unknown ids are ignored"""
+        if ad_break_id not in self._channel_of:
+            return False
+        state = self._channels[self._channel_of.pop(ad_break_id)]
+        start = self._start_of.pop(ad_break_id)
+        position = bisect_left(state.starts, start)
+        while state.ids[position] != ad_break_id:
+            position += 1
+        del state.starts[position], state.ends[position], state.ids[position]
+        state.release(state.event_ids.pop(position), ad_break_id)
+        return True
@@ -8,9 +8,28 @@ import argparse
 import json
 import logging
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from pathlib import Path
-import adbreak3
+import metrics
+from ad_schedule import DEFAULT_SEGMENT_DURATION, AdBreakTable, ConflictIndex
+from schedule_stream import (
+    DEFAULT_REORDER_WINDOW,
+    check_stream,
+    is_streaming_schedule,
+    read_schedule,
+    schedule_stream,
+    validate_stream,
+    write_json_array,
+    write_ndjson
+)
+from lazy_imports import lazy_import
+from schedule_time import ScheduledTimeParser
+
+# validate, schedule and conflicts need none of these; adbreak3 is only loaded by
+# sidecar and cues, asyncio and the dispatcher only by dispatch
+adbreak3 = lazy_import('adbreak3')
+asyncio = lazy_import('asyncio')
+cue_dispatcher = lazy_import('cue_dispatcher')
 
 # Configure logging
 logging.basicConfig(
@@ -20,41 +39,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class AdBreakGenerator:
-    def __init__(self):
+    def __init__(self, segment_duration=DEFAULT_SEGMENT_DURATION, strict_conflicts=False):
         self.output_dir = Path("/var/www/hls")
         self.log_dir = Path("/app/logs")
+        self.time_parser = ScheduledTimeParser()
+        self.segment_duration = segment_duration
+        # Overlaps, reused splice_event_ids and short breaks are warnings unless this is set
+        self.strict_conflicts = strict_conflicts
         
+    @metrics.timed('schedule_seconds', operation='sidecar')
     def generate_sidecar_file(self, ad_breaks, output_file=None):
         """Generate SCTE-35 sidecar file using adbreak3"""
         try:
-            if output_file is None:
-                output_file = self.output_dir / f"adbreak_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            
             # Convert ad breaks to adbreak3 format
-            adbreak_data = []
+            adbreak_data = [self._sidecar_entry(ad_break) for ad_break in ad_breaks]
             
-            for ad_break in ad_breaks:
-                # Calculate start time in seconds from reference
-                start_time = self.parse_scheduled_time(ad_break['scheduled_time'])
-                
-                adbreak_data.append({
-                    'start': start_time,
-                    'duration': ad_break['duration'],
-                    'ad_id': ad_break['ad_id'],
-                    'cue_type': 'splice_insert',
-                    'auto_return': True,
-                    'provider_id': ad_break.get('provider_id', '0x1'),
-                    'provider_name': ad_break.get('provider_name', 'YourProvider'),
-                    'name': ad_break.get('name', f"Ad Break {ad_break['ad_id']}")
-                })
-            
-            # Use adbreak3 to generate sidecar file
-            sidecar_file = adbreak3.generate_sidecar(
-                adbreak_data,
-                str(output_file),
-                provider_id='0x1',
-                provider_name='YourProvider'
-            )
+            sidecar_file = self._write_sidecar(adbreak_data, output_file)
             
             logger.info(f"Generated SCTE-35 sidecar file: {sidecar_file}")
             return sidecar_file
@@ -63,77 +63,100 @@ class AdBreakGenerator:
             logger.error(f"Error generating sidecar file: {e}")
             raise
     
+    def _sidecar_entry(self, ad_break):
+        """Convert one ad break to the adbreak3 sidecar entry format"""
+        return {
+            'start': self.parse_scheduled_time(ad_break['scheduled_time']),
+            'duration': ad_break['duration'],
+            'ad_id': ad_break['ad_id'],
+            'cue_type': 'splice_insert',
+            'auto_return': True,
+            'provider_id': ad_break.get('provider_id', '0x1'),
+            'provider_name': ad_break.get('provider_name', 'YourProvider'),
+            'name': ad_break.get('name', f"Ad Break {ad_break['ad_id']}")
+        }
+    
+    def _write_sidecar(self, adbreak_data, output_file=None):
+        """Hand adbreak3 sidecar entries (a list or any iterable) to adbreak3.generate_sidecar"""
+        if output_file is None:
+            output_file = self.output_dir / f"adbreak_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        
+        return adbreak3.generate_sidecar(
+            adbreak_data,
+            str(output_file),
+            provider_id='0x1',
+            provider_name='YourProvider'
+        )
+    
+    @metrics.timed('schedule_seconds', operation='sidecar')
+    def stream_sidecar_file(self, ad_breaks, output_file=None):
+        """Generate the same sidecar as generate_sidecar_file, converting entries as adbreak3 reads them"""
+        try:
+            sidecar_file = self._write_sidecar((self._sidecar_entry(ad_break) for ad_break in ad_breaks), output_file)
+            
+            logger.info(f"Streamed ad breaks into SCTE-35 sidecar file: {sidecar_file}")
+            return sidecar_file
+            
+        except Exception as e:
+            logger.error(f"Error streaming sidecar file: {e}")
+            raise
+    
+    @metrics.timed('schedule_seconds', operation='cues')
     def generate_scte35_cues(self, ad_breaks, output_file=None):
         """Generate SCTE-35 cues from ad breaks"""
         try:
             if output_file is None:
                 output_file = self.output_dir / f"cues_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
-            # Generate cues using adbreak3
-            cues = []
+            # Generate cues using adbreak3, writing each one as it is created
+            def cues():
+                for ad_break in ad_breaks:
+                    start_time = self.parse_scheduled_time(ad_break['scheduled_time'])
+                    
+                    cue = adbreak3.create_splice_insert(
+                        start_time=start_time,
+                        duration=ad_break['duration'],
+                        ad_id=ad_break['ad_id'],
+                        provider_id=ad_break.get('provider_id', '0x1'),
+                        provider_name=ad_break.get('provider_name', 'YourProvider')
+                    )
+                    
+                    yield {
+                        'ad_break_id': ad_break['id'],
+                        'cue': cue,
+                        'start_time': start_time,
+                        'duration': ad_break['duration'],
+                        'ad_id': ad_break['ad_id']
+                    }
             
-            for ad_break in ad_breaks:
-                start_time = self.parse_scheduled_time(ad_break['scheduled_time'])
-                
-                cue = adbreak3.create_splice_insert(
-                    start_time=start_time,
-                    duration=ad_break['duration'],
-                    ad_id=ad_break['ad_id'],
-                    provider_id=ad_break.get('provider_id', '0x1'),
-                    provider_name=ad_break.get('provider_name', 'YourProvider')
-                )
-                
-                cues.append({
-                    'ad_break_id': ad_break['id'],
-                    'cue': cue,
-                    'start_time': start_time,
-                    'duration': ad_break['duration'],
-                    'ad_id': ad_break['ad_id']
-                })
-            
-            # Save cues to file
-            with open(output_file, 'w') as f:
-                json.dump(cues, f, indent=2, default=str)
+            count = write_json_array(output_file, cues())
             
-            logger.info(f"Generated {len(cues)} SCTE-35 cues: {output_file}")
+            metrics.inc('cues', count, operation='encode')
+            logger.info(f"Generated {count} SCTE-35 cues: {output_file}")
             return output_file
             
         except Exception as e:
             logger.error(f"Error generating SCTE-35 cues: {e}")
             raise
     
+    @metrics.timed('schedule_seconds', operation='schedule')
     def schedule_ad_breaks(self, ad_breaks, reference_time=None):
         """Schedule ad breaks with timing information"""
         try:
             if reference_time is None:
-                reference_time = datetime.now()
+                reference_time = datetime.now(timezone.utc)
+            reference_epoch = self.time_parser.parse(reference_time).timestamp()
             
-            scheduled_breaks = []
+            table = ad_breaks if isinstance(ad_breaks, AdBreakTable) else self.load_ad_breaks(ad_breaks)
             
-            for ad_break in ad_breaks:
-                scheduled_time = self.parse_scheduled_time(ad_break['scheduled_time'])
-                
-                # Calculate time from reference
-                time_from_reference = (scheduled_time - reference_time).total_seconds()
-                
-                if time_from_reference < 0:
-                    logger.warning(f"Ad break {ad_break['id']} is in the past, skipping")
-                    continue
-                
-                scheduled_breaks.append({
-                    'id': ad_break['id'],
-                    'scheduled_time': scheduled_time,
-                    'time_from_reference': time_from_reference,
-                    'duration': ad_break['duration'],
-                    'ad_id': ad_break['ad_id'],
-                    'name': ad_break.get('name'),
-                    'provider_id': ad_break.get('provider_id', '0x1'),
-                    'provider_name': ad_break.get('provider_name', 'YourProvider')
-                })
+            # One comparison drops past breaks, one argsort orders the rest
+            scheduled, skipped = table.schedule(reference_epoch)
+            if skipped:
+                logger.warning(f"Skipped {skipped} ad breaks in the past")
             
-            # Sort by scheduled time
-            scheduled_breaks.sort(key=lambda x: x['time_from_reference'])
+            scheduled_breaks = scheduled.to_records(reference_epoch)
             
+            metrics.inc('ad_breaks', len(scheduled_breaks), operation='schedule')
             logger.info(f"Scheduled {len(scheduled_breaks)} ad breaks")
             return scheduled_breaks
             
@@ -141,65 +164,129 @@ class AdBreakGenerator:
             logger.error(f"Error scheduling ad breaks: {e}")
             raise
     
-    def parse_scheduled_time(self, time_str):
-        """Parse scheduled time string to datetime"""
+    def stream_ad_breaks(self, ad_breaks, reference_time=None, check_conflicts=True, skip_past=True):
+        """Validate, schedule and conflict-check ad breaks lazily, one break at a time
+        
+        ad_breaks is any iterable (e.g. read_schedule on an NDJSON or CSV file). Nothing is
+        read until the result is iterated, and memory is bounded by the reorder window:
+        breaks out of order by up to DEFAULT_REORDER_WINDOW entries are sorted, and ones
+        further out are reported and dropped.
+        """
+        if reference_time is None:
+            reference_time = datetime.now(timezone.utc)
+        reference_time = self.time_parser.parse(reference_time)
+        stats = {}
+        
+        breaks = schedule_stream(validate_stream(ad_breaks, self.time_parser), reference_time, stats=stats, skip_past=skip_past)
+        if check_conflicts:
+            breaks = check_stream(breaks, self.segment_duration, strict=self.strict_conflicts)
+        
         try:
-            # Try different time formats
-            formats = [
-                '%Y-%m-%dT%H:%M:%S.%fZ',
-                '%Y-%m-%dT%H:%M:%SZ',
-                '%Y-%m-%d %H:%M:%S',
-                '%Y-%m-%d %H:%M'
-            ]
+            yield from breaks
+        except Exception as e:
+            logger.error(f"Error streaming ad breaks: {e}")
+            raise
+        
+        if stats['skipped']:
+            logger.warning(f"Skipped {stats['skipped']} ad breaks in the past")
+        if stats['late']:
+            logger.warning(f"Dropped {stats['late']} ad breaks more than {DEFAULT_REORDER_WINDOW} entries out of time order")
+        metrics.inc('ad_breaks', stats['scheduled'], operation='schedule')
+        logger.info(f"Scheduled {stats['scheduled']} ad breaks")
+    
+    async def dispatch_ad_breaks(self, ad_breaks, sinks, lead_time=None, reference_time=None, pts_clock=None):
+        """Fire each upcoming ad break's cue at its scheduled time and return dispatch stats
+        
+        Cues are encoded lead_time seconds ahead (default cue_dispatcher.DEFAULT_LEAD_TIME)
+        and sent to the sinks (see cue_dispatcher.open_sink); jitter is measured against
+        the scheduled time.
+        """
+        if lead_time is None:
+            lead_time = cue_dispatcher.DEFAULT_LEAD_TIME
+        dispatcher = cue_dispatcher.CueDispatcher(sinks, lead_time, pts_clock=pts_clock)
+        try:
+            if reference_time is None:
+                reference_time = datetime.now(timezone.utc)
+            table = ad_breaks if isinstance(ad_breaks, AdBreakTable) else self.load_ad_breaks(ad_breaks)
+            scheduled, skipped = table.schedule(self.time_parser.parse(reference_time).timestamp())
+            if skipped:
+                logger.warning(f"Skipped {skipped} ad breaks in the past")
             
-            for fmt in formats:
-                try:
-                    return datetime.strptime(time_str, fmt)
-                except ValueError:
-                    continue
+            for ad_break, event_id in zip(scheduled.iter_records(), scheduled.event_id.tolist()):
+                dispatcher.add(dict(ad_break, splice_event_id=event_id))
             
-            # If no format matches, assume it's a relative time in seconds
-            seconds = float(time_str)
-            return datetime.now() + timedelta(seconds=seconds)
+            logger.info(f"Dispatching {len(dispatcher)} ad breaks with {lead_time:g}s pre-roll")
+            stats = await dispatcher.run(until_idle=True)
+            
+            logger.info(
+                f"Dispatched {stats['dispatched']} cues, jitter p50 {(stats['jitter_p50'] or 0) * 1000:.2f} ms, "
+                f"p99 {(stats['jitter_p99'] or 0) * 1000:.2f} ms, max {(stats['jitter_max'] or 0) * 1000:.2f} ms"
+            )
+            return stats
+            
+        except Exception as e:
+            logger.error(f"Error dispatching ad breaks: {e}")
+            raise
+        finally:
+            dispatcher.close()
+    
+    def parse_scheduled_time(self, time_str):
+        """Parse scheduled time string to a timezone-aware datetime"""
+        try:
+            return self.time_parser.parse(time_str)
             
         except Exception as e:
             logger.error(f"Error parsing scheduled time '{time_str}': {e}")
             raise
     
-    def validate_ad_breaks(self, ad_breaks):
-        """Validate ad break configuration"""
+    def load_ad_breaks(self, ad_breaks):
+        """Validate ad breaks and load them into a columnar AdBreakTable
+        
+        Each time is parsed exactly once here; the checks run as vectorized masks over
+        the columns instead of per-break dict lookups. Validation errors always raise;
+        conflicts are logged as warnings, and raise only with strict_conflicts.
+        """
+        table = AdBreakTable.from_records(ad_breaks, self.time_parser)
+        errors = table.validate()
+        if errors:
+            logger.error(f"Ad break validation errors: {errors}")
+            raise ValueError(f"Ad break validation failed: {errors}")
+        
+        # Overlaps, reused splice_event_ids and sub-segment breaks would only fail at the encoder
+        conflicts = [conflict['message'] for conflict in table.conflicts(self.segment_duration)]
+        if conflicts and self.strict_conflicts:
+            logger.error(f"Ad break conflicts: {conflicts}")
+            raise ValueError(f"Ad break validation failed: {conflicts}")
+        for message in conflicts:
+            logger.warning(message)
+        
+        return table
+    
+    def find_conflicts(self, ad_breaks):
+        """Return overlap, duplicate splice_event_id and short-break conflicts without raising"""
         try:
-            errors = []
+            table = ad_breaks if isinstance(ad_breaks, AdBreakTable) else AdBreakTable.from_records(ad_breaks, self.time_parser)
+            conflicts = table.conflicts(self.segment_duration)
             
-            for i, ad_break in enumerate(ad_breaks):
-                # Check required fields
-                if 'id' not in ad_break:
-                    errors.append(f"Ad break {i}: Missing 'id' field")
-                
-                if 'scheduled_time' not in ad_break:
-                    errors.append(f"Ad break {i}: Missing 'scheduled_time' field")
-                
-                if 'duration' not in ad_break:
-                    errors.append(f"Ad break {i}: Missing 'duration' field")
-                
-                if 'ad_id' not in ad_break:
-                    errors.append(f"Ad break {i}: Missing 'ad_id' field")
-                
-                # Validate duration
-                if 'duration' in ad_break and ad_break['duration'] <= 0:
-                    errors.append(f"Ad break {i}: Duration must be positive")
-                
-                # Validate scheduled time
-                if 'scheduled_time' in ad_break:
-                    try:
-                        self.parse_scheduled_time(ad_break['scheduled_time'])
-                    except Exception as e:
-                        errors.append(f"Ad break {i}: Invalid scheduled time - {e}")
+            logger.info(f"Found {len(conflicts)} conflicts in {len(table)} ad breaks")
+            return conflicts
             
-            if errors:
-                logger.error(f"Ad break validation errors: {errors}")
-                raise ValueError(f"Ad break validation failed: {errors}")
+        except Exception as e:
+            logger.error(f"Error checking ad break conflicts: {e}")
+            raise
+    
+    def conflict_index(self, ad_breaks=()):
+        """Build a ConflictIndex for checking single-break adds and edits incrementally"""
+        table = AdBreakTable.from_records(ad_breaks, self.time_parser)
+        return ConflictIndex.from_table(table, self.segment_duration, self.time_parser)
+    
+    @metrics.timed('schedule_seconds', operation='validate')
+    def validate_ad_breaks(self, ad_breaks):
+        """Validate ad break configuration"""
+        try:
+            self.load_ad_breaks(ad_breaks)
             
+            metrics.inc('ad_breaks', len(ad_breaks), operation='validate')
             logger.info(f"Validated {len(ad_breaks)} ad breaks")
             return True
             
@@ -213,67 +300,136 @@ def main():
     
     # Generate sidecar command
     sidecar_parser = subparsers.add_parser('sidecar', help='Generate SCTE-35 sidecar file')
-    sidecar_parser.add_argument('ad_breaks_file', help='Ad breaks JSON file')
+    sidecar_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file (- for NDJSON on stdin)')
     sidecar_parser.add_argument('--output', help='Output file path')
     sidecar_parser.add_argument('--reference-time', help='Reference time (ISO format)')
     
     # Generate cues command
     cues_parser = subparsers.add_parser('cues', help='Generate SCTE-35 cues')
-    cues_parser.add_argument('ad_breaks_file', help='Ad breaks JSON file')
+    cues_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file (- for NDJSON on stdin)')
     cues_parser.add_argument('--output', help='Output file path')
     
     # Schedule command
     schedule_parser = subparsers.add_parser('schedule', help='Schedule ad breaks')
-    schedule_parser.add_argument('ad_breaks_file', help='Ad breaks JSON file')
+    schedule_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file (- for NDJSON on stdin)')
     schedule_parser.add_argument('--reference-time', help='Reference time (ISO format)')
     schedule_parser.add_argument('--output', help='Output file path')
     
     # Validate command
     validate_parser = subparsers.add_parser('validate', help='Validate ad breaks')
-    validate_parser.add_argument('ad_breaks_file', help='Ad breaks JSON file')
+    validate_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file (- for NDJSON on stdin)')
+    
+    # Conflicts command
+    conflicts_parser = subparsers.add_parser('conflicts', help='List overlapping, duplicate and too-short ad breaks')
+    conflicts_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file (- for NDJSON on stdin)')
+    conflicts_parser.add_argument('--output', help='Output file path')
     
+    # Dispatch command
+    dispatch_parser = subparsers.add_parser('dispatch', help='Fire ad-break cues in real time to UDP, Unix socket or file sinks')
+    dispatch_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file (- for NDJSON on stdin)')
+    dispatch_parser.add_argument('--sink', action='append', required=True, metavar='[CHANNEL=]URL',
+                                 help='udp://host:port, unix:///path or file:///path; repeat for more sinks')
+    dispatch_parser.add_argument('--lead-time', type=float, help='Seconds ahead of each break to encode its cue (default: 2)')
+    dispatch_parser.add_argument('--reference-time', help='Reference time (ISO format)')
+    dispatch_parser.add_argument('--pts-reference', metavar='TIME=PTS',
+                                 help='Stream PTS in seconds at a wall-clock time, used for breaks without pts_time')
+    
+    parser.add_argument('--segment-duration', type=float, default=DEFAULT_SEGMENT_DURATION,
+                        help='Segment duration in seconds; shorter ad breaks are conflicts')
+    parser.add_argument('--strict-conflicts', action='store_true',
+                        help='Fail on overlapping, duplicate or too-short ad breaks instead of warning')
+    
+    metrics.add_arguments(parser)
     args = parser.parse_args()
+    metrics.configure_from_args(args)
     
     if not args.command:
         parser.print_help()
         sys.exit(1)
     
-    generator = AdBreakGenerator()
+    generator = AdBreakGenerator(args.segment_duration, args.strict_conflicts)
     
     try:
-        # Load ad breaks
-        with open(args.ad_breaks_file, 'r') as f:
-            ad_breaks = json.load(f)
+        # NDJSON and CSV schedules are read lazily and streamed through every stage
+        streaming = is_streaming_schedule(args.ad_breaks_file)
+        if streaming:
+            ad_breaks = read_schedule(args.ad_breaks_file)
+        else:
+            with open(args.ad_breaks_file, 'r') as f:
+                ad_breaks = json.load(f)
         
         if args.command == 'sidecar':
             reference_time = None
             if args.reference_time:
-                reference_time = datetime.fromisoformat(args.reference_time.replace('Z', '+00:00'))
+                reference_time = generator.parse_scheduled_time(args.reference_time)
             
-            scheduled_breaks = generator.schedule_ad_breaks(ad_breaks, reference_time)
-            output = generator.generate_sidecar_file(scheduled_breaks, args.output)
+            if streaming:
+                output = generator.stream_sidecar_file(generator.stream_ad_breaks(ad_breaks, reference_time), args.output)
+            else:
+                # Parse every scheduled time once, then carry the datetimes through
+                scheduled_breaks = generator.schedule_ad_breaks(generator.load_ad_breaks(ad_breaks), reference_time)
+                output = generator.generate_sidecar_file(scheduled_breaks, args.output)
             print(f"Generated sidecar file: {output}")
         
         elif args.command == 'cues':
+            if streaming:
+                ad_breaks = generator.stream_ad_breaks(ad_breaks, skip_past=False)
+            else:
+                ad_breaks = generator.load_ad_breaks(ad_breaks).iter_records()
             output = generator.generate_scte35_cues(ad_breaks, args.output)
             print(f"Generated SCTE-35 cues: {output}")
         
         elif args.command == 'schedule':
             reference_time = None
             if args.reference_time:
-                reference_time = datetime.fromisoformat(args.reference_time.replace('Z', '+00:00'))
+                reference_time = generator.parse_scheduled_time(args.reference_time)
             
-            scheduled_breaks = generator.schedule_ad_breaks(ad_breaks, reference_time)
-            
-            output = args.output or f"/tmp/scheduled_breaks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(output, 'w') as f:
-                json.dump(scheduled_breaks, f, indent=2, default=str)
+            if streaming:
+                output = args.output or f"/tmp/scheduled_breaks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+                write_ndjson(output, generator.stream_ad_breaks(ad_breaks, reference_time))
+            else:
+                scheduled_breaks = generator.schedule_ad_breaks(generator.load_ad_breaks(ad_breaks), reference_time)
+                
+                output = args.output or f"/tmp/scheduled_breaks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                with open(output, 'w') as f:
+                    json.dump(scheduled_breaks, f, indent=2, default=str)
             
             print(f"Scheduled ad breaks: {output}")
         
         elif args.command == 'validate':
-            generator.validate_ad_breaks(ad_breaks)
-            print("Ad breaks validation passed")
+            if streaming:
+                count = sum(1 for _ in generator.stream_ad_breaks(ad_breaks, skip_past=False))
+                print(f"Ad breaks validation passed ({count} ad breaks)")
+            else:
+                generator.validate_ad_breaks(ad_breaks)
+                print("Ad breaks validation passed")
+        
+        elif args.command == 'dispatch':
+            sinks = {}
+            for spec in args.sink:
+                channel, _, url = spec.partition('=') if '=' in spec.split('://', 1)[0] else ('', '', spec)
+                sinks.setdefault(channel or None, []).append(cue_dispatcher.open_sink(url))
+            pts_clock = None
+            if args.pts_reference:
+                moment, _, pts = args.pts_reference.rpartition('=')
+                pts_clock = (generator.parse_scheduled_time(moment).timestamp(), float(pts))
+            
+            stats = asyncio.run(generator.dispatch_ad_breaks(
+                list(ad_breaks), sinks, args.lead_time, args.reference_time, pts_clock
+            ))
+            print(f"Dispatched {stats['dispatched']} cues: {json.dumps(stats)}")
+        
+        elif args.command == 'conflicts':
+            conflicts = generator.find_conflicts(ad_breaks)
+            
+            if args.output:
+                with open(args.output, 'w') as f:
+                    json.dump(conflicts, f, indent=2)
+            for conflict in conflicts:
+                print(conflict['message'])
+            print(f"Found {len(conflicts)} conflicts")
+            if conflicts:
+                sys.exit(1)
     
     except Exception as e:
         logger.error(f"Error executing command '{args.command}': {e}")
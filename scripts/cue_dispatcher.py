@@ -0,0 +1,282 @@
+"""
+Real-Time Cue Dispatcher
+asyncio timer loop over a heap of pending ad breaks: each cue is encoded a lead time
+ahead of its break (pre-roll), then fired at the scheduled wall-clock time to UDP,
+Unix datagram or file sinks, with the firing jitter measured
+"""
+
+import asyncio
+import base64
+import heapq
+import json
+import logging
+import socket
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlsplit
+from ad_schedule import event_id_for
+from cue_encoder import CueEncoder
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cues are encoded this many seconds before they fire
+DEFAULT_LEAD_TIME = 2.0
+
+# Jitter percentiles are computed over this many of the most recent firings
+JITTER_WINDOW = 4096
+
+ENCODE = 0
+FIRE = 1
+
+
+class UDPSink:
+    """Send each cue's splice_info_section as one UDP datagram"""
+
+    def __init__(self, host, port):
+        self.target = f'udp://{host}:{port}'
+        self.sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.connect((host, port))
+
+    def send(self, data, record):
+        self.sock.send(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class UnixSink:
+    """Send each cue's splice_info_section as one Unix datagram"""
+
+    def __init__(self, path):
+        self.target = f'unix://{path}'
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.connect(path)
+
+    def send(self, data, record):
+        self.sock.send(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class FileSink:
+    """Append one NDJSON line per fired cue, with the section base64-encoded"""
+
+    def __init__(self, path):
+        self.target = f'file://{path}'
+        self.file = open(path, 'a', buffering=1)
+
+    def send(self, data, record):
+        self.file.write(json.dumps(dict(record, cue=base64.b64encode(data).decode('ascii')), separators=(',', ':')))
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+def open_sink(url):
+    """Open a sink from udp://host:port, unix:///path/to.sock, file:///path or a plain path"""
+    parts = urlsplit(url)
+    if parts.scheme == 'udp':
+        if not parts.hostname or not parts.port:
+            raise ValueError(f"UDP sink needs host and port: {url}")
+        return UDPSink(parts.hostname, parts.port)
+    if parts.scheme == 'unix':
+        return UnixSink(parts.path)
+    if parts.scheme in ('file', ''):
+        return FileSink(parts.path)
+    raise ValueError(f"Unsupported sink '{url}' (use udp://, unix:// or file://)")
+
+
+class _Job:
+    __slots__ = ('ad_break_id', 'channel', 'fire_at', 'duration', 'event_id', 'pts_time', 'cue_type', 'data', 'cancelled')
+
+    def __init__(self, ad_break_id, channel, fire_at, duration, event_id, pts_time, cue_type):
+        self.ad_break_id = ad_break_id
+        self.channel = channel
+        self.fire_at = fire_at
+        self.duration = duration
+        self.event_id = event_id
+        self.pts_time = pts_time
+        self.cue_type = cue_type
+        self.data = None
+        self.cancelled = False
+
+
+class CueDispatcher:
+    """Fire ad-break cues on time from a single asyncio timer loop
+
+    Pending breaks sit in one heap keyed by their next deadline (encode, then fire), so
+    adding a break is O(log n) and the loop only ever waits on the earliest deadline.
+    sinks is a list of sinks for every channel, or a dict of channel -> sinks where the
+    None entry covers channels without their own. pts_clock, an (epoch, pts_seconds)
+    pair, maps wall-clock times to stream PTS for breaks without a pts_time.
+    """
+
+    def __init__(self, sinks, lead_time=DEFAULT_LEAD_TIME, encoder=None, pts_clock=None, clock=time.time):
+        self.sinks = sinks if isinstance(sinks, dict) else {None: list(sinks)}
+        self.lead_time = lead_time
+        self.encoder = encoder or CueEncoder()
+        self.pts_clock = pts_clock
+        self.clock = clock
+        self._heap = []
+        self._jobs = {}
+        self._sequence = 0
+        self._wakeup = None
+        self._timer = None
+        self.dispatched = 0
+        self.cancelled = 0
+        self.send_errors = 0
+        self._failing = set()
+        self._jitter = deque(maxlen=JITTER_WINDOW)
+        self._jitter_sum = 0.0
+        self._jitter_max = 0.0
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _push(self, deadline, phase, job):
+        self._sequence += 1
+        heapq.heappush(self._heap, (deadline, self._sequence, phase, job))
+        # Wake the loop if this deadline is now the earliest
+        if self._wakeup is not None and self._heap[0][3] is job:
+            self._wakeup.set()
+
+    def add(self, ad_break):
+        """Queue one scheduled ad break; an existing break with the same id is replaced"""
+        scheduled_time = ad_break['scheduled_time']
+        fire_at = scheduled_time.timestamp() if isinstance(scheduled_time, datetime) else float(scheduled_time)
+        event_id = ad_break.get('splice_event_id')
+        pts_time = ad_break.get('pts_time')
+        if pts_time is None and self.pts_clock is not None:
+            pts_time = self.pts_clock[1] + (fire_at - self.pts_clock[0])
+
+        replaced = self._jobs.pop(ad_break['id'], None)
+        if replaced is not None:
+            replaced.cancelled = True
+        job = _Job(
+            ad_break['id'], ad_break.get('channel'), fire_at, float(ad_break['duration']),
+            event_id if event_id is not None else event_id_for(ad_break['id']),
+            pts_time, ad_break.get('type') or 'splice_insert'
+        )
+        self._jobs[job.ad_break_id] = job
+        encode_at = fire_at - self.lead_time
+        if encode_at <= self.clock():
+            self._encode(job)
+            self._push(fire_at, FIRE, job)
+        else:
+            self._push(encode_at, ENCODE, job)
+        return job
+
+    def cancel(self, ad_break_id):
+        """Drop a pending break; its heap entries are skipped when they come due"""
+        job = self._jobs.pop(ad_break_id, None)
+        if job is None:
+            return False
+        job.cancelled = True
+        self.cancelled += 1
+        return True
+
+    def _encode(self, job):
+        if job.cue_type == 'time_signal':
+            job.data = self.encoder.time_signal(job.event_id, job.duration, job.pts_time)
+        else:
+            job.data = self.encoder.splice_insert(job.event_id, job.duration, job.pts_time)
+
+    def _fire(self, job, now):
+        jitter = now - job.fire_at
+        record = {
+            'id': job.ad_break_id,
+            'channel': job.channel,
+            'splice_event_id': job.event_id,
+            'scheduled_epoch': job.fire_at,
+            'fired_epoch': now,
+            'jitter': jitter
+        }
+        channel = job.channel if job.channel is not None else 'default'
+        for sink in self.sinks.get(job.channel, self.sinks.get(None, ())):
+            try:
+                sink.send(job.data, record)
+                self._failing.discard(sink)
+            except OSError as e:
+                self.send_errors += 1
+                metrics.inc('cues', operation='dispatch_error')
+                # One warning per outage, not one per cue
+                if sink not in self._failing:
+                    self._failing.add(sink)
+                    logger.warning(f"{sink.target}: could not send cue for ad break {job.ad_break_id}: {e}")
+
+        del self._jobs[job.ad_break_id]
+        self.dispatched += 1
+        self._jitter.append(jitter)
+        self._jitter_sum += jitter
+        self._jitter_max = max(self._jitter_max, jitter)
+        metrics.inc('cues', operation='dispatch')
+        metrics.observe('dispatch_jitter_seconds', jitter, channel=channel)
+
+    def _set_wakeup(self):
+        self._wakeup.set()
+
+    async def run(self, until_idle=False):
+        """Encode and fire cues as their deadlines come due
+
+        Runs until cancelled, or with until_idle until no breaks are pending.
+        """
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        heap = self._heap
+        try:
+            while True:
+                now = self.clock()
+                # Everything already due goes out in one pass, in deadline order
+                while heap and heap[0][0] <= now:
+                    _, _, phase, job = heapq.heappop(heap)
+                    if job.cancelled:
+                        continue
+                    if phase == ENCODE:
+                        self._encode(job)
+                        self._push(job.fire_at, FIRE, job)
+                    else:
+                        self._fire(job, self.clock())
+                    now = self.clock()
+
+                if not heap and until_idle:
+                    return self.stats()
+
+                self._wakeup.clear()
+                if heap:
+                    self._timer = loop.call_later(heap[0][0] - now, self._set_wakeup)
+                await self._wakeup.wait()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+        finally:
+            self._wakeup = None
+
+    def close(self):
+        """Close every sink"""
+        for sinks in self.sinks.values():
+            for sink in sinks:
+                sink.close()
+
+    def stats(self):
+        """Return dispatch counters and jitter (seconds) over the recent firings"""
+        recent = sorted(self._jitter)
+
+        def percentile(fraction):
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] if recent else None
+
+        return {
+            'pending': len(self._jobs),
+            'dispatched': self.dispatched,
+            'cancelled': self.cancelled,
+            'send_errors': self.send_errors,
+            'jitter_mean': self._jitter_sum / self.dispatched if self.dispatched else None,
+            'jitter_p50': percentile(0.5),
+            'jitter_p99': percentile(0.99),
+            'jitter_max': self._jitter_max if self.dispatched else None
+        }
@@ -0,0 +1,194 @@
+"""
+SCTE-35 Cue Encoder
+Keyed LRU cache of encoded splice_insert / time_signal cues, re-patched per break
+"""
+
+import base64
+from collections import OrderedDict
+from lazy_imports import lazy_import
+import metrics
+
+# Only a cache miss builds a cue through threefive; patched hits never load it
+threefive = lazy_import('threefive')
+
+SPLICE_INSERT = 0x05
+TIME_SIGNAL = 0x06
+
+# splice_info_section header up to and including splice_command_type is 14 bytes
+SPLICE_COMMAND_TYPE_OFFSET = 13
+SPLICE_COMMAND_OFFSET = 14
+
+# splice_insert: event id (4), cancel indicator byte (1), flags byte (1), then splice_time
+SPLICE_INSERT_EVENT_ID_OFFSET = SPLICE_COMMAND_OFFSET
+SPLICE_INSERT_PTS_OFFSET = SPLICE_COMMAND_OFFSET + 6
+TIME_SIGNAL_PTS_OFFSET = SPLICE_COMMAND_OFFSET
+
+PTS_MASK = (1 << 33) - 1
+
+# threefive skips a pts_time of 0 when encoding, so templates are built with this
+# placeholder and the real PTS (including 0) is patched in afterwards
+TEMPLATE_PTS = 1.0
+
+
+def _crc32_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = (crc << 1) ^ 0x04C11DB7 if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+_CRC32_TABLE = _crc32_table()
+
+
+def crc32_mpeg2(data):
+    """CRC-32/MPEG-2 as used by splice_info_section"""
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC32_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+
+def encoded_cue_bytes(cue):
+    """Encode a threefive.Cue once and return the raw splice_info_section bytes"""
+    encoded = cue.encode()
+    if isinstance(encoded, (bytes, bytearray)):
+        return bytes(encoded)
+    # Newer threefive releases return the section base64 encoded
+    return base64.b64decode(encoded)
+
+
+def build_splice_insert(splice_event_id, duration, pts_time=None):
+    """Build a threefive splice_insert cue for an ad break"""
+    cue = threefive.Cue()
+
+    # Set splice_insert command
+    cue.command = threefive.SpliceInsert()
+    cue.command.splice_event_id = splice_event_id
+    cue.command.splice_event_cancel_indicator = False
+    cue.command.out_of_network_indicator = True
+    cue.command.program_splice_flag = True
+    cue.command.duration_flag = True
+    cue.command.splice_immediate_flag = False
+    cue.command.event_id_compliance_flag = True
+    cue.command.unique_program_id = 0
+    cue.command.time_specified_flag = pts_time is not None
+    cue.command.pts_time = pts_time
+
+    # Set break duration (threefive takes seconds and converts to the 90kHz clock)
+    cue.command.break_auto_return = True
+    cue.command.break_duration = float(duration)
+
+    # Set descriptors
+    cue.command.avail_num = 1
+    cue.command.avails_expected = 1
+
+    return cue
+
+
+def build_time_signal(splice_event_id, duration, pts_time=None):
+    """Build a threefive time_signal cue for an ad break
+
+    time_signal() carries only a splice_time; the event id and duration are not encoded.
+    """
+    cue = threefive.Cue()
+
+    # Set time_signal command
+    cue.command = threefive.TimeSignal()
+    cue.command.time_specified_flag = pts_time is not None
+    cue.command.pts_time = pts_time
+
+    return cue
+
+
+def _patch_pts(data, offset, pts_time):
+    """Overwrite a 5-byte splice_time() with time_specified_flag set"""
+    ticks = int(round(pts_time * 90000)) & PTS_MASK
+    data[offset] = 0xFE | (ticks >> 32)
+    data[offset + 1:offset + 5] = (ticks & 0xFFFFFFFF).to_bytes(4, 'big')
+
+
+class CueEncoder:
+    """Encode ad-break cues from cached templates, patching only event id, PTS and CRC"""
+
+    def __init__(self, max_templates=256):
+        self.max_templates = max_templates
+        self._templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _template(self, key, build, command_type, pts_offset):
+        """Return the cached template for key, encoding it with threefive on a miss"""
+        template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self._templates.move_to_end(key)
+            return template
+
+        self.misses += 1
+        template = encoded_cue_bytes(build())
+        if template[SPLICE_COMMAND_TYPE_OFFSET] != command_type:
+            raise ValueError(f"Unexpected splice_command_type 0x{template[SPLICE_COMMAND_TYPE_OFFSET]:02x} in template")
+        if pts_offset is not None and not template[pts_offset] & 0x80:
+            raise ValueError("Template splice_time has no time_specified_flag")
+
+        self._templates[key] = template
+        if len(self._templates) > self.max_templates:
+            self._templates.popitem(last=False)
+        return template
+
+    def _finish(self, data):
+        """Recompute the CRC-32 over the patched section"""
+        data[-4:] = crc32_mpeg2(data[:-4]).to_bytes(4, 'big')
+        metrics.inc('cues', operation='encode')
+        return bytes(data)
+
+    @metrics.timed('cue_encode_seconds', command='splice_insert')
+    def splice_insert(self, splice_event_id, duration, pts_time=None):
+        """Return the encoded splice_insert section for one ad break"""
+        pts_offset = SPLICE_INSERT_PTS_OFFSET if pts_time is not None else None
+        template = self._template(
+            ('splice_insert', duration, pts_time is not None),
+            lambda: build_splice_insert(splice_event_id, duration, TEMPLATE_PTS if pts_time is not None else None),
+            SPLICE_INSERT,
+            pts_offset
+        )
+
+        data = bytearray(template)
+        offset = SPLICE_INSERT_EVENT_ID_OFFSET
+        data[offset:offset + 4] = (splice_event_id & 0xFFFFFFFF).to_bytes(4, 'big')
+        if pts_offset is not None:
+            _patch_pts(data, pts_offset, pts_time)
+        return self._finish(data)
+
+    @metrics.timed('cue_encode_seconds', command='time_signal')
+    def time_signal(self, splice_event_id, duration, pts_time=None):
+        """Return the encoded time_signal section for one ad break
+
+        time_signal() has no splice_event_id field or duration, so one template per
+        with/without-PTS form serves every break and only the PTS is patched.
+        """
+        pts_offset = TIME_SIGNAL_PTS_OFFSET if pts_time is not None else None
+        template = self._template(
+            ('time_signal', pts_time is not None),
+            lambda: build_time_signal(splice_event_id, duration, TEMPLATE_PTS if pts_time is not None else None),
+            TIME_SIGNAL,
+            pts_offset
+        )
+
+        data = bytearray(template)
+        if pts_offset is not None:
+            _patch_pts(data, pts_offset, pts_time)
+        return self._finish(data)
+
+    def stats(self):
+        """Return cache hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'templates': len(self._templates),
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
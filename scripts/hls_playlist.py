@@ -0,0 +1,257 @@
+"""
+HLS Media Playlist Model
+Single-pass playlist parsing into segment records with cumulative start times,
+and atomic writes for playlists served live
+"""
+
+import hashlib
+import os
+import tempfile
+from bisect import bisect_left
+from datetime import datetime
+import metrics
+
+# Tags that describe the whole playlist rather than the segment that follows them
+HEADER_TAGS = (
+    '#EXTM3U',
+    '#EXT-X-VERSION',
+    '#EXT-X-TARGETDURATION',
+    '#EXT-X-MEDIA-SEQUENCE',
+    '#EXT-X-DISCONTINUITY-SEQUENCE',
+    '#EXT-X-PLAYLIST-TYPE',
+    '#EXT-X-INDEPENDENT-SEGMENTS',
+    '#EXT-X-START',
+    '#EXT-X-ALLOW-CACHE',
+    '#EXT-X-I-FRAMES-ONLY',
+    '#EXT-X-SERVER-CONTROL',
+    '#EXT-X-PART-INF'
+)
+
+
+def parse_datetime(value):
+    """Parse an ISO-8601 timestamp, accepting a trailing Z"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class MediaPlaylist:
+    """HLS media playlist parsed once into header, segment records and trailer"""
+
+    def __init__(self, header, segments, trailer):
+        self.header = header
+        self.segments = segments
+        self.trailer = trailer
+        self.starts = [segment['start'] for segment in segments]
+        self.total_duration = segments[-1]['start'] + segments[-1]['duration'] if segments else 0.0
+
+        # Sequence number of the first segment; a live window slides it forward
+        self.media_sequence = 0
+        for line in header:
+            if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+                self.media_sequence = int(line.split(':', 1)[1])
+
+        # Wall-clock time of playlist offset 0, from the first EXT-X-PROGRAM-DATE-TIME
+        self.epoch_start = None
+        for segment in segments:
+            if segment['program_date_time'] is not None:
+                self.epoch_start = segment['program_date_time'] - segment['start']
+                break
+
+    @classmethod
+    def parse(cls, content):
+        """Parse playlist text in one pass"""
+        header = []
+        segments = []
+        pending = []
+        start = 0.0
+        duration = 0.0
+        program_date_time = None
+
+        for line in content.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            if line.startswith('#'):
+                if not segments and not pending and line.startswith(HEADER_TAGS):
+                    header.append(line)
+                    continue
+                if line.startswith('#EXTINF:'):
+                    duration = float(line[8:].split(',', 1)[0])
+                elif line.startswith('#EXT-X-PROGRAM-DATE-TIME:'):
+                    program_date_time = parse_datetime(line.split(':', 1)[1]).timestamp()
+                pending.append(line)
+                continue
+
+            # A URI line closes the segment
+            pending.append(line)
+            segments.append({
+                'lines': pending,
+                'uri': line,
+                'duration': duration,
+                'start': start,
+                'program_date_time': program_date_time
+            })
+            start += duration
+            pending = []
+            duration = 0.0
+            program_date_time = None
+
+        return cls(header, segments, pending)
+
+    @classmethod
+    def load(cls, path):
+        """Read and parse a playlist file"""
+        with open(path, 'r') as f:
+            return cls.parse(f.read())
+
+    def offset_for(self, scheduled_time):
+        """Convert seconds from playlist start, or an ISO wall-clock time, to a playlist offset"""
+        if isinstance(scheduled_time, (int, float)):
+            return float(scheduled_time)
+        if not isinstance(scheduled_time, datetime):
+            try:
+                return float(scheduled_time)
+            except (TypeError, ValueError):
+                pass
+
+        if self.epoch_start is None:
+            raise ValueError(f"Wall-clock time {scheduled_time} needs EXT-X-PROGRAM-DATE-TIME in the playlist")
+        try:
+            moment = scheduled_time if isinstance(scheduled_time, datetime) else parse_datetime(scheduled_time)
+        except (AttributeError, TypeError) as e:
+            raise ValueError(f"Unrecognized scheduled time {scheduled_time!r}") from e
+        return moment.timestamp() - self.epoch_start
+
+    def boundary_at_or_after(self, offset):
+        """Index of the first segment starting at or after offset, or None past the end"""
+        index = bisect_left(self.starts, offset - 1e-6)
+        return index if index < len(self.segments) else None
+
+    def segment_containing(self, offset):
+        """Index of the segment whose time range contains offset, or None outside the playlist"""
+        if offset < 0 or offset >= self.total_duration:
+            return None
+        return bisect_left(self.starts, offset + 1e-6) - 1
+
+    def render(self, insertions=None):
+        """Write the playlist back out with extra tag lines placed before segments
+
+        insertions maps a segment index to the list of lines that precede it.
+        """
+        insertions = insertions or {}
+        lines = list(self.header)
+        for index, segment in enumerate(self.segments):
+            extra = insertions.get(index)
+            if extra:
+                lines.extend(extra)
+            lines.extend(segment['lines'])
+        lines.extend(self.trailer)
+        return '\n'.join(lines) + '\n'
+
+
+class AtomicFileWriter:
+    """Replace files atomically so a web server never serves a half-written playlist
+
+    Content is written to a temp file in the destination directory and renamed over the
+    target. Writes whose content hash matches what is already on disk are skipped.
+    fsync is 'none', 'always' (file and directory on every write) or 'batch' (deferred
+    until sync() is called, e.g. once per poll cycle).
+    """
+
+    def __init__(self, fsync='none'):
+        self.fsync = fsync
+        self.writes = 0
+        self.skipped = 0
+        self._digests = {}
+        self._unsynced = set()
+
+    def _digest(self, data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    @metrics.timed('playlist_write_seconds')
+    def write(self, path, content):
+        """Atomically write content to path; returns False when the file was already identical"""
+        path = os.path.abspath(path)
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = self._digest(data)
+
+        # Trust the remembered digest only while the file is untouched since we wrote it
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        known = None
+        if st is not None:
+            cached = self._digests.get(path)
+            if cached and cached[1:] == (st.st_mtime_ns, st.st_size):
+                known = cached[0]
+            else:
+                with open(path, 'rb') as f:
+                    known = self._digest(f.read())
+        if known == digest:
+            self._digests[path] = (digest, st.st_mtime_ns, st.st_size)
+            self.skipped += 1
+            metrics.inc('playlist_writes', result='unchanged')
+            return False
+
+        self._replace(path, (data,), st.st_mode & 0o777 if st is not None else 0o644)
+
+        st = os.stat(path)
+        self._digests[path] = (digest, st.st_mtime_ns, st.st_size)
+        self.writes += 1
+        metrics.inc('playlist_writes', result='written')
+        return True
+
+    @metrics.timed('playlist_write_seconds')
+    def replace(self, path, *chunks):
+        """Atomically write chunks to path without comparing them to the file, for content that always changes"""
+        path = os.path.abspath(path)
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        self._replace(path, chunks, mode)
+        self._digests.pop(path, None)
+        self.writes += 1
+        metrics.inc('playlist_writes', result='written')
+
+    def _replace(self, path, chunks, mode):
+        """Write chunks to a temp file beside path and rename it over path"""
+        directory, name = os.path.split(path)
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                if self.fsync == 'always':
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        if self.fsync == 'always':
+            self._fsync_path(directory)
+        elif self.fsync == 'batch':
+            self._unsynced.add(path)
+
+    def _fsync_path(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def sync(self):
+        """fsync every file written since the last sync, then their directories"""
+        directories = set()
+        for path in self._unsynced:
+            if os.path.exists(path):
+                self._fsync_path(path)
+                directories.add(os.path.dirname(path))
+        for directory in directories:
+            self._fsync_path(directory)
+        self._unsynced.clear()
@@ -0,0 +1,47 @@
+"""
+Lazy Imports
+Module proxies that defer loading heavy dependencies (threefive, m3ufu, x9k3, adbreak3,
+numpy, asyncio) until an attribute is first used, so each command only pays for what it
+actually touches
+"""
+
+import importlib.util
+import sys
+import types
+
+
+class _MissingModule(types.ModuleType):
+    """Stand-in for a module that is not installed; fails on first use, not at import"""
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        raise ModuleNotFoundError(f"No module named '{self.__name__}'", name=self.__name__)
+
+
+def lazy_import(name):
+    """Return name as a module whose code runs on first attribute access
+
+    Use it as `threefive = lazy_import('threefive')` and reach everything through the
+    module (threefive.Cue), since `from x import y` would load it immediately.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return _MissingModule(name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # Bind submodules on their package, as a regular import does, so a later
+    # `import urllib.request` elsewhere still finds urllib.request
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
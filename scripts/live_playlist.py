@@ -0,0 +1,188 @@
+"""
+Live Playlist Window
+Sliding-window HLS media playlist kept as a ring of pre-rendered segment entries, with
+expired segments deleted in batches on a background thread
+"""
+
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from hls_playlist import AtomicFileWriter
+
+logger = logging.getLogger(__name__)
+
+# How often the reaper wakes to delete the segments whose grace period has passed
+DEFAULT_REAP_INTERVAL = 2.0
+
+# Compact the rendered body once this much of it belongs to segments already dropped
+COMPACT_MIN_BYTES = 64 * 1024
+
+SegmentRecord = namedtuple('SegmentRecord', 'sequence size duration path discontinuity')
+
+
+class SegmentReaper:
+    """Delete expired segment files in batches on a background thread
+
+    Each path is deleted once its delay has passed, so players that loaded the playlist
+    just before the segment dropped out can still fetch it (RFC 8216 section 6.2.2).
+    """
+
+    def __init__(self, interval=DEFAULT_REAP_INTERVAL):
+        self.interval = interval
+        self.deleted = 0
+        self.failed = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+    def schedule(self, path, delay=0.0):
+        """Queue a file for deletion after delay seconds"""
+        with self._lock:
+            heapq.heappush(self._pending, (time.monotonic() + delay, path))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='segment-reaper', daemon=True)
+                self._thread.start()
+
+    def pending(self):
+        return len(self._pending)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self.reap()
+
+    def reap(self, now=None):
+        """Delete every file whose delay has passed; returns how many were deleted"""
+        now = time.monotonic() if now is None else now
+        batch = []
+        with self._lock:
+            while self._pending and self._pending[0][0] <= now:
+                batch.append(heapq.heappop(self._pending)[1])
+
+        deleted = 0
+        for path in batch:
+            try:
+                os.unlink(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.failed += 1
+                logger.warning(f"Could not delete expired segment {path}: {e}")
+        self.deleted += deleted
+        if batch:
+            logger.debug(f"Deleted {deleted} of {len(batch)} expired segments")
+        return deleted
+
+    def close(self, flush=False):
+        """Stop the background thread; with flush, delete everything still queued"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.reap(math.inf)
+
+
+class LivePlaylist:
+    """Sliding-window live media playlist with O(1) work per segment
+
+    Segments are appended as pre-rendered entries to a byte buffer and tracked in a ring of
+    records; sliding the window advances the buffer's head offset and pops the oldest
+    record, so adding a segment never re-renders the others however deep the window is.
+    The window keeps at most window segments and, with dvr_depth, at most dvr_depth
+    seconds. Segments leaving the window are handed to the reaper (when given a path)
+    to delete once they have also left every playlist a player could still hold.
+    """
+
+    def __init__(self, path, target_duration, window=None, dvr_depth=None, reaper=None, writer=None, version=3):
+        if not window and not dvr_depth:
+            raise ValueError("A live playlist needs a window size or a DVR depth")
+        self.path = path
+        self.target_duration = math.ceil(target_duration)
+        self.window = window
+        self.dvr_depth = dvr_depth
+        self.reaper = reaper
+        self.writer = writer or AtomicFileWriter()
+        self.version = version
+        self.media_sequence = 0
+        self.discontinuity_sequence = 0
+        self.duration = 0.0
+        self.ended = False
+        self.records = deque()
+        self._body = bytearray()
+        self._head = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def add_segment(self, uri, duration, tags=(), path=None):
+        """Append one segment (with any tags that precede it) and slide the window"""
+        entry = ''.join(f'{tag}\n' for tag in tags) + f'#EXTINF:{duration:.3f},\n{uri}\n'
+        data = entry.encode('utf-8')
+        self._body += data
+        self.records.append(SegmentRecord(
+            self.media_sequence + len(self.records), len(data), duration, path, '#EXT-X-DISCONTINUITY' in tags
+        ))
+        self.duration += duration
+
+        if duration > self.target_duration + 0.5:
+            logger.warning(f"Segment {uri} ({duration:.3f}s) exceeds target duration {self.target_duration}s")
+            self.target_duration = math.ceil(duration)
+
+        while self.records and (
+            (self.window and len(self.records) > self.window)
+            or (self.dvr_depth and len(self.records) > 1 and self.duration - self.records[0].duration >= self.dvr_depth - 1e-6)
+        ):
+            self._drop_head()
+
+    def _drop_head(self):
+        record = self.records.popleft()
+        self._head += record.size
+        self.duration -= record.duration
+        self.media_sequence += 1
+        if record.discontinuity:
+            self.discontinuity_sequence += 1
+        if self.reaper is not None and record.path is not None:
+            # Available for its own duration plus the longest playlist that could still list it
+            self.reaper.schedule(record.path, record.duration + self.duration)
+
+        # Amortized O(1): the dropped prefix is at least as large as what gets moved
+        if self._head >= COMPACT_MIN_BYTES and self._head * 2 >= len(self._body):
+            del self._body[:self._head]
+            self._head = 0
+
+    def header(self):
+        lines = [
+            '#EXTM3U',
+            f'#EXT-X-VERSION:{self.version}',
+            f'#EXT-X-TARGETDURATION:{self.target_duration}',
+            f'#EXT-X-MEDIA-SEQUENCE:{self.media_sequence}'
+        ]
+        if self.discontinuity_sequence:
+            lines.append(f'#EXT-X-DISCONTINUITY-SEQUENCE:{self.discontinuity_sequence}')
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def render(self):
+        """Return the playlist as bytes"""
+        return self.header() + bytes(self._body[self._head:]) + (b'#EXT-X-ENDLIST\n' if self.ended else b'')
+
+    def publish(self):
+        """Atomically replace the playlist file with the current window"""
+        body = memoryview(self._body)[self._head:]
+        try:
+            self.writer.replace(self.path, self.header(), body, *((b'#EXT-X-ENDLIST\n',) if self.ended else ()))
+        finally:
+            body.release()
+
+    def end(self):
+        """Mark the stream finished and publish the final playlist"""
+        self.ended = True
+        self.publish()
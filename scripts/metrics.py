@@ -0,0 +1,389 @@
+"""
+Prometheus Metrics
+Minimal in-process counters, gauges and fixed-bucket histograms rendered in the
+Prometheus text exposition format, plus the shared instrumentation used by the
+SCTE-35 scripts (disabled unless a textfile or HTTP exporter is configured)
+"""
+
+import atexit
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Latency buckets in seconds, from sub-millisecond cue encodes up to slow probes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    """Metric family holding one child per label value tuple"""
+
+    type_name = 'untyped'
+    suffix = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """Return the child for one combination of label values"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values):
+        """Drop the child for one combination of label values"""
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        family = self.name + self.suffix
+        lines = [f'# HELP {family} {self.documentation}', f'# TYPE {family} {self.type_name}']
+        for name, labels, value in self._samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+        return lines
+
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = 'counter'
+    suffix = '_total'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.value += amount
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield f'{self.name}_total', _format_labels(self.labelnames, key), child.value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default.value = value
+
+    def inc(self, amount=1):
+        self._default.value += amount
+
+    def dec(self, amount=1):
+        self._default.value -= amount
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, key), child.value
+
+
+class _HistogramValue:
+    __slots__ = ('upper_bounds', 'counts', 'sum')
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        # Buckets are "less than or equal", so bisect_left lands on the first bound >= value
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; memory does not grow with the number of observations"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(float(bound) for bound in buckets if bound != float('inf')))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float('inf'),), child.counts):
+                cumulative += count
+                yield f'{self.name}_bucket', _format_labels(self.labelnames, key, ('le', _format_value(bound))), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labelnames, key), child.sum
+            yield f'{self.name}_count', _format_labels(self.labelnames, key), cumulative
+
+
+class Registry:
+    """Collection of metric families rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames=(), **kwargs):
+        metric = self._metrics.get(name)
+        if metric is not None and type(metric) is cls and metric.labelnames == tuple(labelnames):
+            return metric
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+# Instrumentation is off until configure() runs, so timers and counters cost one flag check
+_enabled = False
+
+# Shared script metrics: key -> (metric name, description); histograms are *_seconds
+INSTRUMENTS = {
+    'cue_encode_seconds': ('scte35_cue_encode_seconds', 'Time to encode one SCTE-35 cue'),
+    'cue_decode_seconds': ('scte35_cue_decode_seconds', 'Time to decode one SCTE-35 section'),
+    'cues': ('scte35_cues', 'SCTE-35 cues encoded, decoded, injected or dispatched'),
+    'playlist_inject_seconds': ('scte35_playlist_inject_seconds', 'Time to place SCTE-35 tags into a media playlist'),
+    'playlist_write_seconds': ('scte35_playlist_write_seconds', 'Time to atomically write a playlist'),
+    'playlist_writes': ('scte35_playlist_writes', 'Playlist writes by result (written or unchanged)'),
+    'segments': ('scte35_segments_processed', 'HLS segments processed'),
+    'probe_seconds': ('scte35_probe_duration_seconds', 'Time to probe one input for SCTE-35 streams'),
+    'schedule_seconds': ('scte35_adbreak_operation_seconds', 'Time to validate, schedule or export a set of ad breaks'),
+    'ad_breaks': ('scte35_ad_breaks', 'Ad breaks processed'),
+    'dispatch_jitter_seconds': ('scte35_cue_dispatch_jitter_seconds', 'Delay between an ad break\'s scheduled time and its cue firing'),
+    'rpc_seconds': ('scte35_worker_request_seconds', 'Time to serve one worker JSON-RPC request')
+}
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """Turn instrumentation on, e.g. for a service that serves /metrics itself"""
+    global _enabled
+    _enabled = True
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+# Resolved metric children per (key, labels), so a hot path skips the registry lookups
+_children = {}
+
+
+def _child(kind, key, labels):
+    cache_key = (key, tuple(labels.items()))
+    child = _children.get(cache_key)
+    if child is None:
+        metric = getattr(REGISTRY, kind)(*INSTRUMENTS[key], tuple(labels))
+        child = _children[cache_key] = metric.labels(**labels)
+    return child
+
+
+def timer(key, **labels):
+    """Context manager observing the duration of its block into an INSTRUMENTS histogram"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(_child('histogram', key, labels))
+
+
+def timed(key, **labels):
+    """Decorator observing every call's duration into an INSTRUMENTS histogram"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _child('histogram', key, labels).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def inc(key, amount=1, **labels):
+    """Add to an INSTRUMENTS counter"""
+    if _enabled:
+        _child('counter', key, labels).value += amount
+
+
+def observe(key, value, **labels):
+    """Record one value into an INSTRUMENTS histogram"""
+    if _enabled:
+        _child('histogram', key, labels).observe(value)
+
+
+def write_textfile(path, registry=REGISTRY):
+    """Atomically write the registry for the node_exporter textfile collector"""
+    # hls_playlist instruments itself with this module, so it is imported on use
+    from hls_playlist import AtomicFileWriter
+    AtomicFileWriter().write(path, registry.render())
+
+
+class _MetricsHandler:
+    """GET /metrics; mixed into BaseHTTPRequestHandler when the exporter starts"""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        data = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='0.0.0.0', registry=REGISTRY):
+    """Serve GET /metrics from a daemon thread"""
+    # Imported here: http.server is a noticeable share of startup for runs without an exporter
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    handler = type('MetricsHandler', (_MetricsHandler, BaseHTTPRequestHandler), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True)
+    thread.start()
+    return server
+
+
+def configure(textfile=None, port=None, host='0.0.0.0'):
+    """Enable instrumentation when an exporter is requested
+
+    textfile is rewritten at exit (and whenever write_textfile is called), port starts
+    an HTTP exporter. Without either, instrumentation stays disabled.
+    """
+    if not textfile and not port:
+        return False
+    enable()
+    if port:
+        start_http_server(port, host)
+    if textfile:
+        atexit.register(write_textfile, textfile)
+    return True
+
+
+def add_arguments(parser):
+    """Add the shared --metrics-textfile/--metrics-port options to a script's parser"""
+    parser.add_argument('--metrics-textfile', default=os.environ.get('SCTE35_METRICS_TEXTFILE'),
+                        help='Write Prometheus metrics to this .prom file at exit (textfile collector)')
+    parser.add_argument('--metrics-port', type=int, default=int(os.environ.get('SCTE35_METRICS_PORT', 0)) or None,
+                        help='Serve Prometheus metrics on this port while running')
+    return parser
+
+
+def configure_from_args(args):
+    return configure(args.metrics_textfile, args.metrics_port)
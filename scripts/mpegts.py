@@ -0,0 +1,661 @@
+"""
+MPEG-TS Packet Scanner
+Vectorized PID filtering and PSI/SCTE-35 section reassembly over memory-mapped TS files
+"""
+
+import logging
+import mmap
+import time
+from collections import deque
+from pathlib import Path
+from lazy_imports import lazy_import
+
+# Loaded on the first scan, so importing this module for its constants stays cheap
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+PAT_PID = 0x0000
+NULL_PID = 0x1FFF
+STREAM_TYPE_SCTE35 = 0x86
+REGISTRATION_DESCRIPTOR = 0x05
+SCTE35_REGISTRATION = b'CUEI'
+
+# 65536 packets per chunk is ~12 MB, large enough to amortize the NumPy calls
+DEFAULT_CHUNK_PACKETS = 65536
+
+# 27 MHz system clock and 33-bit 90 kHz PTS
+PCR_HZ = 27000000
+PTS_HZ = 90000
+PTS_WRAP = 1 << 33
+
+# ETR 290 limits: PCR repetition 40 ms, PCR discontinuity 100 ms, PAT/PMT repetition 500 ms
+PCR_REPETITION_LIMIT = 0.04
+PCR_DISCONTINUITY_LIMIT = 0.1
+PSI_REPETITION_LIMIT = 0.5
+
+VIDEO_STREAM_TYPES = (0x01, 0x02, 0x1B, 0x24)
+
+# TSHealthMonitor counters and their metric descriptions
+HEALTH_COUNTERS = {
+    'packets': 'TS packets received',
+    'bytes': 'TS bytes received',
+    'sync_errors': 'Packets without a sync byte and sync losses (ETR 290 1.1/1.2)',
+    'transport_errors': 'Packets with transport_error_indicator set (ETR 290 2.1)',
+    'cc_errors': 'Continuity counter errors (ETR 290 1.4)',
+    'pat_errors': 'PAT repetition gaps over 500 ms (ETR 290 1.3)',
+    'pmt_errors': 'PMT repetition gaps over 500 ms (ETR 290 1.5)',
+    'pcr_repetition_errors': 'PCR intervals over 40 ms (ETR 290 2.3a)',
+    'pcr_discontinuities': 'PCR jumps over 100 ms without discontinuity_indicator (ETR 290 2.3b)',
+    'cues': 'SCTE-35 sections received',
+    'cues_unaligned': 'SCTE-35 splice points more than one frame from an IDR'
+}
+
+# Health histogram buckets in seconds
+PCR_JITTER_BUCKETS = (1e-7, 2.5e-7, 5e-7, 1e-6, 1e-5, 1e-4, 1e-3, 1e-2)
+PCR_INTERVAL_BUCKETS = (0.01, 0.02, 0.03, 0.04, 0.06, 0.1, 0.5)
+CUE_DRIFT_BUCKETS = (0.0, 0.001, 0.01, 0.02, 0.04, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+
+def find_sync_offset(data, probe_packets=5):
+    """Find the first offset where consecutive TS sync bytes line up"""
+    for offset in range(min(TS_PACKET_SIZE, len(data))):
+        positions = range(offset, min(len(data), offset + probe_packets * TS_PACKET_SIZE), TS_PACKET_SIZE)
+        if all(data[pos] == TS_SYNC_BYTE for pos in positions):
+            return offset
+    raise ValueError("No MPEG-TS sync byte found")
+
+
+def packet_pids(packets):
+    """Return the 13-bit PID of every packet in an (n, 188) uint8 array"""
+    return ((packets[:, 1].astype(np.uint16) & 0x1F) << 8) | packets[:, 2]
+
+
+def packet_payload(packet):
+    """Return the payload bytes of a single TS packet, or None if it carries none"""
+    adaptation_field_control = (packet[3] >> 4) & 0x03
+    if not adaptation_field_control & 0x01:
+        return None
+    start = 4
+    if adaptation_field_control & 0x02:
+        start += 1 + packet[4]
+    if start >= TS_PACKET_SIZE:
+        return None
+    return packet[start:]
+
+
+def parse_descriptors(data):
+    """Parse a descriptor loop into a list of (tag, payload) tuples"""
+    descriptors = []
+    i = 0
+    while i + 2 <= len(data):
+        tag, length = data[i], data[i + 1]
+        descriptors.append((tag, bytes(data[i + 2:i + 2 + length])))
+        i += 2 + length
+    return descriptors
+
+
+def parse_pat(section):
+    """Parse a PAT section into a {program_number: pmt_pid} mapping"""
+    if section[0] != 0x00:
+        raise ValueError(f"Not a PAT section (table_id 0x{section[0]:02x})")
+    programs = {}
+    end = len(section) - 4
+    for i in range(8, end, 4):
+        program_number = (section[i] << 8) | section[i + 1]
+        pid = ((section[i + 2] & 0x1F) << 8) | section[i + 3]
+        if program_number != 0:
+            programs[program_number] = pid
+    return programs
+
+
+def parse_pmt(section):
+    """Parse a PMT section into program and elementary stream information"""
+    if section[0] != 0x02:
+        raise ValueError(f"Not a PMT section (table_id 0x{section[0]:02x})")
+    program_info_length = ((section[10] & 0x0F) << 8) | section[11]
+    pmt = {
+        'program_number': (section[3] << 8) | section[4],
+        'pcr_pid': ((section[8] & 0x1F) << 8) | section[9],
+        'descriptors': parse_descriptors(section[12:12 + program_info_length]),
+        'streams': []
+    }
+
+    i = 12 + program_info_length
+    end = len(section) - 4
+    while i + 5 <= end:
+        es_info_length = ((section[i + 3] & 0x0F) << 8) | section[i + 4]
+        pmt['streams'].append({
+            'stream_type': section[i],
+            'pid': ((section[i + 1] & 0x1F) << 8) | section[i + 2],
+            'descriptors': parse_descriptors(section[i + 5:i + 5 + es_info_length])
+        })
+        i += 5 + es_info_length
+
+    return pmt
+
+
+def is_scte35_stream(stream):
+    """SCTE-35 by stream_type 0x86 or a CUEI registration descriptor on the elementary stream"""
+    if stream['stream_type'] == STREAM_TYPE_SCTE35:
+        return True
+    return any(
+        tag == REGISTRATION_DESCRIPTOR and payload[:4] == SCTE35_REGISTRATION
+        for tag, payload in stream['descriptors']
+    )
+
+
+def parse_pcr(packet):
+    """Return the PCR of a packet in 27 MHz ticks, or None if it carries none"""
+    if not packet[3] & 0x20 or packet[4] < 7 or not packet[5] & 0x10:
+        return None
+    base = (packet[6] << 25) | (packet[7] << 17) | (packet[8] << 9) | (packet[9] << 1) | (packet[10] >> 7)
+    return base * 300 + (((packet[10] & 0x01) << 8) | packet[11])
+
+
+def parse_pes_pts(payload):
+    """Return the PTS of a PES header in 90 kHz ticks, or None if absent"""
+    if len(payload) < 14 or payload[:3] != b'\x00\x00\x01' or not payload[7] & 0x80:
+        return None
+    return (
+        ((payload[9] >> 1) & 0x07) << 30 | payload[10] << 22 | (payload[11] >> 1) << 15
+        | payload[12] << 7 | payload[13] >> 1
+    )
+
+
+def parse_splice_pts(section):
+    """Return the splice point PTS of a splice_insert/time_signal section (pts_adjustment applied)
+
+    Returns None for immediate, component-mode, cancelled or other commands.
+    """
+    if len(section) < 19 or section[0] != 0xFC:
+        return None
+    pts_adjustment = ((section[4] & 0x01) << 32) | int.from_bytes(section[5:9], 'big')
+    command_type = section[13]
+
+    if command_type == 0x05:
+        if section[18] & 0x80 or len(section) < 25:
+            return None
+        flags = section[19]
+        if not flags & 0x40 or flags & 0x10:
+            return None
+        offset = 20
+    elif command_type == 0x06:
+        offset = 14
+    else:
+        return None
+
+    if not section[offset] & 0x80:
+        return None
+    pts = ((section[offset] & 0x01) << 32) | int.from_bytes(section[offset + 1:offset + 5], 'big')
+    return (pts + pts_adjustment) % PTS_WRAP
+
+
+def pts_delta(a, b):
+    """Signed a - b in 90 kHz ticks across the 33-bit wrap"""
+    delta = (a - b) % PTS_WRAP
+    return delta - PTS_WRAP if delta >= PTS_WRAP // 2 else delta
+
+
+class SectionAssembler:
+    """Reassemble PSI/SCTE-35 sections for one PID from consecutive TS packets"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def push(self, packet):
+        """Feed one 188-byte packet and return any sections it completes"""
+        payload = packet_payload(packet)
+        if payload is None:
+            return []
+
+        sections = []
+        if packet[1] & 0x40:
+            # payload_unit_start_indicator: the pointer field says where the new section begins
+            pointer = payload[0]
+            if self.buffer:
+                self.buffer += payload[1:1 + pointer]
+                sections.extend(self._drain())
+            self.buffer = bytearray(payload[1 + pointer:])
+        elif self.buffer:
+            self.buffer += payload
+        else:
+            return []
+
+        sections.extend(self._drain())
+        return sections
+
+    def _drain(self):
+        """Pop every complete section from the buffer"""
+        sections = []
+        while len(self.buffer) >= 3:
+            if self.buffer[0] == 0xFF:
+                # Stuffing after the last section in the packet
+                self.buffer.clear()
+                break
+            length = (((self.buffer[1] & 0x0F) << 8) | self.buffer[2]) + 3
+            if len(self.buffer) < length:
+                break
+            sections.append(bytes(self.buffer[:length]))
+            del self.buffer[:length]
+        return sections
+
+
+class TSScanner:
+    """Single-pass SCTE-35 section extractor for MPEG-TS files"""
+
+    def __init__(self, input_file=None, chunk_packets=DEFAULT_CHUNK_PACKETS):
+        self.input_file = Path(input_file) if input_file else None
+        self.chunk_packets = chunk_packets
+        self.pmts = {}
+        self.scte35_pids = set()
+        self.stats = {}
+
+    def _chunks(self, mm, offset):
+        """Yield (first_packet_number, packets) views of aligned chunks"""
+        total = (len(mm) - offset) // TS_PACKET_SIZE
+        for first in range(0, total, self.chunk_packets):
+            count = min(self.chunk_packets, total - first)
+            packets = np.frombuffer(
+                mm, dtype=np.uint8, count=count * TS_PACKET_SIZE,
+                offset=offset + first * TS_PACKET_SIZE
+            ).reshape(count, TS_PACKET_SIZE)
+            yield first, packets
+
+    def _discover(self, mm, offset):
+        """Find the SCTE-35 PIDs from the PAT and PMTs at the start of the file"""
+        pat_assembler = SectionAssembler()
+        pmt_assemblers = {}
+
+        for _, packets in self._chunks(mm, offset):
+            pids = packet_pids(packets)
+
+            if not pmt_assemblers:
+                for i in np.flatnonzero(pids == PAT_PID):
+                    for section in pat_assembler.push(packets[i].tobytes()):
+                        if section[0] == 0x00:
+                            for pmt_pid in parse_pat(section).values():
+                                pmt_assemblers[pmt_pid] = SectionAssembler()
+                    if pmt_assemblers:
+                        break
+
+            # PMTs may precede or follow the PAT within the chunk, so search it again
+            pending = [pid for pid in pmt_assemblers if pid not in self.pmts]
+            for i in np.flatnonzero(np.isin(pids, pending)):
+                pid = int(pids[i])
+                for section in pmt_assemblers[pid].push(packets[i].tobytes()):
+                    if section[0] == 0x02 and pid not in self.pmts:
+                        self.pmts[pid] = parse_pmt(section)
+
+            if pmt_assemblers and len(self.pmts) == len(pmt_assemblers):
+                break
+
+        for pmt in self.pmts.values():
+            for stream in pmt['streams']:
+                if is_scte35_stream(stream):
+                    self.scte35_pids.add(stream['pid'])
+
+        return self.scte35_pids
+
+    def _scan(self, data, offset, counters):
+        """Yield (packet_number, pid, section_bytes) for SCTE-35 sections in an aligned buffer"""
+        wanted = np.array(sorted(self.scte35_pids), dtype=np.uint16)
+        assemblers = {pid: SectionAssembler() for pid in self.scte35_pids}
+
+        packets = None
+        try:
+            for first, packets in self._chunks(data, offset):
+                counters['packets'] += len(packets)
+                in_sync = packets[:, 0] == TS_SYNC_BYTE
+                counters['sync_errors'] += int(len(packets) - np.count_nonzero(in_sync))
+
+                if not len(wanted):
+                    continue
+
+                mask = np.isin(packet_pids(packets), wanted) & in_sync
+                for i in np.flatnonzero(mask):
+                    packet = packets[i].tobytes()
+                    pid = ((packet[1] & 0x1F) << 8) | packet[2]
+                    counters['scte35_packets'] += 1
+                    for section in assemblers[pid].push(packet):
+                        if section[0] == 0xFC:
+                            counters['sections'] += 1
+                            yield first + int(i), pid, section
+        finally:
+            # Release the NumPy view before the underlying buffer is closed
+            packets = None
+
+    def _finish_stats(self, size, started, counters):
+        elapsed = time.perf_counter() - started
+        self.stats = dict(
+            counters,
+            file=str(self.input_file) if self.input_file else None,
+            bytes=size,
+            scte35_pids=sorted(self.scte35_pids),
+            elapsed=elapsed,
+            packets_per_sec=counters['packets'] / elapsed if elapsed > 0 else 0.0,
+            bytes_per_sec=size / elapsed if elapsed > 0 else 0.0
+        )
+        if counters['sync_errors']:
+            logger.warning(f"{counters['sync_errors']} packets without sync byte skipped in {self.input_file or 'buffer'}")
+
+    def iter_sections(self):
+        """Yield (packet_number, pid, section_bytes) for every SCTE-35 section in the file"""
+        started = time.perf_counter()
+        file_size = self.input_file.stat().st_size
+        counters = {'packets': 0, 'scte35_packets': 0, 'sections': 0, 'sync_errors': 0}
+
+        if file_size >= TS_PACKET_SIZE:
+            with open(self.input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = find_sync_offset(mm)
+
+                if not self._discover(mm, offset):
+                    logger.warning(f"No SCTE-35 PID (stream_type 0x86) found in PMT of {self.input_file}")
+
+                for item in self._scan(mm, offset, counters):
+                    yield item
+
+        self._finish_stats(file_size, started, counters)
+
+    def probe(self, data, max_sections=4):
+        """Parse PAT/PMT and the first SCTE-35 sections of an in-memory TS capture"""
+        started = time.perf_counter()
+        counters = {'packets': 0, 'scte35_packets': 0, 'sections': 0, 'sync_errors': 0}
+        sections = []
+
+        if len(data) >= TS_PACKET_SIZE:
+            offset = find_sync_offset(data)
+            self._discover(data, offset)
+            for item in self._scan(data, offset, counters):
+                sections.append(item)
+                if len(sections) >= max_sections:
+                    break
+
+        self._finish_stats(len(data), started, counters)
+        return sections
+
+
+class TSHealthMonitor:
+    """Incremental ETR 290-style health counters for one live TS feed
+
+    Feed arbitrary byte chunks with feed(); memory stays fixed regardless of how long
+    the feed runs. Tracks sync loss, transport errors, continuity counter errors, PAT/PMT
+    repetition, PCR repetition, PCR accuracy (against the byte-interpolated PCR of a CBR
+    stream) and arrival jitter, and how far each SCTE-35 splice point lands from the
+    nearest IDR frame and from the segment grid. Observations go to Prometheus metrics
+    labelled by channel when a registry is given.
+    """
+
+    def __init__(self, channel, registry=None, segment_duration=2.0, max_pending_cues=32):
+        self.channel = channel
+        self.segment_ticks = int(segment_duration * PTS_HZ)
+        self.counters = dict.fromkeys(HEALTH_COUNTERS, 0)
+        self.pat = {}
+        self.pmts = {}
+        self.video_pid = None
+        self.pcr_pid = None
+        self.scte35_pids = set()
+
+        self._remainder = b''
+        self._cc = {}
+        self._psi = {PAT_PID: SectionAssembler()}
+        self._psi_seen = {}
+        self._scte35 = {}
+        self._pcr = None
+        self._rate = None
+        self._keyframes = deque(maxlen=8)
+        self._segment_start = None
+        self._pending_cues = deque(maxlen=max_pending_cues)
+        self._metrics = self._bind_metrics(registry) if registry is not None else None
+
+    def _bind_metrics(self, registry):
+        """Resolve the per-channel metric children once so observations are attribute lookups"""
+        labels = (self.channel,)
+        counters = {
+            name: registry.counter(f'scte35_ts_{name}', documentation, ('channel',)).labels(*labels)
+            for name, documentation in HEALTH_COUNTERS.items()
+        }
+        return {
+            'counters': counters,
+            'pcr_accuracy': registry.histogram(
+                'scte35_ts_pcr_accuracy_seconds', 'Absolute PCR error against the byte-interpolated PCR',
+                ('channel',), PCR_JITTER_BUCKETS).labels(*labels),
+            'pcr_jitter': registry.histogram(
+                'scte35_ts_pcr_arrival_jitter_seconds', 'Absolute difference between PCR and arrival time deltas',
+                ('channel',), PCR_JITTER_BUCKETS).labels(*labels),
+            'pcr_interval': registry.histogram(
+                'scte35_ts_pcr_interval_seconds', 'Interval between consecutive PCRs',
+                ('channel',), PCR_INTERVAL_BUCKETS).labels(*labels),
+            'idr_drift': registry.histogram(
+                'scte35_cue_idr_drift_seconds', 'Distance from a splice point to the nearest IDR frame',
+                ('channel',), CUE_DRIFT_BUCKETS).labels(*labels),
+            'segment_drift': registry.histogram(
+                'scte35_cue_segment_drift_seconds', 'Distance from a splice point to the nearest segment boundary',
+                ('channel',), CUE_DRIFT_BUCKETS).labels(*labels),
+            'bitrate': registry.gauge(
+                'scte35_ts_bitrate_bps', 'Transport stream bitrate estimated from PCR', ('channel',)).labels(*labels)
+        }
+
+    def _count(self, name, amount=1):
+        self.counters[name] += amount
+        if self._metrics is not None and amount:
+            self._metrics['counters'][name].inc(amount)
+
+    def _observe(self, name, value):
+        if self._metrics is not None:
+            self._metrics[name].observe(value)
+
+    def feed(self, data, arrival=None):
+        """Process the next chunk of the feed; arrival is its receive time in seconds"""
+        data = self._remainder + bytes(data) if self._remainder else bytes(data)
+        offset = 0
+        if data[:1] != bytes([TS_SYNC_BYTE]):
+            try:
+                offset = find_sync_offset(data, probe_packets=min(5, max(1, len(data) // TS_PACKET_SIZE)))
+            except ValueError:
+                # No sync anywhere in the chunk: keep the tail in case the next chunk completes it
+                self._count('sync_errors')
+                self._remainder = data[-(TS_PACKET_SIZE - 1):]
+                return
+            self._count('sync_errors')
+
+        count = (len(data) - offset) // TS_PACKET_SIZE
+        end = offset + count * TS_PACKET_SIZE
+        self._remainder = data[end:]
+        if not count:
+            return
+
+        packets = np.frombuffer(data, dtype=np.uint8, count=count * TS_PACKET_SIZE, offset=offset).reshape(count, TS_PACKET_SIZE)
+        first_byte = self.counters['bytes'] + offset
+        self._count('packets', count)
+        self._count('bytes', end)
+        self._process(packets, first_byte, arrival)
+
+    def _process(self, packets, first_byte, arrival):
+        in_sync = packets[:, 0] == TS_SYNC_BYTE
+        self._count('sync_errors', int(len(packets) - np.count_nonzero(in_sync)))
+        self._count('transport_errors', int(np.count_nonzero(packets[:, 1] & 0x80)))
+
+        pids = packet_pids(packets)
+        valid = in_sync & (pids != NULL_PID)
+        self._check_continuity(packets, pids, valid)
+
+        # Only PSI, PCR, video PUSI and SCTE-35 packets need per-packet work
+        pusi = (packets[:, 1] & 0x40) != 0
+        interesting = np.isin(pids, list(self._psi) + list(self._scte35))
+        if self.pcr_pid is not None:
+            interesting |= (pids == self.pcr_pid) & ((packets[:, 3] & 0x20) != 0)
+        if self.video_pid is not None:
+            interesting |= (pids == self.video_pid) & pusi
+
+        for i in np.flatnonzero(interesting & valid):
+            packet = packets[i].tobytes()
+            pid = int(pids[i])
+            if pid == self.pcr_pid:
+                pcr = parse_pcr(packet)
+                if pcr is not None:
+                    self._on_pcr(pcr, first_byte + int(i) * TS_PACKET_SIZE, arrival, packet)
+            if pid == self.video_pid and packet[1] & 0x40:
+                self._on_video(packet)
+            if pid in self._psi:
+                for section in self._psi[pid].push(packet):
+                    self._on_psi(pid, section)
+            elif pid in self._scte35:
+                for section in self._scte35[pid].push(packet):
+                    self._on_cue(section)
+
+    def _check_continuity(self, packets, pids, valid):
+        """Count continuity_counter errors per PID, vectorized over the chunk"""
+        index = np.flatnonzero(valid)
+        if not len(index):
+            return
+        order = index[np.argsort(pids[index], kind='stable')]
+        pid = pids[order]
+        cc = packets[order, 3] & 0x0F
+        has_payload = (packets[order, 3] & 0x10) != 0
+        discontinuity = ((packets[order, 3] & 0x20) != 0) & (packets[order, 4] > 0) & ((packets[order, 5] & 0x80) != 0)
+
+        # Previous counter for every packet: the packet before it on the same PID, or the last chunk's
+        same_pid = np.zeros(len(order), dtype=bool)
+        same_pid[1:] = pid[1:] == pid[:-1]
+        previous = np.empty(len(order), dtype=np.int16)
+        previous[1:] = cc[:-1]
+        firsts = np.flatnonzero(~same_pid)
+        known = np.zeros(len(order), dtype=bool)
+        known[same_pid] = True
+        for i in firsts:
+            last = self._cc.get(int(pid[i]))
+            if last is not None:
+                previous[i] = last
+                known[i] = True
+
+        expected = (previous + has_payload) & 0x0F
+        # A single duplicate packet (same counter, with payload) is allowed
+        duplicate = has_payload & (cc == previous)
+        errors = known & ~discontinuity & (cc != expected) & ~duplicate
+        self._count('cc_errors', int(np.count_nonzero(errors)))
+
+        lasts = np.append(firsts[1:] - 1, len(order) - 1)
+        for i in lasts:
+            self._cc[int(pid[i])] = int(cc[i])
+
+    def _now(self):
+        """Current stream time in seconds from the last PCR"""
+        return self._pcr[0] / PCR_HZ if self._pcr else None
+
+    def _on_psi(self, pid, section):
+        now = self._now()
+        if pid == PAT_PID and section[0] == 0x00:
+            self._psi_seen[PAT_PID] = now
+            pat = parse_pat(section)
+            if pat != self.pat:
+                self.pat = pat
+                for pmt_pid in pat.values():
+                    self._psi.setdefault(pmt_pid, SectionAssembler())
+        elif section[0] == 0x02:
+            self._psi_seen[pid] = now
+            pmt = parse_pmt(section)
+            if self.pmts.get(pid) != pmt:
+                self.pmts[pid] = pmt
+                self._on_pmt_change()
+
+    def _on_pmt_change(self):
+        self.scte35_pids = set()
+        self.video_pid = None
+        self.pcr_pid = None
+        for pmt in self.pmts.values():
+            if self.pcr_pid is None:
+                self.pcr_pid = pmt['pcr_pid']
+            for stream in pmt['streams']:
+                if is_scte35_stream(stream):
+                    self.scte35_pids.add(stream['pid'])
+                elif self.video_pid is None and stream['stream_type'] in VIDEO_STREAM_TYPES:
+                    self.video_pid = stream['pid']
+        for pid in self.scte35_pids:
+            self._scte35.setdefault(pid, SectionAssembler())
+
+    def _check_psi_repetition(self, now):
+        """PAT/PMT must repeat at least every 500 ms; count each gap once"""
+        for pid, seen in list(self._psi_seen.items()):
+            if seen is not None and now - seen > PSI_REPETITION_LIMIT:
+                self._count('pat_errors' if pid == PAT_PID else 'pmt_errors')
+                self._psi_seen[pid] = None
+
+    def _on_pcr(self, pcr, position, arrival, packet):
+        discontinuity_indicator = packet[5] & 0x80
+        previous = self._pcr
+        self._pcr = (pcr, position, arrival)
+        if previous is None or discontinuity_indicator:
+            self._rate = None
+            return
+
+        ticks = (pcr - previous[0]) % (PTS_WRAP * 300)
+        interval = ticks / PCR_HZ
+        if interval > PCR_DISCONTINUITY_LIMIT:
+            self._count('pcr_discontinuities')
+            self._rate = None
+            return
+        if interval > PCR_REPETITION_LIMIT:
+            self._count('pcr_repetition_errors')
+        self._observe('pcr_interval', interval)
+        self._check_psi_repetition(pcr / PCR_HZ)
+
+        size = position - previous[1]
+        if self._rate is not None:
+            # PCR_AC: the PCR a constant-bitrate mux would have stamped at this byte position
+            predicted = size / self._rate
+            self._observe('pcr_accuracy', abs(interval - predicted))
+        if arrival is not None and previous[2] is not None and arrival != previous[2]:
+            self._observe('pcr_jitter', abs(interval - (arrival - previous[2])))
+        if ticks:
+            self._rate = size / interval
+            if self._metrics is not None:
+                self._metrics['bitrate'].set(self._rate * 8)
+
+    def _on_video(self, packet):
+        """Track IDR PTS (random_access_indicator on a PES start) and the segment grid"""
+        random_access = packet[3] & 0x20 and packet[4] > 0 and packet[5] & 0x40
+        if not random_access:
+            return
+        payload = packet_payload(packet)
+        pts = parse_pes_pts(payload) if payload is not None else None
+        if pts is None:
+            return
+
+        # Segment boundaries fall on the first IDR at least segment_duration after the last
+        if self._segment_start is None or pts_delta(pts, self._segment_start) >= self.segment_ticks:
+            self._segment_start = pts
+        self._keyframes.append(pts)
+
+        while self._pending_cues and pts_delta(pts, self._pending_cues[0]) >= 0:
+            self._resolve_cue(self._pending_cues.popleft(), pts)
+
+    def _on_cue(self, section):
+        splice_pts = parse_splice_pts(section)
+        self._count('cues')
+        if splice_pts is not None:
+            self._pending_cues.append(splice_pts)
+
+    def _resolve_cue(self, splice_pts, next_keyframe):
+        """Record IDR and segment-grid drift for a splice point once the IDR after it has arrived"""
+        idr_drift = min(abs(pts_delta(keyframe, splice_pts)) for keyframe in self._keyframes) / PTS_HZ
+        self._observe('idr_drift', idr_drift)
+        if idr_drift > 1.0 / 60:
+            self._count('cues_unaligned')
+
+        if self.segment_ticks:
+            offset = pts_delta(splice_pts, self._segment_start) % self.segment_ticks
+            self._observe('segment_drift', min(offset, self.segment_ticks - offset) / PTS_HZ)
+
+    def summary(self):
+        """Return counters and discovered PIDs as a plain dict"""
+        return dict(
+            self.counters,
+            channel=self.channel,
+            video_pid=self.video_pid,
+            pcr_pid=self.pcr_pid,
+            scte35_pids=sorted(self.scte35_pids),
+            bitrate_bps=self._rate * 8 if self._rate else None
+        )
@@ -0,0 +1,276 @@
+"""
+Streaming Schedule Ingestion
+Incremental NDJSON/CSV readers and generator stages (validate, schedule, emit) for
+ad-break schedules too large to load at once; memory stays flat with schedule length
+"""
+
+import csv
+import heapq
+import json
+import logging
+import sys
+from collections import deque
+from datetime import datetime, timezone
+from ad_schedule import (
+    DEFAULT_PROVIDER_ID,
+    DEFAULT_PROVIDER_NAME,
+    DEFAULT_SEGMENT_DURATION,
+    REQUIRED_FIELDS,
+    event_id_for,
+    make_conflict
+)
+from schedule_time import ScheduledTimeParser
+
+logger = logging.getLogger(__name__)
+
+STREAMING_SUFFIXES = ('.ndjson', '.jsonl', '.csv')
+
+# Entries may arrive up to this many positions out of time order; the scheduler holds
+# them in a heap of this size, so it also bounds how far output lags behind input
+DEFAULT_REORDER_WINDOW = 1024
+
+# Carried through scheduling only when present, for conflict checks downstream
+OPTIONAL_FIELDS = ('channel', 'splice_event_id')
+
+# CSV cells are text; these columns are converted back to numbers
+CSV_NUMERIC_FIELDS = {'duration': float, 'pts_time': float, 'splice_event_id': int}
+
+
+def is_streaming_schedule(path):
+    """True for schedules read incrementally: NDJSON, CSV or '-' (NDJSON on stdin)"""
+    return str(path) == '-' or str(path).lower().endswith(STREAMING_SUFFIXES)
+
+
+def _csv_rows(f):
+    for row in csv.DictReader(f):
+        for field, convert in CSV_NUMERIC_FIELDS.items():
+            value = row.get(field)
+            if value in ('', None):
+                row.pop(field, None)
+            else:
+                try:
+                    row[field] = convert(value)
+                except ValueError:
+                    pass  # left as text for validation to report
+        yield row
+
+
+def _ndjson_rows(f):
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON - {e}")
+
+
+def read_schedule(path, key='ad_breaks'):
+    """Yield schedule entries from an NDJSON, CSV or JSON file
+
+    NDJSON and CSV are read one line at a time. A JSON document has to be parsed whole;
+    a list is used as-is and an object contributes its key list (e.g. 'ad_breaks'). key
+    may also be a tuple of names, of which the first one present is used.
+    """
+    if str(path) == '-':
+        yield from _ndjson_rows(sys.stdin)
+        return
+
+    lower = str(path).lower()
+    with open(path, 'r', newline='' if lower.endswith('.csv') else None) as f:
+        if lower.endswith('.csv'):
+            yield from _csv_rows(f)
+        elif lower.endswith(('.ndjson', '.jsonl')):
+            yield from _ndjson_rows(f)
+        else:
+            document = json.load(f)
+            if not isinstance(document, dict):
+                yield from document
+                return
+            for name in (key,) if isinstance(key, str) else key:
+                if document.get(name):
+                    yield from document[name]
+                    return
+
+
+def validate_stream(entries, parser=None):
+    """Check each entry as it arrives and yield a copy with scheduled_time parsed
+
+    Raises ValueError at the first invalid entry, with the same messages as the
+    whole-file validation.
+    """
+    parser = parser or ScheduledTimeParser()
+    for i, entry in enumerate(entries):
+        for field in REQUIRED_FIELDS:
+            if field not in entry:
+                raise ValueError(f"Ad break {i}: Missing '{field}' field")
+        duration = entry['duration']
+        if not isinstance(duration, (int, float)) or not duration > 0:
+            raise ValueError(f"Ad break {i}: Duration must be positive")
+        try:
+            scheduled_time = parser.parse(entry['scheduled_time'])
+        except Exception as e:
+            raise ValueError(f"Ad break {i}: Invalid scheduled time - {e}")
+        yield dict(entry, scheduled_time=scheduled_time)
+
+
+def schedule_stream(entries, reference_time=None, window=DEFAULT_REORDER_WINDOW, stats=None, skip_past=True):
+    """Drop past breaks and yield the rest in time order with time_from_reference
+
+    Breaks up to window entries out of time order are sorted; a break further out
+    cannot be placed any more, so it is logged and dropped. stats, if given, is a dict
+    that receives the scheduled, skipped and late counts. With skip_past False every
+    past break is kept, e.g. to validate a schedule.
+    """
+    reference_time = reference_time or datetime.now(timezone.utc)
+    stats = stats if stats is not None else {}
+    stats.update(scheduled=0, skipped=0, late=0)
+    heap = []
+    last = None
+
+    def record(ad_break):
+        nonlocal last
+        if last is not None and ad_break['scheduled_time'] < last:
+            stats['late'] += 1
+            logger.warning(
+                f"Ad break {ad_break['id']} is more than {window} entries out of time order and was dropped; "
+                f"sort the schedule or raise the reorder window"
+            )
+            return None
+        last = ad_break['scheduled_time']
+        stats['scheduled'] += 1
+        return {
+            'id': ad_break['id'],
+            'scheduled_time': ad_break['scheduled_time'],
+            'time_from_reference': (ad_break['scheduled_time'] - reference_time).total_seconds(),
+            'duration': ad_break['duration'],
+            'ad_id': ad_break['ad_id'],
+            'name': ad_break.get('name'),
+            'provider_id': ad_break.get('provider_id', DEFAULT_PROVIDER_ID),
+            'provider_name': ad_break.get('provider_name', DEFAULT_PROVIDER_NAME),
+            **{field: ad_break[field] for field in OPTIONAL_FIELDS if ad_break.get(field) is not None}
+        }
+
+    for sequence, ad_break in enumerate(entries):
+        if skip_past and ad_break['scheduled_time'] < reference_time:
+            stats['skipped'] += 1
+            continue
+        # sequence breaks ties, so equal times keep their input order
+        heapq.heappush(heap, (ad_break['scheduled_time'], sequence, ad_break))
+        if len(heap) > window:
+            scheduled = record(heapq.heappop(heap)[2])
+            if scheduled is not None:
+                yield scheduled
+
+    while heap:
+        scheduled = record(heapq.heappop(heap)[2])
+        if scheduled is not None:
+            yield scheduled
+
+
+def check_stream(records, min_duration=DEFAULT_SEGMENT_DURATION, window=DEFAULT_REORDER_WINDOW, strict=False):
+    """Pass time-ordered records through, logging a warning for each conflicting break
+
+    With strict, the first conflict raises ValueError instead. Overlaps are checked
+    against the previous break on the same channel and reused splice_event_ids against
+    the last window breaks, so memory does not grow with the schedule.
+    """
+    last_end = {}
+    recent = {}
+    for ad_break in records:
+        channel = ad_break.get('channel')
+        ad_break_id = ad_break['id']
+        start = ad_break['scheduled_time'].timestamp()
+        conflict = None
+
+        previous = last_end.get(channel)
+        if previous is not None and start < previous[0]:
+            conflict = make_conflict('overlap', ad_break_id, previous[1], channel)
+
+        event_id = ad_break.get('splice_event_id')
+        event_id = event_id if event_id is not None else event_id_for(ad_break_id)
+        seen = recent.setdefault(channel, (deque(maxlen=window), {}))
+        order, holders = seen
+        if conflict is None and event_id >= 0 and event_id in holders:
+            conflict = make_conflict('duplicate_event_id', ad_break_id, holders[event_id], channel, event_id=event_id)
+
+        if conflict is None and min_duration and ad_break['duration'] < min_duration:
+            conflict = make_conflict('short', ad_break_id, None, channel, duration=ad_break['duration'], min_duration=min_duration)
+
+        if conflict is not None:
+            if strict:
+                raise ValueError(conflict['message'])
+            logger.warning(conflict['message'])
+
+        end = start + ad_break['duration']
+        if previous is None or end > previous[0]:
+            last_end[channel] = (end, ad_break_id)
+        if event_id >= 0:
+            if len(order) == order.maxlen:
+                expired = order[0]
+                if holders.get(expired[0]) == expired[1]:
+                    del holders[expired[0]]
+            order.append((event_id, ad_break_id))
+            holders[event_id] = ad_break_id
+        yield ad_break
+
+
+def _write_array(f, entries, indent, default):
+    encode = json.JSONEncoder(default=default).encode
+    count = 0
+    f.write('[')
+    for entry in entries:
+        f.write(',\n' if count else '\n')
+        f.write(' ' * indent + encode(entry))
+        count += 1
+    f.write('\n' + ' ' * (indent - 2) + ']' if count else ']')
+    return count
+
+
+def write_json_array(output_file, entries, default=str):
+    """Write a JSON list one entry at a time and return the entry count"""
+    with open(output_file, 'w') as f:
+        count = _write_array(f, entries, 2, default)
+        f.write('\n')
+    return count
+
+
+def write_json_document(output_file, header, key, entries, default=str):
+    """Write {**header, key: [entries...]} one entry at a time and return the entry count
+
+    The output is a normal JSON document, but entries are serialized and written as
+    they arrive instead of after the whole list has been built.
+    """
+    with open(output_file, 'w') as f:
+        f.write('{\n')
+        for name, value in header.items():
+            f.write(f'  {json.dumps(name)}: {json.dumps(value, default=default)},\n')
+        f.write(f'  {json.dumps(key)}: ')
+        count = _write_array(f, entries, 4, default)
+        f.write('\n}\n')
+    return count
+
+
+def write_ndjson(output_file, records, default=str, exclude=(), flush=False):
+    """Write one compact JSON line per record and return the count
+
+    Fields named in exclude are left out of every line. flush pushes each line out as
+    soon as it is written, for followers reading the output live.
+    """
+    encode = json.JSONEncoder(separators=(',', ':'), default=default).encode
+    count = 0
+    stream = sys.stdout if str(output_file) == '-' else open(output_file, 'w')
+    try:
+        for record in records:
+            if exclude:
+                record = {key: value for key, value in record.items() if key not in exclude}
+            stream.write(encode(record))
+            stream.write('\n')
+            if flush:
+                stream.flush()
+            count += 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return count
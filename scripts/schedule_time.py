@@ -0,0 +1,89 @@
+"""
+Scheduled Time Parsing
+Fast, timezone-aware parsing of ad-break scheduled times (ISO-8601, legacy strptime
+formats and relative seconds) that remembers which format the batch uses
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+# Covers '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'
+# and ISO-8601 with any fraction length and a Z or +HH:MM offset
+ISO_TIME_RE = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,6})\d*)?)?'
+    r'\s*(?:(Z|z)|([+-])(\d{2}):?(\d{2}))?$'
+)
+
+# Relative seconds from the batch reference time, e.g. "90" or "12.5"
+RELATIVE_TIME_RE = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)$')
+
+
+class ScheduledTimeParser:
+    """Parse scheduled times to timezone-aware datetimes
+
+    Naive timestamps are taken in default_tz (local time when None). Relative seconds
+    are measured from reference_time, fixed when the parser is created so every entry in
+    a batch shares the same reference. The parser that matched last is tried first, so a
+    batch in one format costs one regex match per entry.
+    """
+
+    def __init__(self, reference_time=None, default_tz=None):
+        self.reference_time = self.normalize(reference_time or datetime.now(timezone.utc), default_tz)
+        self.default_tz = default_tz
+        self._parsers = [self._parse_iso, self._parse_relative, self._parse_fromisoformat]
+
+    @staticmethod
+    def normalize(moment, default_tz=None):
+        """Attach default_tz (or the local zone) to a naive datetime"""
+        if moment.tzinfo is not None:
+            return moment
+        return moment.replace(tzinfo=default_tz) if default_tz is not None else moment.astimezone()
+
+    def _parse_iso(self, value):
+        match = ISO_TIME_RE.match(value)
+        if match is None:
+            return None
+        year, month, day, hour, minute, second, fraction, utc, sign, offset_hours, offset_minutes = match.groups()
+        if utc:
+            tz = timezone.utc
+        elif sign:
+            offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+            tz = timezone(-offset if sign == '-' else offset)
+        else:
+            tz = None
+        moment = datetime(
+            int(year), int(month), int(day), int(hour), int(minute), int(second or 0),
+            int(fraction.ljust(6, '0')) if fraction else 0, tz
+        )
+        return moment if tz is not None else self.normalize(moment, self.default_tz)
+
+    def _parse_relative(self, value):
+        if not RELATIVE_TIME_RE.match(value):
+            return None
+        return self.reference_time + timedelta(seconds=float(value))
+
+    def _parse_fromisoformat(self, value):
+        # Anything else datetime itself understands, e.g. date-only or week dates on newer Pythons
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return self.normalize(moment, self.default_tz)
+
+    def parse(self, value):
+        """Return a timezone-aware datetime for a scheduled time value"""
+        if isinstance(value, datetime):
+            return self.normalize(value, self.default_tz)
+        if isinstance(value, (int, float)):
+            return self.reference_time + timedelta(seconds=value)
+
+        text = str(value).strip()
+        parsers = self._parsers
+        for index, parser in enumerate(parsers):
+            moment = parser(text)
+            if moment is not None:
+                if index:
+                    # Remember the format for the rest of the batch
+                    parsers.insert(0, parsers.pop(index))
+                return moment
+        raise ValueError(f"Unrecognized scheduled time '{value}'")
@@ -4,18 +4,103 @@ SCTE-35 Stream Analyzer
 Analyzes FFmpeg output to detect and report on SCTE-35 streams
 """
 
+import argparse
 import re
 import json
+import socket
+import struct
 import subprocess
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import metrics
+from lazy_imports import lazy_import
+from mpegts import TS_PACKET_SIZE, TSHealthMonitor, TSScanner, is_scte35_stream
+
+# Only serve and monitor run an event loop; analyze and health skip the asyncio import
+asyncio = lazy_import("asyncio")
+# Loaded on the first SCTE-35 section the native backend decodes
+threefive = lazy_import("threefive")
+
+# Bounded ffprobe input reads; "fast" keeps a typical live TS input well under a second
+PROBE_PROFILES = {
+    "fast": {"probesize": 500000, "analyzeduration": 500000},
+    "default": {"probesize": 2000000, "analyzeduration": 2000000},
+    "thorough": {"probesize": 10000000, "analyzeduration": 10000000}
+}
+
+# MPEG-TS stream_type for SCTE-35 and its registration descriptor format identifier
+SCTE35_STREAM_TYPE = 0x86
+SCTE35_REGISTRATION = "CUEI"
+
+# PMT stream_type values seen on contribution feeds: (kind, description)
+TS_STREAM_TYPES = {
+    0x01: ("video", "MPEG-1 video"),
+    0x02: ("video", "MPEG-2 video"),
+    0x03: ("audio", "MPEG-1 audio"),
+    0x04: ("audio", "MPEG-2 audio"),
+    0x06: ("data", "PES private data"),
+    0x0F: ("audio", "AAC (ADTS)"),
+    0x11: ("audio", "AAC (LATM)"),
+    0x15: ("data", "ID3 metadata"),
+    0x1B: ("video", "H.264"),
+    0x24: ("video", "HEVC"),
+    0x81: ("audio", "AC-3"),
+    0x86: ("data", "SCTE-35"),
+    0x87: ("audio", "E-AC-3")
+}
+
+DEFAULT_CAPTURE_BYTES = 4 * 1024 * 1024
+
+# Monitor reads from files in multiples of the usual 7-packet UDP datagram
+MONITOR_CHUNK_BYTES = 7 * TS_PACKET_SIZE * 64
+
+def open_udp_socket(url):
+    """Bind a UDP socket for udp://host:port, joining the group when host is multicast"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    host = url.hostname or ""
+    if host and socket.inet_aton(host)[0] & 0xF0 == 0xE0:
+        # Multicast group: bind the port and join the group
+        sock.bind(("", url.port))
+        membership = struct.pack("4sl", socket.inet_aton(host), socket.INADDR_ANY)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    else:
+        sock.bind((host, url.port))
+    return sock
+
+class _MonitorProtocol:
+    """Hand every received datagram to a TSHealthMonitor with its arrival time
+    
+    Implements the asyncio.DatagramProtocol callbacks without subclassing it, so defining
+    it does not import asyncio.
+    """
+    
+    def __init__(self, monitor):
+        self.monitor = monitor
+    
+    def connection_made(self, transport):
+        pass
+    
+    def connection_lost(self, exc):
+        pass
+    
+    def error_received(self, exc):
+        pass
+    
+    def datagram_received(self, data, addr):
+        self.monitor.feed(data, time.monotonic())
 
 class SCTE35Analyzer:
-    def __init__(self, input_url):
+    def __init__(self, input_url, backend="ffprobe", profile="fast", capture_bytes=DEFAULT_CAPTURE_BYTES):
         self.input_url = input_url
+        self.backend = backend
+        self.profile = profile
+        self.capture_bytes = capture_bytes
         self.log_dir = Path("/app/logs")
-        self.log_dir.mkdir(exist_ok=True)
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         
     def analyze_streams(self):
@@ -23,20 +108,29 @@ class SCTE35Analyzer:
         print(f"🔍 Analyzing streams for: {self.input_url}")
         print("=" * 60)
         
-        # Run FFmpeg to get stream information
-        analysis_log = self.log_dir / f"stream_analysis_{self.session_id}.log"
-        
+        started = time.perf_counter()
         try:
-            # Get detailed stream information
-            cmd = [
-                "ffmpeg", "-i", self.input_url, "-hide_banner"
-            ]
-            
-            with open(analysis_log, 'w') as f:
-                result = subprocess.run(cmd, stderr=f, stdout=f, text=True)
+            if self.backend == "native":
+                # In-process PAT/PMT parse of the first capture_bytes, no ffmpeg involved
+                streams_info = self.analyze_native()
+            elif self.backend == "ffprobe":
+                # Structured probe read straight from the pipe, no log file
+                result = subprocess.run(self.probe_command(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                if result.returncode != 0:
+                    raise RuntimeError(result.stderr.strip() or f"ffprobe exited with {result.returncode}")
+                streams_info = self._parse_ffprobe_json(result.stdout)
+            else:
+                # Run FFmpeg to get stream information
+                self.log_dir.mkdir(exist_ok=True)
+                analysis_log = self.log_dir / f"stream_analysis_{self.session_id}.log"
+                
+                with open(analysis_log, 'w') as f:
+                    result = subprocess.run(self.probe_command(), stderr=f, stdout=f, text=True)
+                
+                # Parse the analysis
+                streams_info = self._parse_ffmpeg_output(analysis_log)
             
-            # Parse the analysis
-            streams_info = self._parse_ffmpeg_output(analysis_log)
+            metrics.observe('probe_seconds', time.perf_counter() - started, backend=self.backend)
             
             # Generate report
             self._generate_report(streams_info)
@@ -47,11 +141,179 @@ class SCTE35Analyzer:
             print(f"❌ Error analyzing streams: {e}")
             return None
     
-    def _parse_ffmpeg_output(self, log_file):
-        """Parse FFmpeg output to extract stream information"""
+    def _capture(self, timeout=5.0):
+        """Read the first capture_bytes of a local TS file or a UDP feed"""
+        url = urlsplit(self.input_url)
+        
+        if url.scheme == "udp":
+            sock = open_udp_socket(url)
+            try:
+                sock.settimeout(timeout)
+                
+                data = bytearray()
+                deadline = time.monotonic() + timeout
+                while len(data) < self.capture_bytes and time.monotonic() < deadline:
+                    try:
+                        data += sock.recv(65536)
+                    except socket.timeout:
+                        break
+                return bytes(data)
+            finally:
+                sock.close()
+        
+        if url.scheme not in ("", "file"):
+            raise ValueError(f"Native backend reads local TS files and udp:// feeds, not {url.scheme}:// (use a UDP stand-in)")
+        
+        with open(url.path if url.scheme == "file" else self.input_url, "rb") as f:
+            return f.read(self.capture_bytes)
+    
+    def _decode_cue(self, pid, packet_number, section):
+        """Summarize a SCTE-35 section, decoded with threefive when it is installed"""
+        cue_info = {"pid": pid, "packet_number": packet_number, "hex": section.hex()}
+        try:
+            cue = threefive.Cue(section)
+            cue.decode()
+            cue_info.update({
+                "command_type": type(cue.command).__name__,
+                "splice_event_id": getattr(cue.command, "splice_event_id", None),
+                "pts_time": getattr(cue.command, "pts_time", None)
+            })
+        except ImportError:
+            pass  # threefive is not installed; the raw section is still reported
+        except Exception as e:
+            cue_info["error"] = str(e)
+        return cue_info
+    
+    def analyze_native(self, max_cues=4):
+        """Parse PAT/PMT in-process and report every elementary stream, PCR and SCTE-35 PID"""
+        captured = time.perf_counter()
+        data = self._capture()
+        capture_time = time.perf_counter() - captured
+        
+        scanner = TSScanner()
+        sections = scanner.probe(data, max_cues)
+        stats = scanner.stats
+        
+        streams_info = {
+            "input_url": self.input_url,
+            "analysis_time": datetime.now().isoformat(),
+            "backend": "native",
+            "programs": [],
+            "streams": [],
+            "scte35_detected": False,
+            "scte35_streams": [],
+            "video_streams": [],
+            "audio_streams": [],
+            "data_streams": [],
+            "first_cues": [self._decode_cue(pid, packet_number, section) for packet_number, pid, section in sections],
+            "capture": {
+                "bytes": len(data),
+                "capture_time": capture_time,
+                "parse_time": stats["elapsed"],
+                "parse_mbps": stats["packets"] * TS_PACKET_SIZE * 8 / stats["elapsed"] / 1e6 if stats["elapsed"] else 0.0,
+                "packets": stats["packets"],
+                "sync_errors": stats["sync_errors"]
+            }
+        }
+        
+        for pmt_pid, pmt in sorted(scanner.pmts.items()):
+            streams_info["programs"].append({
+                "program_id": pmt["program_number"],
+                "pmt_pid": pmt_pid,
+                "pcr_pid": pmt["pcr_pid"],
+                "stream_pids": [stream["pid"] for stream in pmt["streams"]]
+            })
+            
+            for index, stream in enumerate(pmt["streams"]):
+                kind, description = TS_STREAM_TYPES.get(stream["stream_type"], ("data", "unknown"))
+                stream_info = {
+                    "stream_id": f"{pmt['program_number']}:{index}",
+                    "pid": stream["pid"],
+                    "stream_type": stream["stream_type"],
+                    "type": kind.capitalize(),
+                    "details": f"{description} (stream_type 0x{stream['stream_type']:02x}, PID {stream['pid']})",
+                    "codec_info": "PCR" if stream["pid"] == pmt["pcr_pid"] else None,
+                    "is_scte35": is_scte35_stream(stream)
+                }
+                
+                if stream_info["is_scte35"]:
+                    streams_info["scte35_detected"] = True
+                    streams_info["scte35_streams"].append(stream_info)
+                    streams_info["data_streams"].append(stream_info)
+                elif kind == "video":
+                    streams_info["video_streams"].append(stream_info)
+                elif kind == "audio":
+                    streams_info["audio_streams"].append(stream_info)
+                else:
+                    streams_info["data_streams"].append(stream_info)
+                
+                streams_info["streams"].append(stream_info)
+        
+        return streams_info
+    
+    async def monitor_stream(self, monitor):
+        """Feed the input into a TSHealthMonitor until it ends (files) or the task is cancelled (UDP)"""
+        url = urlsplit(self.input_url)
+        
+        if url.scheme == "udp":
+            loop = asyncio.get_running_loop()
+            transport, _ = await loop.create_datagram_endpoint(lambda: _MonitorProtocol(monitor), sock=open_udp_socket(url))
+            try:
+                await asyncio.Future()
+            finally:
+                transport.close()
+        
+        if url.scheme not in ("", "file"):
+            raise ValueError(f"Monitor reads local TS files and udp:// feeds, not {url.scheme}:// (use a UDP stand-in)")
+        
+        with open(url.path if url.scheme == "file" else self.input_url, "rb") as f:
+            while True:
+                chunk = f.read(MONITOR_CHUNK_BYTES)
+                if not chunk:
+                    break
+                monitor.feed(chunk)
+                await asyncio.sleep(0)
+        return monitor.summary()
+    
+    def probe_command(self):
+        """Command line for the configured probe backend"""
+        if self.backend == "ffprobe":
+            profile = PROBE_PROFILES[self.profile]
+            return [
+                "ffprobe", "-v", "error",
+                "-probesize", str(profile["probesize"]),
+                "-analyzeduration", str(profile["analyzeduration"]),
+                "-of", "json", "-show_streams", "-show_programs",
+                self.input_url
+            ]
+        return ["ffmpeg", "-i", self.input_url, "-hide_banner"]
+    
+    def parse_probe_output(self, stdout, stderr):
+        """Parse the output of probe_command() for the configured backend"""
+        if self.backend == "ffprobe":
+            return self._parse_ffprobe_json(stdout)
+        return self._parse_ffmpeg_content(stderr)
+    
+    def _is_scte35_stream(self, stream):
+        """SCTE-35 by stream_type 0x86, a CUEI registration, or ffprobe's scte_35 codec"""
+        if stream.get("codec_name") == "scte_35":
+            return True
+        if SCTE35_REGISTRATION in stream.get("codec_tag_string", ""):
+            return True
+        try:
+            return int(stream.get("codec_tag", "0x0"), 16) == SCTE35_STREAM_TYPE
+        except ValueError:
+            return False
+    
+    def _parse_ffprobe_json(self, output):
+        """Build stream information from ffprobe -of json -show_streams -show_programs"""
+        probe = json.loads(output or "{}")
         streams_info = {
             "input_url": self.input_url,
             "analysis_time": datetime.now().isoformat(),
+            "backend": "ffprobe",
+            "profile": self.profile,
+            "programs": [],
             "streams": [],
             "scte35_detected": False,
             "scte35_streams": [],
@@ -60,10 +322,80 @@ class SCTE35Analyzer:
             "data_streams": []
         }
         
+        for program in probe.get("programs", []):
+            streams_info["programs"].append({
+                "program_id": program.get("program_id"),
+                "pmt_pid": program.get("pmt_pid"),
+                "pcr_pid": program.get("pcr_pid"),
+                "stream_pids": [int(s["id"], 16) for s in program.get("streams", []) if "id" in s]
+            })
+        
+        for stream in probe.get("streams", []):
+            codec_type = stream.get("codec_type", "unknown")
+            pid = int(stream["id"], 16) if "id" in stream else None
+            
+            details = [stream.get("codec_name") or codec_type]
+            if stream.get("profile"):
+                details.append(stream["profile"])
+            if stream.get("width"):
+                details.append(f"{stream['width']}x{stream['height']}")
+            if stream.get("avg_frame_rate") and stream["avg_frame_rate"] != "0/0":
+                details.append(f"{stream['avg_frame_rate']} fps")
+            if stream.get("sample_rate"):
+                details.append(f"{stream['sample_rate']} Hz")
+            if stream.get("channel_layout"):
+                details.append(stream["channel_layout"])
+            
+            stream_info = {
+                "stream_id": f"0:{stream.get('index')}",
+                "pid": pid,
+                "type": codec_type.capitalize(),
+                "codec_name": stream.get("codec_name"),
+                "details": ", ".join(details),
+                "codec_info": stream.get("codec_tag_string"),
+                "is_scte35": self._is_scte35_stream(stream)
+            }
+            
+            if stream_info["is_scte35"]:
+                streams_info["scte35_detected"] = True
+                streams_info["scte35_streams"].append(stream_info)
+                streams_info["data_streams"].append(stream_info)
+            elif codec_type == "video":
+                streams_info["video_streams"].append(stream_info)
+            elif codec_type == "audio":
+                streams_info["audio_streams"].append(stream_info)
+            else:
+                streams_info["data_streams"].append(stream_info)
+            
+            streams_info["streams"].append(stream_info)
+        
+        return streams_info
+    
+    def _parse_ffmpeg_output(self, log_file):
+        """Parse FFmpeg output to extract stream information"""
         try:
             with open(log_file, 'r') as f:
                 content = f.read()
-            
+        except Exception as e:
+            print(f"❌ Error parsing FFmpeg output: {e}")
+            content = ""
+        
+        return self._parse_ffmpeg_content(content)
+    
+    def _parse_ffmpeg_content(self, content):
+        """Extract stream information from FFmpeg stderr text"""
+        streams_info = {
+            "input_url": self.input_url,
+            "analysis_time": datetime.now().isoformat(),
+            "streams": [],
+            "scte35_detected": False,
+            "scte35_streams": [],
+            "video_streams": [],
+            "audio_streams": [],
+            "data_streams": []
+        }
+        
+        try:
             # Extract stream information
             stream_pattern = r'Stream #(\d+):(\d+)(?:\:\d+)?:\s+(\w+):\s*([^[]+)(?:\[([^\]]+)\])?'
             matches = re.findall(stream_pattern, content)
@@ -182,6 +514,20 @@ class SCTE35Analyzer:
                 print(f"   └─ {detail}")
             print()
         
+        # Native backend: programs, first cues and parse throughput
+        for program in streams_info.get("programs", []):
+            print(f"📺 Program {program['program_id']}: PMT PID {program['pmt_pid']}, PCR PID {program['pcr_pid']}")
+        if streams_info.get("first_cues"):
+            print("🧾 First SCTE-35 Cues:")
+            for cue in streams_info["first_cues"]:
+                summary = cue.get("command_type") or cue["hex"][:48]
+                print(f"   └─ PID {cue['pid']} packet {cue['packet_number']}: {summary}")
+        if streams_info.get("capture"):
+            capture = streams_info["capture"]
+            print(f"⚡ Parsed {capture['bytes']} bytes in {capture['parse_time'] * 1000:.1f} ms ({capture['parse_mbps']:.0f} Mbit/s)")
+        if streams_info.get("programs") or streams_info.get("capture"):
+            print()
+        
         # Recommendations
         self._generate_recommendations(streams_info)
         
@@ -193,11 +539,13 @@ class SCTE35Analyzer:
         print(f"💡 Recommendations:")
         print("=" * 60)
         
+        scte35_pid = next((s["pid"] for s in streams_info["scte35_streams"] if s.get("pid")), 500)
+        
         if streams_info["scte35_detected"]:
             print("✅ SCTE-35 stream detected - Ready for pass-through encoding")
             print("   • Use -scte35_from_stream true for pass-through")
             print("   • Map data stream explicitly: -map 0:d:0")
-            print("   • Set appropriate SCTE-35 PID (default: 500)")
+            print(f"   • Set appropriate SCTE-35 PID (input uses {scte35_pid})")
         else:
             print("⚠️  No SCTE-35 stream detected")
             print("   • SCTE-35 can still be generated if needed")
@@ -228,7 +576,7 @@ class SCTE35Analyzer:
         
         if streams_info["scte35_detected"]:
             print("    -scte35_from_stream true \\")
-            print("    -scte35_pid 500 \\")
+            print(f"    -scte35_pid {scte35_pid} \\")
             print("    -map 0:v:0 -map 0:a:0 -map 0:d:0 \\")
         else:
             print("    -map 0:v:0 -map 0:a:0 \\")
@@ -241,6 +589,7 @@ class SCTE35Analyzer:
         report_file = self.log_dir / f"scte35_analysis_{self.session_id}.json"
         
         try:
+            self.log_dir.mkdir(exist_ok=True)
             with open(report_file, 'w') as f:
                 json.dump(streams_info, f, indent=2)
             
@@ -248,14 +597,264 @@ class SCTE35Analyzer:
         except Exception as e:
             print(f"❌ Error saving report: {e}")
 
+class SCTE35AnalyzerService:
+    """Long-running analyzer that probes many inputs concurrently and caches the results"""
+    
+    def __init__(self, workers=8, timeout=15.0, cache_ttl=60.0, backend="ffprobe", profile="fast"):
+        self.workers = workers
+        self.backend = backend
+        self.profile = profile
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache = {}
+        self.in_flight = {}
+        self.stats = {"probes": 0, "cache_hits": 0, "timeouts": 0, "errors": 0}
+        self._semaphore = None
+    
+    async def _run_probe(self, input_url, timeout):
+        """Run one probe, reading stream info from its output pipes"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        async with self._semaphore:
+            started = time.monotonic()
+            analyzer = SCTE35Analyzer(input_url, self.backend, self.profile)
+            if self.backend == "native":
+                loop = asyncio.get_running_loop()
+                try:
+                    streams_info = await asyncio.wait_for(loop.run_in_executor(None, analyzer.analyze_native), timeout)
+                except asyncio.TimeoutError:
+                    # The executor thread cannot be killed; it finishes in the background
+                    self.stats["timeouts"] += 1
+                    raise
+                self.stats["probes"] += 1
+                streams_info["probe_duration"] = time.monotonic() - started
+                metrics.observe('probe_seconds', streams_info["probe_duration"], backend=self.backend)
+                return streams_info
+            
+            process = await asyncio.create_subprocess_exec(
+                *analyzer.probe_command(),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                self.stats["timeouts"] += 1
+                raise
+            
+            self.stats["probes"] += 1
+            if self.backend == "ffprobe" and process.returncode != 0:
+                raise RuntimeError(stderr.decode("utf-8", "replace").strip() or f"ffprobe exited with {process.returncode}")
+            streams_info = analyzer.parse_probe_output(stdout.decode("utf-8", "replace"), stderr.decode("utf-8", "replace"))
+            streams_info["probe_duration"] = time.monotonic() - started
+            metrics.observe('probe_seconds', streams_info["probe_duration"], backend=self.backend)
+            return streams_info
+    
+    async def analyze(self, input_url, timeout=None, refresh=False):
+        """Return stream info for one input, from cache while it is fresh"""
+        cached = self.cache.get(input_url)
+        if cached and not refresh and cached[0] > time.monotonic():
+            self.stats["cache_hits"] += 1
+            return cached[1]
+        
+        # Concurrent requests for the same input share one probe
+        task = self.in_flight.get(input_url)
+        if task is None:
+            task = asyncio.ensure_future(self._run_probe(input_url, timeout or self.timeout))
+            self.in_flight[input_url] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(input_url, None))
+        
+        try:
+            streams_info = await asyncio.shield(task)
+        except asyncio.TimeoutError:
+            return {"input_url": input_url, "error": f"probe timed out after {timeout or self.timeout}s"}
+        except Exception as e:
+            self.stats["errors"] += 1
+            return {"input_url": input_url, "error": str(e)}
+        
+        self.cache[input_url] = (time.monotonic() + self.cache_ttl, streams_info)
+        return streams_info
+    
+    async def analyze_many(self, input_urls, timeout=None, refresh=False):
+        """Probe many inputs at once, bounded by the worker pool"""
+        return await asyncio.gather(*(self.analyze(url, timeout, refresh) for url in input_urls))
+    
+    async def _handle(self, reader, writer):
+        """Serve one HTTP request: GET /analyze?url=..., POST /analyze {"urls": [...]}, GET /health, GET /metrics"""
+        status, body = 200, None
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            
+            method, target = request_line[0], request_line[1]
+            url = urlsplit(target)
+            query = parse_qs(url.query)
+            timeout = float(query["timeout"][0]) if "timeout" in query else None
+            refresh = query.get("refresh", ["0"])[0] in ("1", "true")
+            
+            if url.path == "/metrics":
+                body = metrics.REGISTRY.render()
+            elif url.path == "/health":
+                body = dict(self.stats, cached=len(self.cache), in_flight=len(self.in_flight), workers=self.workers)
+            elif url.path == "/analyze" and method == "GET" and "url" in query:
+                body = await self.analyze_many(query["url"], timeout, refresh)
+                body = body[0] if len(body) == 1 else body
+            elif url.path == "/analyze" and method == "POST":
+                length = int(headers.get("content-length", 0))
+                payload = json.loads(await reader.readexactly(length)) if length else {}
+                body = await self.analyze_many(payload.get("urls", []), payload.get("timeout", timeout), payload.get("refresh", refresh))
+            else:
+                status, body = 404, {"error": "not found"}
+        except Exception as e:
+            status, body = 400, {"error": str(e)}
+        
+        if isinstance(body, str):
+            data, content_type = body.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(body).encode("utf-8"), "application/json"
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+    
+    async def serve(self, host="127.0.0.1", port=8735, unix_socket=None):
+        """Serve analysis results over HTTP on a TCP port or a Unix socket until cancelled"""
+        if unix_socket:
+            server = await asyncio.start_unix_server(self._handle, path=unix_socket)
+            print(f"🎧 SCTE-35 analyzer service listening on unix:{unix_socket}")
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+            print(f"🎧 SCTE-35 analyzer service listening on http://{host}:{port}")
+        
+        async with server:
+            await server.serve_forever()
+
+class SCTE35MonitorService:
+    """Continuous TS health monitoring of many channels, exported as Prometheus metrics"""
+    
+    def __init__(self, channels, segment_duration=2.0, registry=metrics.REGISTRY):
+        self.registry = registry
+        self.analyzers = {name: SCTE35Analyzer(url, backend="native") for name, url in channels.items()}
+        self.monitors = {name: TSHealthMonitor(name, registry, segment_duration) for name in channels}
+        self.errors = {}
+    
+    async def _monitor(self, name):
+        try:
+            summary = await self.analyzers[name].monitor_stream(self.monitors[name])
+            print(f"🏁 {name}: input ended after {summary['packets']} packets, {summary['cc_errors']} CC errors")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors[name] = str(e)
+            print(f"❌ {name}: {e}")
+    
+    async def _handle(self, reader, writer):
+        """Serve GET /metrics (Prometheus text format) and GET /health (per-channel counters)"""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass
+            path = urlsplit(request_line[1]).path if len(request_line) > 1 else ""
+        except Exception:
+            path = ""
+        
+        if path == "/metrics":
+            status, content_type = "200 OK", "text/plain; version=0.0.4"
+            data = self.registry.render().encode("utf-8")
+        elif path == "/health":
+            status, content_type = "200 OK", "application/json"
+            body = {name: dict(monitor.summary(), error=self.errors.get(name)) for name, monitor in self.monitors.items()}
+            data = json.dumps(body).encode("utf-8")
+        else:
+            status, content_type, data = "404 Not Found", "application/json", b'{"error": "not found"}'
+        
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+    
+    async def serve(self, host="127.0.0.1", port=8735):
+        """Monitor every channel and serve metrics until cancelled"""
+        tasks = [asyncio.ensure_future(self._monitor(name)) for name in self.monitors]
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"📈 Monitoring {len(tasks)} channel(s), metrics on http://{host}:{port}/metrics")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description='SCTE-35 Stream Analyzer')
+    parser.add_argument('input_url', nargs='?', help='Input URL to analyze once')
+    parser.add_argument('--backend', choices=['ffprobe', 'ffmpeg', 'native'], default='ffprobe', help='Probe backend (ffprobe JSON, parsed ffmpeg stderr, or in-process TS parsing)')
+    parser.add_argument('--capture-mb', type=float, default=DEFAULT_CAPTURE_BYTES / (1024 * 1024), help='MB of TS read by the native backend')
+    parser.add_argument('--profile', choices=sorted(PROBE_PROFILES), default='fast', help='ffprobe -probesize/-analyzeduration profile')
+    parser.add_argument('--serve', action='store_true', help='Run as a long-lived analyzer service')
+    parser.add_argument('--host', default='127.0.0.1', help='Service listen address')
+    parser.add_argument('--port', type=int, default=8735, help='Service listen port')
+    parser.add_argument('--unix-socket', help='Serve on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent probes')
+    parser.add_argument('--timeout', type=float, default=15.0, help='Per-input probe timeout in seconds')
+    parser.add_argument('--cache-ttl', type=float, default=60.0, help='Seconds to cache results per input URL')
+    parser.add_argument('--monitor', action='store_true', help='Continuously monitor TS health and export Prometheus metrics')
+    parser.add_argument('--channel', action='append', default=[], metavar='NAME=URL', help='Channel to monitor (repeatable)')
+    parser.add_argument('--segment-duration', type=float, default=2.0, help='Target segment duration for cue drift metrics')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.configure_from_args(args)
+    
+    if args.monitor:
+        channels = dict(channel.split('=', 1) for channel in args.channel)
+        if args.input_url:
+            channels[args.input_url] = args.input_url
+        if not channels:
+            parser.error('--monitor needs an input_url or at least one --channel NAME=URL')
+        metrics.enable()
+        service = SCTE35MonitorService(channels, args.segment_duration)
+        try:
+            asyncio.run(service.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    if args.serve:
+        metrics.enable()
+        service = SCTE35AnalyzerService(args.workers, args.timeout, args.cache_ttl, args.backend, args.profile)
+        try:
+            asyncio.run(service.serve(args.host, args.port, args.unix_socket))
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    if not args.input_url:
         print("Usage: python3 scte35_analyzer.py <input_url>")
+        print("       python3 scte35_analyzer.py --serve [--port 8735 | --unix-socket PATH]")
+        print("       python3 scte35_analyzer.py --monitor --channel NAME=udp://239.1.1.1:5000 [--channel ...]")
         print("Example: python3 scte35_analyzer.py srt://input.example.com:9999?streamid=live1")
         sys.exit(1)
     
-    input_url = sys.argv[1]
-    analyzer = SCTE35Analyzer(input_url)
+    input_url = args.input_url
+    analyzer = SCTE35Analyzer(input_url, args.backend, args.profile, int(args.capture_mb * 1024 * 1024))
     
     print("🎬 SCTE-35 Stream Analyzer")
     print("=" * 60)
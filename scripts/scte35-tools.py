@@ -5,13 +5,30 @@ Provides various SCTE-35 operations using the threefive library
 """
 
 import argparse
+import base64
+import glob
 import json
 import logging
+import os
 import sys
+import time
+from concurrent import futures
 from datetime import datetime, timedelta
 from pathlib import Path
-import threefive
-import m3ufu
+from cue_encoder import CueEncoder, build_splice_insert, build_time_signal, encoded_cue_bytes
+import metrics
+from hls_playlist import AtomicFileWriter, MediaPlaylist
+from lazy_imports import lazy_import
+from mpegts import TSScanner
+from schedule_stream import read_schedule, write_json_document, write_ndjson
+
+# Loaded by the commands that use them, so e.g. sidecar never imports m3ufu or urllib
+threefive = lazy_import('threefive')
+m3ufu = lazy_import('m3ufu')
+urllib_request = lazy_import('urllib.request')
+
+# Cue records carry the threefive.Cue object too; its fields are already in the record
+CUE_OBJECT_FIELDS = ('cue',)
 
 # Configure logging
 logging.basicConfig(
@@ -20,36 +37,153 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _parse_file_worker(input_file, scanner):
+    """Parse one MPEG-TS file in a pool worker and return picklable cue records"""
+    tools = SCTE35Tools()
+    started = time.perf_counter()
+    records = tools.iter_scan_scte35_from_mpegts(input_file) if scanner else tools.iter_scte35_from_mpegts(input_file)
+    cues = [
+        dict({key: value for key, value in record.items() if key != 'cue'}, file=input_file)
+        for record in records
+    ]
+    return input_file, cues, os.path.getsize(input_file), time.perf_counter() - started
+
+CUE_TAG_PREFIXES = (
+    '#EXT-X-CUE-OUT',
+    '#EXT-X-CUE-IN',
+    '#EXT-X-SCTE35',
+    '#EXT-OATCLS-SCTE35',
+    '#EXT-X-DATERANGE'
+)
+
+def break_duration_seconds(command):
+    """Return a splice command's break duration in seconds (0 when it has none)"""
+    break_duration = getattr(command, 'break_duration', None)
+    if hasattr(break_duration, 'duration'):
+        return break_duration.duration / 90000
+    return break_duration or 0
+
+class HLSPlaylistFollower:
+    """Track a live HLS playlist across reloads and report only newly added SCTE-35 tags"""
+    
+    def __init__(self, m3u8_url):
+        self.m3u8_url = m3u8_url
+        self.media_sequence = 0
+        self.next_sequence = None
+        self.last_segment = None
+        self.target_duration = None
+        self.ended = False
+        self._pending_tags = []
+        self._offset = 0
+        self._inode = None
+        self._head = b''
+    
+    def _read(self):
+        """Return (text, appended); appended text continues where the previous read stopped"""
+        if '://' in self.m3u8_url and not self.m3u8_url.startswith('file://'):
+            with urllib_request.urlopen(self.m3u8_url, timeout=10) as response:
+                return response.read().decode('utf-8'), False
+        
+        path = self.m3u8_url[len('file://'):] if self.m3u8_url.startswith('file://') else self.m3u8_url
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            appended = (
+                self._offset > 0
+                and st.st_ino == self._inode
+                and st.st_size >= self._offset
+                and f.read(len(self._head)) == self._head
+            )
+            if appended:
+                f.seek(self._offset)
+            else:
+                f.seek(0)
+                self._offset = 0
+            data = f.read()
+        
+        if not appended:
+            self._inode = st.st_ino
+            self._head = data[:256]
+        
+        # Only consume complete lines; a line still being written is picked up on the next poll
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        return data[:end].decode('utf-8'), appended
+    
+    def _skip_seen(self, lines):
+        """Read the header of a full reload and drop the lines of segments already reported"""
+        for line in lines:
+            if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+                self.media_sequence = int(line.split(':', 1)[1])
+            elif line.startswith('#EXT-X-TARGETDURATION:'):
+                self.target_duration = float(line.split(':', 1)[1])
+            elif line and not line.startswith('#'):
+                break
+        
+        # Tags of segments not yet reported are read again below, so drop the copies held back
+        self._pending_tags = []
+        if self.next_sequence is None or self.next_sequence < self.media_sequence:
+            # First load, or the window moved past everything we saw: report what is there
+            self.next_sequence = self.media_sequence
+            return lines
+        
+        skip = self.next_sequence - self.media_sequence
+        if skip == 0:
+            return lines
+        for position, line in enumerate(lines):
+            if line and not line.startswith('#'):
+                skip -= 1
+                if skip == 0:
+                    return lines[position + 1:]
+        return []
+    
+    def poll(self):
+        """Reload the playlist and return events for segments added since the last poll"""
+        text, appended = self._read()
+        lines = text.splitlines()
+        if not appended:
+            lines = self._skip_seen(lines)
+        
+        events = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                if line.startswith('#EXT-X-ENDLIST'):
+                    self.ended = True
+                elif line.startswith(CUE_TAG_PREFIXES):
+                    if not line.startswith('#EXT-X-DATERANGE') or 'SCTE35' in line:
+                        self._pending_tags.append(line)
+                continue
+            
+            # A URI line closes the segment the pending tags belong to
+            for tag in self._pending_tags:
+                name, _, value = tag[1:].partition(':')
+                events.append({
+                    'sequence': self.next_sequence,
+                    'segment': line,
+                    'tag': name,
+                    'value': value,
+                    'detected_at': datetime.now().isoformat()
+                })
+            self._pending_tags = []
+            self.last_segment = line
+            self.next_sequence += 1
+        
+        return events
+
 class SCTE35Tools:
     def __init__(self):
         self.output_dir = Path("/var/www/hls")
         self.log_dir = Path("/app/logs")
+        self.last_scan_stats = {}
+        self.encoder = CueEncoder()
+        self.writer = AtomicFileWriter()
         
-    def create_splice_insert(self, ad_break_id, duration, provider_id="0x1", provider_name="YourProvider"):
-        """Create a SCTE-35 splice_insert command"""
+    def create_splice_insert(self, ad_break_id, duration, provider_id="0x1", provider_name="YourProvider", pts_time=None):
+        """Create a SCTE-35 splice_insert command and return it as an encoded threefive Cue"""
         try:
-            # Create a new SCTE-35 cue
-            cue = threefive.Cue()
-            
-            # Set splice_insert command
-            cue.command = threefive.SpliceInsert()
-            cue.command.splice_event_id = int(ad_break_id.replace('ad', ''))
-            cue.command.splice_event_cancel_indicator = False
-            cue.command.out_of_network_indicator = True
-            cue.command.program_splice_flag = True
-            cue.command.duration_flag = True
-            cue.command.splice_immediate_flag = False
-            
-            # Set break duration
-            cue.command.break_duration = threefive.BreakDuration()
-            cue.command.break_duration.auto_return = True
-            cue.command.break_duration.duration = duration * 90000  # Convert to 90kHz clock
-            
-            # Set descriptors
-            cue.command.avail_num = 1
-            cue.command.avails_expected = 1
-            
-            # Encode the cue
+            cue = build_splice_insert(int(ad_break_id.replace('ad', '')), duration, pts_time)
             cue.encode()
             
             logger.info(f"Created SCTE-35 splice_insert for ad break {ad_break_id}")
@@ -59,27 +193,10 @@ class SCTE35Tools:
             logger.error(f"Error creating splice_insert: {e}")
             raise
     
-    def create_time_signal(self, ad_break_id, duration, provider_id="0x1", provider_name="YourProvider"):
-        """Create a SCTE-35 time_signal command"""
+    def create_time_signal(self, ad_break_id, duration, provider_id="0x1", provider_name="YourProvider", pts_time=None):
+        """Create a SCTE-35 time_signal command and return it as an encoded threefive Cue"""
         try:
-            # Create a new SCTE-35 cue
-            cue = threefive.Cue()
-            
-            # Set time_signal command
-            cue.command = threefive.TimeSignal()
-            cue.command.splice_event_id = int(ad_break_id.replace('ad', ''))
-            cue.command.splice_event_cancel_indicator = False
-            cue.command.out_of_network_indicator = True
-            cue.command.program_splice_flag = True
-            cue.command.duration_flag = True
-            cue.command.splice_immediate_flag = False
-            
-            # Set break duration
-            cue.command.break_duration = threefive.BreakDuration()
-            cue.command.break_duration.auto_return = True
-            cue.command.break_duration.duration = duration * 90000  # Convert to 90kHz clock
-            
-            # Encode the cue
+            cue = build_time_signal(int(ad_break_id.replace('ad', '')), duration, pts_time)
             cue.encode()
             
             logger.info(f"Created SCTE-35 time_signal for ad break {ad_break_id}")
@@ -89,72 +206,341 @@ class SCTE35Tools:
             logger.error(f"Error creating time_signal: {e}")
             raise
     
-    def parse_scte35_from_mpegts(self, input_file):
-        """Parse SCTE-35 cues from MPEG-TS file"""
+    def encode_splice_insert(self, ad_break_id, duration, provider_id="0x1", provider_name="YourProvider", pts_time=None):
+        """Return the splice_info_section bytes of a splice_insert, patched from the cue cache"""
         try:
-            cues = []
+            data = self.encoder.splice_insert(int(ad_break_id.replace('ad', '')), duration, pts_time)
+            
+            logger.debug(f"Encoded SCTE-35 splice_insert for ad break {ad_break_id}")
+            return data
+            
+        except Exception as e:
+            logger.error(f"Error encoding splice_insert: {e}")
+            raise
+    
+    def encode_time_signal(self, ad_break_id, duration, provider_id="0x1", provider_name="YourProvider", pts_time=None):
+        """Return the splice_info_section bytes of a time_signal, patched from the cue cache"""
+        try:
+            data = self.encoder.time_signal(int(ad_break_id.replace('ad', '')), duration, pts_time)
+            
+            logger.debug(f"Encoded SCTE-35 time_signal for ad break {ad_break_id}")
+            return data
+            
+        except Exception as e:
+            logger.error(f"Error encoding time_signal: {e}")
+            raise
+    
+    def load_cue_schedule(self, schedule_file):
+        """Yield cue schedule entries from a JSON, NDJSON or CSV file, streaming NDJSON and CSV"""
+        return read_schedule(schedule_file, key=('ad_breaks', 'cues'))
+    
+    def create_cue_batch(self, schedule, output_file, output_format='binary', encoding='hex'):
+        """Encode every cue in a schedule into one packed output file
+        
+        binary writes each splice_info_section prefixed with its 4-byte big-endian length;
+        ndjson writes one record per cue with the section as hex or base64.
+        """
+        try:
+            started = time.perf_counter()
+            count = 0
+            
+            with open(output_file, 'wb' if output_format == 'binary' else 'w') as f:
+                for entry in schedule:
+                    ad_break_id = str(entry.get('ad_break_id') or entry['id'])
+                    cue_type = entry.get('type') or 'splice_insert'
+                    duration = float(entry['duration'])
+                    pts_time = entry.get('pts_time')
+                    pts_time = float(pts_time) if pts_time not in (None, '') else None
+                    
+                    if cue_type == 'splice_insert':
+                        data = self.encoder.splice_insert(int(ad_break_id.replace('ad', '')), duration, pts_time)
+                    elif cue_type == 'time_signal':
+                        data = self.encoder.time_signal(int(ad_break_id.replace('ad', '')), duration, pts_time)
+                    else:
+                        raise ValueError(f"Unknown cue type '{cue_type}' for ad break {ad_break_id}")
+                    
+                    if output_format == 'binary':
+                        f.write(len(data).to_bytes(4, 'big'))
+                        f.write(data)
+                    else:
+                        f.write(json.dumps({
+                            'ad_break_id': ad_break_id,
+                            'type': cue_type,
+                            'duration': duration,
+                            'pts_time': pts_time,
+                            'data': base64.b64encode(data).decode('ascii') if encoding == 'base64' else data.hex()
+                        }, separators=(',', ':')))
+                        f.write('\n')
+                    count += 1
+            
+            elapsed = time.perf_counter() - started
+            stats = self.encoder.stats()
+            logger.info(
+                f"Encoded {count} SCTE-35 cues into {output_file} in {elapsed:.3f}s "
+                f"({count / elapsed if elapsed > 0 else 0:.0f} cues/s, cue cache: {stats['hits']} hits, {stats['misses']} misses)"
+            )
+            return count
+            
+        except Exception as e:
+            logger.error(f"Error creating cue batch: {e}")
+            raise
+    
+    def _cue_record(self, cue, packet_number, pid):
+        """Summarize a decoded cue for the parse_ts output"""
+        command = cue.command
+        metrics.inc('cues', operation='decode')
+        return {
+            'cue': cue,
+            'packet_number': packet_number,
+            'pid': pid,
+            'command_type': type(command).__name__,
+            'splice_event_id': getattr(command, 'splice_event_id', None),
+            'out_of_network': getattr(command, 'out_of_network_indicator', None),
+            'duration': break_duration_seconds(command),
+            'pts_time': getattr(command, 'pts_time', None)
+        }
+
+    def iter_scte35_from_mpegts(self, input_file):
+        """Yield SCTE-35 cues from MPEG-TS file as they are decoded"""
+        try:
+            count = 0
             stream = threefive.Stream(input_file)
             
-            for cue in stream.decode():
-                cues.append({
-                    'cue': cue,
-                    'packet_number': cue.packet_number,
-                    'pid': cue.pid,
-                    'command_type': type(cue.command).__name__,
-                    'splice_event_id': getattr(cue.command, 'splice_event_id', None),
-                    'out_of_network': getattr(cue.command, 'out_of_network_indicator', None),
-                    'duration': getattr(cue.command, 'break_duration.duration', 0) / 90000 if hasattr(cue.command, 'break_duration') else 0
-                })
+            # decode() only calls back per cue; decode_next() yields them. threefive keeps
+            # the PID in packet_data and does not number packets
+            for cue in stream.decode_next():
+                count += 1
+                pid = getattr(getattr(cue, 'packet_data', None), 'pid', None)
+                yield self._cue_record(cue, getattr(cue, 'packet_number', None), pid)
             
-            logger.info(f"Parsed {len(cues)} SCTE-35 cues from {input_file}")
-            return cues
+            logger.info(f"Parsed {count} SCTE-35 cues from {input_file}")
             
         except Exception as e:
             logger.error(f"Error parsing SCTE-35 from MPEG-TS: {e}")
             raise
     
-    def parse_scte35_from_hls(self, m3u8_url):
-        """Parse SCTE-35 cues from HLS playlist"""
+    def parse_scte35_from_mpegts(self, input_file):
+        """Parse SCTE-35 cues from MPEG-TS file"""
+        return list(self.iter_scte35_from_mpegts(input_file))
+    
+    def iter_scan_scte35_from_mpegts(self, input_file):
+        """Yield SCTE-35 cues from MPEG-TS file using the memory-mapped PID scanner"""
         try:
-            # Use m3ufu to parse HLS playlist with SCTE-35 support
-            parser = m3ufu.parse(m3u8_url)
+            count = 0
+            scanner = TSScanner(input_file)
             
-            cues = []
+            for packet_number, pid, section in scanner.iter_sections():
+                with metrics.timer('cue_decode_seconds', source='mpegts'):
+                    cue = threefive.Cue(section)
+                    cue.decode()
+                count += 1
+                yield self._cue_record(cue, packet_number, pid)
+            
+            stats = self.last_scan_stats = scanner.stats
+            logger.info(
+                f"Scanned {stats['packets']} packets from {input_file} in {stats['elapsed']:.3f}s "
+                f"({stats['packets_per_sec']:.0f} packets/s, {stats['bytes_per_sec'] / 1e6:.1f} MB/s), "
+                f"found {count} SCTE-35 cues on PIDs {stats['scte35_pids']}"
+            )
+            
+        except Exception as e:
+            logger.error(f"Error scanning SCTE-35 from MPEG-TS: {e}")
+            raise
+    
+    def scan_scte35_from_mpegts(self, input_file):
+        """Parse SCTE-35 cues from MPEG-TS file with the memory-mapped PID scanner"""
+        cues = list(self.iter_scan_scte35_from_mpegts(input_file))
+        return cues, self.last_scan_stats
+    
+    def iter_scte35_from_hls(self, m3u8_url):
+        """Yield SCTE-35 cues from HLS playlist segment by segment
+        
+        m3ufu reads a live playlist until EXT-X-ENDLIST; use follow_hls to stream one as it grows.
+        """
+        try:
+            # Use m3ufu to parse HLS playlist with SCTE-35 support; shush keeps its JSON dump off stdout
+            parser = m3ufu.M3uFu(shush=True)
+            parser.m3u8 = m3u8_url
+            parser.decode()
+            
+            count = 0
             for segment in parser.segments:
-                if hasattr(segment, 'scte35') and segment.scte35:
-                    cues.append({
-                        'segment': segment.uri,
+                if segment.cue:
+                    count += 1
+                    yield {
+                        'segment': segment.media,
                         'duration': segment.duration,
-                        'scte35_data': segment.scte35,
-                        'cue': threefive.Cue(segment.scte35)
-                    })
+                        'scte35_data': segment.cue,
+                        'cue': threefive.Cue(segment.cue)
+                    }
             
-            logger.info(f"Parsed {len(cues)} SCTE-35 cues from HLS playlist")
-            return cues
+            logger.info(f"Parsed {count} SCTE-35 cues from HLS playlist")
             
         except Exception as e:
             logger.error(f"Error parsing SCTE-35 from HLS: {e}")
             raise
     
-    def inject_scte35_into_hls(self, m3u8_file, scte35_cues, output_file=None):
-        """Inject SCTE-35 cues into HLS playlist"""
+    def parse_scte35_from_hls(self, m3u8_url):
+        """Parse SCTE-35 cues from HLS playlist"""
+        return list(self.iter_scte35_from_hls(m3u8_url))
+    
+    def parse_scte35_batch(self, inputs, workers=None, scanner=False):
+        """Parse SCTE-35 cues from many MPEG-TS files in parallel"""
+        try:
+            if os.path.isdir(inputs):
+                files = sorted(glob.glob(os.path.join(inputs, '**', '*.ts'), recursive=True))
+            else:
+                files = sorted(glob.glob(inputs, recursive=True))
+            
+            if not files:
+                raise ValueError(f"No MPEG-TS files match {inputs}")
+            
+            workers = min(workers or os.cpu_count() or 1, len(files))
+            started = time.perf_counter()
+            results = {}
+            
+            # Each worker pays the threefive import once, not once per file
+            with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                for input_file, cues, size, elapsed in executor.map(
+                    _parse_file_worker, files, [scanner] * len(files), chunksize=max(1, len(files) // (workers * 4))
+                ):
+                    results[input_file] = (cues, size, elapsed)
+            
+            wall_time = time.perf_counter() - started
+            
+            # Merge in file order, then by PTS (cues without a splice time keep packet order at the end)
+            cues = []
+            for input_file in files:
+                file_cues = results[input_file][0]
+                file_cues.sort(key=lambda c: (c['pts_time'] is None, c['pts_time'] or 0, c['packet_number']))
+                cues.extend(file_cues)
+            
+            total_bytes = sum(size for _, size, _ in results.values())
+            busy_time = sum(elapsed for _, _, elapsed in results.values())
+            summary = {
+                'files': len(files),
+                'cues': len(cues),
+                'bytes': total_bytes,
+                'workers': workers,
+                'wall_time': wall_time,
+                'busy_time': busy_time,
+                'files_per_sec': len(files) / wall_time if wall_time > 0 else 0.0,
+                'bytes_per_sec': total_bytes / wall_time if wall_time > 0 else 0.0,
+                'speedup': busy_time / wall_time if wall_time > 0 else 0.0
+            }
+            
+            logger.info(
+                f"Parsed {len(cues)} SCTE-35 cues from {len(files)} files with {workers} workers in {wall_time:.2f}s "
+                f"({summary['files_per_sec']:.1f} files/s, {summary['bytes_per_sec'] / 1e6:.1f} MB/s, {summary['speedup']:.1f}x speedup)"
+            )
+            return cues, summary
+            
+        except Exception as e:
+            logger.error(f"Error parsing SCTE-35 batch: {e}")
+            raise
+    
+    def follow_hls(self, m3u8_url, poll_interval=None):
+        """Follow a live HLS playlist and yield CUE-OUT/CUE-IN/SCTE35 events as segments are appended"""
+        follower = HLSPlaylistFollower(m3u8_url)
+        logger.info(f"Following HLS playlist {m3u8_url}")
+        
+        while True:
+            try:
+                for event in follower.poll():
+                    yield event
+            except (OSError, ValueError) as e:
+                logger.warning(f"Error reloading {m3u8_url}: {e}")
+            
+            if follower.ended:
+                logger.info(f"Playlist ended at media sequence {follower.next_sequence}")
+                return
+            
+            # Without an explicit interval, reload at half the target duration as players do
+            interval = poll_interval or (follower.target_duration / 2 if follower.target_duration else 1.0)
+            time.sleep(interval)
+    
+    def iter_cue_file(self, cue_file):
+        """Yield cues from a JSON, NDJSON or CSV cue file without loading it whole
+        
+        Entries are base64/hex strings or dicts with 'data' and an optional 'scheduled_time'.
+        """
+        for cue_data in read_schedule(cue_file, key='cues'):
+            if isinstance(cue_data, dict):
+                yield {'cue': threefive.Cue(cue_data['data']), 'scheduled_time': cue_data.get('scheduled_time') or None}
+            else:
+                yield threefive.Cue(cue_data)
+    
+    @metrics.timed('playlist_inject_seconds', script='scte35-tools')
+    def inject_scte35_into_hls(self, m3u8_file, scte35_cues, output_file=None, start_pts=0.0):
+        """Inject SCTE-35 cues into HLS playlist at the segment boundaries matching their splice times
+        
+        Each cue is a threefive.Cue, or a dict with 'cue' and an optional wall-clock
+        'scheduled_time' that is placed via EXT-X-PROGRAM-DATE-TIME. Otherwise the cue's
+        pts_time is used, with start_pts being the PTS (in seconds) of the first segment.
+        """
         try:
             if output_file is None:
                 output_file = m3u8_file.replace('.m3u8', '_scte35.m3u8')
             
-            # Parse the original playlist
-            parser = m3ufu.parse(m3u8_file)
+            # Parse the original playlist once; segment start times are a prefix sum of EXTINF
+            playlist = MediaPlaylist.load(m3u8_file)
+            
+            insertions = {}
+            placed = 0
+            unplaced = 0
+            for entry in scte35_cues:
+                cue = entry['cue'] if isinstance(entry, dict) else entry
+                scheduled_time = entry.get('scheduled_time') if isinstance(entry, dict) else None
+                pts_time = getattr(cue.command, 'pts_time', None)
+                
+                offset = None
+                if scheduled_time is not None and playlist.epoch_start is not None:
+                    try:
+                        offset = playlist.offset_for(scheduled_time)
+                    except (TypeError, ValueError) as e:
+                        logger.warning(f"Cannot place SCTE-35 cue at {scheduled_time!r}, using its PTS: {e}")
+                if offset is None and pts_time is not None:
+                    offset = pts_time - start_pts
+                if offset is None:
+                    unplaced += 1
+                    continue
+                
+                start = playlist.boundary_at_or_after(offset)
+                if start is None:
+                    unplaced += 1
+                    continue
+                
+                duration = break_duration_seconds(cue.command)
+                data = base64.b64encode(encoded_cue_bytes(cue)).decode('ascii')
+                tags = insertions.setdefault(start, [])
+                tags.append(f'#EXT-X-SCTE35:CUE="{data}"')
+                placed += 1
+                
+                if getattr(cue.command, 'out_of_network_indicator', None) is False:
+                    # splice_insert returning to the network closes whatever break is open
+                    tags.append('#EXT-X-CUE-IN')
+                elif duration > 0:
+                    tags.append(f'#EXT-X-CUE-OUT:{duration:g}')
+                    # Mark every segment inside the break, then return to the network at its end
+                    break_start = playlist.starts[start]
+                    end = playlist.boundary_at_or_after(break_start + duration)
+                    for index in range(start + 1, end if end is not None else len(playlist.segments)):
+                        elapsed = playlist.starts[index] - break_start
+                        insertions.setdefault(index, []).append(f'#EXT-X-CUE-OUT-CONT:ElapsedTime={elapsed:g},Duration={duration:g}')
+                    if end is not None:
+                        insertions.setdefault(end, []).append('#EXT-X-CUE-IN')
             
-            # Inject SCTE-35 cues at appropriate segments
-            for i, cue in enumerate(scte35_cues):
-                if i < len(parser.segments):
-                    parser.segments[i].scte35 = cue.encode()
+            if unplaced:
+                logger.warning(f"{unplaced} SCTE-35 cues have no splice time inside {m3u8_file} and were not injected")
+            metrics.inc('cues', placed, operation='inject')
+            metrics.inc('segments', len(playlist.segments), script='scte35-tools')
             
-            # Write the modified playlist
-            with open(output_file, 'w') as f:
-                f.write(str(parser))
+            # Replace the playlist atomically; players may be fetching it right now
+            if not self.writer.write(output_file, playlist.render(insertions)):
+                logger.info(f"Playlist {output_file} unchanged, skipped rewrite")
+                return output_file
             
-            logger.info(f"Injected {len(scte35_cues)} SCTE-35 cues into {output_file}")
+            logger.info(f"Injected {placed} SCTE-35 cues into {output_file}")
             return output_file
             
         except Exception as e:
@@ -167,16 +553,14 @@ class SCTE35Tools:
             if output_file is None:
                 output_file = self.output_dir / f"sidecar_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
-            # Convert ad breaks to sidecar format
-            sidecar_data = {
+            # Convert ad breaks to sidecar format, writing each entry as it is read
+            header = {
                 'version': '1.0',
                 'provider_id': '0x1',
-                'provider_name': 'YourProvider',
-                'ad_breaks': []
+                'provider_name': 'YourProvider'
             }
-            
-            for ad_break in ad_breaks:
-                sidecar_data['ad_breaks'].append({
+            entries = (
+                {
                     'id': ad_break['id'],
                     'scheduled_time': ad_break['scheduled_time'],
                     'duration': ad_break['duration'],
@@ -185,11 +569,12 @@ class SCTE35Tools:
                     'auto_return': True,
                     'provider_id': ad_break.get('provider_id', '0x1'),
                     'provider_name': ad_break.get('provider_name', 'YourProvider')
-                })
+                }
+                for ad_break in ad_breaks
+            )
             
             # Write sidecar file
-            with open(output_file, 'w') as f:
-                json.dump(sidecar_data, f, indent=2)
+            write_json_document(output_file, header, 'ad_breaks', entries)
             
             logger.info(f"Generated SCTE-35 sidecar file: {output_file}")
             return output_file
@@ -208,6 +593,7 @@ def main():
     splice_parser.add_argument('--duration', type=int, required=True, help='Duration in seconds')
     splice_parser.add_argument('--provider-id', default='0x1', help='Provider ID')
     splice_parser.add_argument('--provider-name', default='YourProvider', help='Provider name')
+    splice_parser.add_argument('--pts-time', type=float, help='Splice PTS in seconds (default: splice at next opportunity)')
     splice_parser.add_argument('--output', help='Output file path')
     
     # Create time_signal command
@@ -216,30 +602,59 @@ def main():
     time_parser.add_argument('--duration', type=int, required=True, help='Duration in seconds')
     time_parser.add_argument('--provider-id', default='0x1', help='Provider ID')
     time_parser.add_argument('--provider-name', default='YourProvider', help='Provider name')
+    time_parser.add_argument('--pts-time', type=float, help='Splice PTS in seconds (default: splice at next opportunity)')
     time_parser.add_argument('--output', help='Output file path')
     
+    # Batch cue generation command
+    batch_parser = subparsers.add_parser('batch', help='Encode all cues from a schedule file into one packed output')
+    batch_parser.add_argument('schedule_file', help='Schedule JSON, NDJSON or CSV file (ad_break_id/id, duration, type, pts_time)')
+    batch_parser.add_argument('--format', choices=['binary', 'ndjson'], default='binary', help='Length-prefixed binary or NDJSON output')
+    batch_parser.add_argument('--encoding', choices=['hex', 'base64'], default='hex', help='Cue encoding for NDJSON output')
+    batch_parser.add_argument('--output', help='Output file path')
+    
     # Parse MPEG-TS command
     parse_ts_parser = subparsers.add_parser('parse_ts', help='Parse SCTE-35 from MPEG-TS')
     parse_ts_parser.add_argument('input_file', help='Input MPEG-TS file')
     parse_ts_parser.add_argument('--output', help='Output JSON file')
+    parse_ts_parser.add_argument('--scanner', action='store_true', help='Use the memory-mapped PID scanner instead of threefive.Stream')
+    parse_ts_parser.add_argument('--format', choices=['json', 'ndjson'], default='json', help='Output format (ndjson streams one cue per line, use --output - for stdout)')
     
     # Parse HLS command
     parse_hls_parser = subparsers.add_parser('parse_hls', help='Parse SCTE-35 from HLS')
     parse_hls_parser.add_argument('m3u8_url', help='HLS playlist URL')
     parse_hls_parser.add_argument('--output', help='Output JSON file')
+    parse_hls_parser.add_argument('--format', choices=['json', 'ndjson'], default='json', help='Output format (ndjson streams one cue per line, use --output - for stdout)')
+    
+    # Parse many MPEG-TS files command
+    parse_batch_parser = subparsers.add_parser('parse_batch', help='Parse SCTE-35 from many MPEG-TS files in parallel')
+    parse_batch_parser.add_argument('inputs', help='Directory or glob pattern of MPEG-TS files')
+    parse_batch_parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parse_batch_parser.add_argument('--scanner', action='store_true', help='Use the memory-mapped PID scanner instead of threefive.Stream')
+    parse_batch_parser.add_argument('--format', choices=['json', 'ndjson'], default='json', help='Output format')
+    parse_batch_parser.add_argument('--output', help='Output file path')
+    
+    # Follow live HLS command
+    follow_parser = subparsers.add_parser('follow_hls', help='Follow a live HLS playlist and stream new SCTE-35 events')
+    follow_parser.add_argument('m3u8_url', help='HLS playlist URL or local path')
+    follow_parser.add_argument('--interval', type=float, help='Reload interval in seconds (default: half the target duration)')
+    follow_parser.add_argument('--output', default='-', help='Output NDJSON file (default: stdout)')
     
     # Inject HLS command
     inject_parser = subparsers.add_parser('inject_hls', help='Inject SCTE-35 into HLS')
     inject_parser.add_argument('m3u8_file', help='Input HLS playlist file')
-    inject_parser.add_argument('scte35_file', help='SCTE-35 cues JSON file')
+    inject_parser.add_argument('scte35_file', help='SCTE-35 cues JSON, NDJSON or CSV file')
+    inject_parser.add_argument('--start-pts', type=float, default=0.0, help='PTS in seconds of the first segment in the playlist')
+    inject_parser.add_argument('--fsync', choices=['none', 'always', 'batch'], default='none', help='fsync policy for the atomic playlist write')
     inject_parser.add_argument('--output', help='Output file path')
     
     # Generate sidecar command
     sidecar_parser = subparsers.add_parser('sidecar', help='Generate SCTE-35 sidecar file')
-    sidecar_parser.add_argument('ad_breaks_file', help='Ad breaks JSON file')
+    sidecar_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file (- for NDJSON on stdin)')
     sidecar_parser.add_argument('--output', help='Output file path')
     
+    metrics.add_arguments(parser)
     args = parser.parse_args()
+    metrics.configure_from_args(args)
     
     if not args.command:
         parser.print_help()
@@ -249,54 +664,93 @@ def main():
     
     try:
         if args.command == 'splice_insert':
-            cue = tools.create_splice_insert(
+            data = tools.encode_splice_insert(
                 args.ad_break_id,
                 args.duration,
                 args.provider_id,
-                args.provider_name
+                args.provider_name,
+                args.pts_time
             )
             output = args.output or f"/tmp/splice_insert_{args.ad_break_id}.cue"
             with open(output, 'wb') as f:
-                f.write(cue.encode())
+                f.write(data)
             print(f"Created splice_insert: {output}")
         
         elif args.command == 'time_signal':
-            cue = tools.create_time_signal(
+            data = tools.encode_time_signal(
                 args.ad_break_id,
                 args.duration,
                 args.provider_id,
-                args.provider_name
+                args.provider_name,
+                args.pts_time
             )
             output = args.output or f"/tmp/time_signal_{args.ad_break_id}.cue"
             with open(output, 'wb') as f:
-                f.write(cue.encode())
+                f.write(data)
             print(f"Created time_signal: {output}")
         
+        elif args.command == 'batch':
+            extension = 'bin' if args.format == 'binary' else 'ndjson'
+            output = args.output or f"/tmp/cues_{Path(args.schedule_file).stem}.{extension}"
+            count = tools.create_cue_batch(tools.load_cue_schedule(args.schedule_file), output, args.format, args.encoding)
+            print(f"Encoded {count} cues: {output}")
+        
         elif args.command == 'parse_ts':
-            cues = tools.parse_scte35_from_mpegts(args.input_file)
-            output = args.output or f"/tmp/parsed_cues_{Path(args.input_file).stem}.json"
-            with open(output, 'w') as f:
-                json.dump(cues, f, indent=2, default=str)
-            print(f"Parsed {len(cues)} cues: {output}")
+            if args.format == 'ndjson':
+                records = tools.iter_scan_scte35_from_mpegts(args.input_file) if args.scanner else tools.iter_scte35_from_mpegts(args.input_file)
+                output = args.output or f"/tmp/parsed_cues_{Path(args.input_file).stem}.ndjson"
+                count = write_ndjson(output, records, exclude=CUE_OBJECT_FIELDS, flush=True)
+                if output != '-':
+                    print(f"Parsed {count} cues: {output}")
+            else:
+                if args.scanner:
+                    cues, stats = tools.scan_scte35_from_mpegts(args.input_file)
+                    print(f"Scanned {stats['packets']} packets: {stats['packets_per_sec']:.0f} packets/s, {stats['bytes_per_sec'] / 1e6:.1f} MB/s")
+                else:
+                    cues = tools.parse_scte35_from_mpegts(args.input_file)
+                output = args.output or f"/tmp/parsed_cues_{Path(args.input_file).stem}.json"
+                with open(output, 'w') as f:
+                    json.dump(cues, f, indent=2, default=str)
+                print(f"Parsed {len(cues)} cues: {output}")
         
         elif args.command == 'parse_hls':
-            cues = tools.parse_scte35_from_hls(args.m3u8_url)
-            output = args.output or f"/tmp/hls_cues_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(output, 'w') as f:
-                json.dump(cues, f, indent=2, default=str)
-            print(f"Parsed {len(cues)} cues: {output}")
+            if args.format == 'ndjson':
+                output = args.output or f"/tmp/hls_cues_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+                count = write_ndjson(output, tools.iter_scte35_from_hls(args.m3u8_url), exclude=CUE_OBJECT_FIELDS, flush=True)
+                if output != '-':
+                    print(f"Parsed {count} cues: {output}")
+            else:
+                cues = tools.parse_scte35_from_hls(args.m3u8_url)
+                output = args.output or f"/tmp/hls_cues_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                with open(output, 'w') as f:
+                    json.dump(cues, f, indent=2, default=str)
+                print(f"Parsed {len(cues)} cues: {output}")
+        
+        elif args.command == 'parse_batch':
+            cues, summary = tools.parse_scte35_batch(args.inputs, args.workers, args.scanner)
+            output = args.output or f"/tmp/batch_cues_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{args.format}"
+            if args.format == 'ndjson':
+                write_ndjson(output, cues, exclude=CUE_OBJECT_FIELDS, flush=True)
+            else:
+                with open(output, 'w') as f:
+                    json.dump({'summary': summary, 'cues': cues}, f, indent=2, default=str)
+            if output != '-':
+                print(f"Parsed {summary['cues']} cues from {summary['files']} files with {summary['workers']} workers: "
+                      f"{summary['files_per_sec']:.1f} files/s, {summary['bytes_per_sec'] / 1e6:.1f} MB/s, {summary['speedup']:.1f}x speedup")
+                print(f"Output: {output}")
+        
+        elif args.command == 'follow_hls':
+            write_ndjson(args.output, tools.follow_hls(args.m3u8_url, args.interval), exclude=CUE_OBJECT_FIELDS, flush=True)
         
         elif args.command == 'inject_hls':
-            with open(args.scte35_file, 'r') as f:
-                scte35_data = json.load(f)
-            cues = [threefive.Cue(cue_data) for cue_data in scte35_data['cues']]
-            output = tools.inject_scte35_into_hls(args.m3u8_file, cues, args.output)
+            cues = tools.iter_cue_file(args.scte35_file)
+            tools.writer.fsync = args.fsync
+            output = tools.inject_scte35_into_hls(args.m3u8_file, cues, args.output, args.start_pts)
+            tools.writer.sync()
             print(f"Injected SCTE-35 cues: {output}")
         
         elif args.command == 'sidecar':
-            with open(args.ad_breaks_file, 'r') as f:
-                ad_breaks = json.load(f)
-            output = tools.generate_sidecar_file(ad_breaks, args.output)
+            output = tools.generate_sidecar_file(read_schedule(args.ad_breaks_file), args.output)
             print(f"Generated sidecar file: {output}")
     
     except Exception as e:
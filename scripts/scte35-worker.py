@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+SCTE-35 Worker
+Long-lived JSON-RPC 2.0 worker serving SCTE35Tools, AdBreakGenerator and X9k3Segmenter
+methods over stdin/stdout or a Unix socket, so callers pay interpreter and import
+startup once instead of once per operation
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from datetime import date, datetime
+from pathlib import Path
+import metrics
+import toolkit
+from lazy_imports import lazy_import
+
+threefive = lazy_import('threefive')
+
+# Configure logging (stderr; stdout carries the protocol in stdio mode)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Methods callable as "<Class>.<method>"; everything else on the instances stays private
+METHODS = {
+    'SCTE35Tools': (
+        'encode_splice_insert',
+        'encode_time_signal',
+        'create_cue_batch',
+        'parse_scte35_from_mpegts',
+        'scan_scte35_from_mpegts',
+        'parse_scte35_from_hls',
+        'parse_scte35_batch',
+        'inject_scte35_into_hls',
+        'generate_sidecar_file'
+    ),
+    'AdBreakGenerator': (
+        'generate_sidecar_file',
+        'generate_scte35_cues',
+        'schedule_ad_breaks',
+        'validate_ad_breaks',
+        'find_conflicts',
+        'parse_scheduled_time'
+    ),
+    # start_segmentation is left out: it runs for the life of the stream and returns no
+    # result a caller could use (run segmenters under x9k3-segmenter.py supervise)
+    'X9k3Segmenter': (
+        'create_segmenter_config',
+        'inject_scte35_markers',
+        'create_master_playlist',
+        'measure_variants',
+        'generate_scte35_markers'
+    )
+}
+
+# Encoded from cached templates in microseconds, so they run on the event loop; a pool
+# handoff would cost more than the call itself
+INLINE_METHODS = {'SCTE35Tools.encode_splice_insert', 'SCTE35Tools.encode_time_signal'}
+
+# Parameters that take threefive.Cue objects, by method and (position, name); JSON callers
+# send each cue as a base64 or hex string, raw bytes, or {"data": ..., "scheduled_time": ...}
+CUE_PARAMS = {'SCTE35Tools.inject_scte35_into_hls': (1, 'scte35_cues')}
+
+# Latency percentiles are computed over this many of the most recent calls per method
+LATENCY_WINDOW = 4096
+
+# Upper bound on one request line, e.g. a large ad-break list sent inline
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+# One instance per class per pool thread (or process); the encoders' template caches
+# are not shared across threads
+_instances = threading.local()
+
+def _plain(value):
+    """Convert a method result into JSON types, leaving bytes for the response framing"""
+    if value is None or isinstance(value, (str, int, float, bool, bytes)):
+        return value
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Path):
+        return str(value)
+    if hasattr(value, 'tolist'):
+        # NumPy scalars and arrays
+        return _plain(value.tolist())
+    if hasattr(value, 'to_records'):
+        return [_plain(record) for record in value.to_records()]
+    if callable(getattr(value, 'get', None)):
+        # threefive.Cue and similar decoded objects
+        return _plain(value.get())
+    if hasattr(value, '__iter__'):
+        # Lists, tuples and the iter_*/stream_* generators, consumed in the worker
+        return [_plain(item) for item in value]
+    return str(value)
+
+def _cue(value):
+    """Decode one JSON-RPC cue parameter into what inject_scte35_into_hls takes"""
+    if isinstance(value, dict):
+        return {'cue': threefive.Cue(value['data']), 'scheduled_time': value.get('scheduled_time') or None}
+    return threefive.Cue(value)
+
+def _with_cues(name, params):
+    """Replace the encoded cues in a method's cue parameter with threefive.Cue objects"""
+    position, key = CUE_PARAMS[name]
+    if isinstance(params, list):
+        if len(params) > position:
+            params = params[:position] + [[_cue(value) for value in params[position]]] + params[position + 1:]
+    elif key in params:
+        params = dict(params, **{key: [_cue(value) for value in params[key]]})
+    return params
+
+def _call(class_name, method, params):
+    """Run one exposed method on this thread's (or process's) instance of class_name"""
+    instance = getattr(_instances, class_name, None)
+    if instance is None:
+        instance = getattr(toolkit, class_name)()
+        setattr(_instances, class_name, instance)
+    
+    func = getattr(instance, method)
+    result = func(*params) if isinstance(params, list) else func(**params)
+    return _plain(result)
+
+class RPCError(Exception):
+    """A JSON-RPC error response with its code"""
+    
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+class _MethodStats:
+    __slots__ = ('calls', 'errors', 'total', 'max', 'recent')
+    
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+    
+    def record(self, elapsed, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.recent.append(elapsed)
+    
+    def summary(self):
+        recent = sorted(self.recent)
+        
+        def percentile(fraction):
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] if recent else None
+        
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_mean': self.total / self.calls if self.calls else None,
+            'latency_p50': percentile(0.5),
+            'latency_p99': percentile(0.99),
+            'latency_max': self.max if self.calls else None
+        }
+
+class SCTE35Worker:
+    """Serve exposed methods as JSON-RPC 2.0 over newline-delimited JSON
+    
+    Each line is one request or a batch (a JSON array). Requests run concurrently on a
+    thread or process pool and responses are written as they complete, so they can
+    arrive out of order; match them by id. bytes results (encoded cues) are sent as
+    base64 strings, or, when a request sets "binary": true, as raw bytes after the
+    response line: the response lists their lengths in "attachments" and the result
+    refers to each one as {"$binary": index}. Requests can send bytes the same way.
+    """
+    
+    def __init__(self, workers=None, pool='thread', max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool_kind = pool
+        self.max_pending = max_pending or self.workers * 16
+        self.pool = None
+        self.started = time.monotonic()
+        self.requests = 0
+        self.in_flight = 0
+        self.method_stats = {}
+        self._known = set(self.methods())
+        self._slots = None
+    
+    def methods(self):
+        """Return the callable method names"""
+        return [f'{class_name}.{method}' for class_name, names in METHODS.items() for method in names] + ['worker.methods', 'worker.stats']
+    
+    def stats(self):
+        """Return request counters and per-method latency (seconds)"""
+        return {
+            'uptime': time.monotonic() - self.started,
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'pool': self.pool_kind,
+            'workers': self.workers,
+            'methods': {name: stats.summary() for name, stats in sorted(self.method_stats.items())}
+        }
+    
+    def _resolve(self, name):
+        class_name, _, method = name.partition('.')
+        if method not in METHODS.get(class_name, ()):
+            raise RPCError(METHOD_NOT_FOUND, f"Method not found: {name}")
+        return class_name, method
+    
+    async def _execute(self, name, params):
+        if name == 'worker.methods':
+            return self.methods()
+        if name == 'worker.stats':
+            return self.stats()
+        
+        class_name, method = self._resolve(name)
+        if not isinstance(params, (list, dict)):
+            raise RPCError(INVALID_PARAMS, "params must be an array or an object")
+        if name in CUE_PARAMS:
+            params = _with_cues(name, params)
+        if name in INLINE_METHODS:
+            return _call(class_name, method, params)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, _call, class_name, method, params)
+    
+    async def handle_request(self, request, attachments=()):
+        """Run one request object and return its response (None for a notification)"""
+        started = time.perf_counter()
+        request_id = request.get('id') if isinstance(request, dict) else None
+        name = request.get('method') if isinstance(request, dict) else None
+        failed = True
+        try:
+            if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' or not isinstance(name, str):
+                raise RPCError(INVALID_REQUEST, "Invalid Request")
+            params = _with_attachments(request.get('params', []), attachments)
+            result = await self._execute(name, params)
+            failed = False
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        except RPCError as e:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'error': _error(e.code, str(e), e.data)}
+        except TypeError as e:
+            # Wrong argument names or count for the method
+            response = {'jsonrpc': '2.0', 'id': request_id, 'error': _error(INVALID_PARAMS, str(e))}
+        except Exception as e:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'error': _error(SERVER_ERROR, str(e), {'type': type(e).__name__})}
+        
+        elapsed = time.perf_counter() - started
+        if name in self._known:
+            stats = self.method_stats.get(name)
+            if stats is None:
+                stats = self.method_stats[name] = _MethodStats()
+            stats.record(elapsed, failed)
+            metrics.observe('rpc_seconds', elapsed, method=name)
+        
+        if isinstance(request, dict) and 'id' not in request and isinstance(name, str):
+            return None  # notification
+        return response
+    
+    async def _handle_line(self, message, payload, writer):
+        try:
+            batch = isinstance(message, list) and bool(message)
+            requests = message if batch else [message]
+            responses = await asyncio.gather(*(
+                self.handle_request(request, attachments) for request, attachments in _split_attachments(requests, payload)
+            ))
+            responses = [response for response in responses if response is not None]
+            binary = any(isinstance(request, dict) and request.get('binary') for request in requests)
+            if responses:
+                writer.write(_encode_response(responses if batch else responses[0], binary))
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+    
+    async def serve_stream(self, reader, writer):
+        """Read requests from reader until EOF, writing each response as it completes"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(_encode_response(_parse_error("Request line too long"), False))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                
+                try:
+                    message = json.loads(line)
+                    payload = await reader.readexactly(_attachment_bytes(message))
+                except (ValueError, TypeError) as e:
+                    writer.write(_encode_response(_parse_error(str(e)), False))
+                    continue
+                
+                # Bounded in flight: a caller that floods the worker waits here
+                await self._slots.acquire()
+                self.requests += 1
+                self.in_flight += 1
+                task = asyncio.ensure_future(self._handle_line(message, payload, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            logger.warning("Connection closed in the middle of a request's attachments")
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await writer.drain()
+            finally:
+                writer.close()
+    
+    def _start_pool(self):
+        if self.pool_kind == 'process':
+            self.pool = futures.ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.pool = futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scte35-worker')
+    
+    async def serve_stdio(self):
+        """Serve requests from stdin and write responses to stdout until stdin closes"""
+        self._start_pool()
+        loop = asyncio.get_running_loop()
+        
+        # stdin and stdout may be pipes, files or a terminal; a reader thread and
+        # flushed writes work for all of them
+        reader = asyncio.StreamReader(limit=MAX_REQUEST_BYTES)
+        threading.Thread(target=_feed_stdin, args=(loop, reader), name='scte35-worker-stdin', daemon=True).start()
+        writer = _StdoutWriter(sys.stdout.buffer)
+        
+        # Anything a method prints must not end up in the protocol stream
+        sys.stdout = sys.stderr
+        logger.info(f"SCTE-35 worker ready on stdio ({self.workers} {self.pool_kind} workers)")
+        try:
+            await self.serve_stream(reader, writer)
+        finally:
+            self.pool.shutdown(wait=True)
+    
+    async def serve_unix(self, path):
+        """Serve requests on a Unix socket, one stream per connection, until cancelled"""
+        self._start_pool()
+        server = await asyncio.start_unix_server(self.serve_stream, path=path, limit=MAX_REQUEST_BYTES)
+        logger.info(f"SCTE-35 worker listening on unix:{path} ({self.workers} {self.pool_kind} workers)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(wait=False)
+
+class _StdoutWriter:
+    """The StreamWriter calls serve_stream uses, as flushed blocking writes to stdout"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+    
+    async def drain(self):
+        pass
+    
+    def close(self):
+        self.stream.flush()
+
+def _feed_stdin(loop, reader):
+    stream = sys.stdin.buffer
+    while True:
+        chunk = stream.read1(65536)
+        if not chunk:
+            break
+        loop.call_soon_threadsafe(reader.feed_data, chunk)
+    loop.call_soon_threadsafe(reader.feed_eof)
+
+def _error(code, message, data=None):
+    error = {'code': code, 'message': message}
+    if data is not None:
+        error['data'] = data
+    return error
+
+def _parse_error(message):
+    return {'jsonrpc': '2.0', 'id': None, 'error': _error(PARSE_ERROR, f"Parse error: {message}")}
+
+def _attachment_bytes(message):
+    """Total attachment bytes following a request line (over every request in a batch)"""
+    requests = message if isinstance(message, list) else [message]
+    return sum(sum(request.get('attachments') or ()) for request in requests if isinstance(request, dict))
+
+def _split_attachments(requests, payload):
+    """Pair each request with its own attachments, which follow the line in request order"""
+    offset = 0
+    for request in requests:
+        attachments = []
+        for length in (request.get('attachments') or ()) if isinstance(request, dict) else ():
+            attachments.append(payload[offset:offset + length])
+            offset += length
+        yield request, attachments
+
+def _with_attachments(value, attachments):
+    """Replace {"$binary": index} references in request params with the attachment bytes"""
+    if isinstance(value, dict):
+        if len(value) == 1 and '$binary' in value:
+            try:
+                return bytes(attachments[value['$binary']])
+            except (IndexError, TypeError):
+                raise RPCError(INVALID_PARAMS, f"No attachment {value['$binary']!r}")
+        return {key: _with_attachments(item, attachments) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_with_attachments(item, attachments) for item in value]
+    return value
+
+def _encode_response(responses, binary):
+    """Serialize one response (or a batch) to a line, followed by any raw attachments"""
+    attachments = []
+    first = 0
+    
+    def default(value):
+        if isinstance(value, bytes):
+            if binary:
+                attachments.append(value)
+                # Indexes count from 0 within each response
+                return {'$binary': len(attachments) - 1 - first}
+            return base64.b64encode(value).decode('ascii')
+        return str(value)
+    
+    def encode(response):
+        nonlocal first
+        first = len(attachments)
+        text = json.dumps(response, separators=(',', ':'), default=default)
+        if len(attachments) == first:
+            return text
+        lengths = ','.join(str(len(data)) for data in attachments[first:])
+        return f'{text[:-1]},"attachments":[{lengths}]}}'
+    
+    if isinstance(responses, list):
+        line = '[' + ','.join(encode(response) for response in responses) + ']'
+    else:
+        line = encode(responses)
+    return line.encode('utf-8') + b'\n' + b''.join(attachments)
+
+def main():
+    parser = argparse.ArgumentParser(description='Long-lived SCTE-35 JSON-RPC worker')
+    parser.add_argument('--unix-socket', help='Serve on a Unix socket instead of stdin/stdout')
+    parser.add_argument('--workers', type=int, help='Pool size (default: CPU count)')
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                        help='Run calls on threads (shared caches, lowest latency) or processes (CPU-heavy parses)')
+    parser.add_argument('--max-pending', type=int, help='Requests in flight before reading pauses (default: 16 per worker)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='Log level; WARNING keeps per-cue log lines off the hot path')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.configure_from_args(args)
+    logging.getLogger().setLevel(args.log_level)
+    
+    worker = SCTE35Worker(args.workers, args.pool, args.max_pending)
+    try:
+        if args.unix_socket:
+            asyncio.run(worker.serve_unix(args.unix_socket))
+        else:
+            asyncio.run(worker.serve_stdio())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+"""
+Segmenter Supervisor
+Runs one segmenter process per channel rendition, pinned to CPU sets and restarted
+when it exits, pauses renditions while disk write latency is high, and reports
+per-rendition segments/sec from each rendition's live playlist
+"""
+
+import json
+import logging
+import os
+import signal
+import subprocess
+import time
+from pathlib import Path
+from hls_playlist import AtomicFileWriter, MediaPlaylist
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Each rendition segments into <channel output>/<bitrate>k/index.m3u8
+PLAYLIST_NAME = 'index.m3u8'
+
+# Restart delay doubles per crash up to the maximum, and resets once a worker has
+# stayed up for STABLE_AFTER seconds
+RESTART_BACKOFF_MIN = 1.0
+RESTART_BACKOFF_MAX = 60.0
+STABLE_AFTER = 60.0
+
+# Smoothed disk write latency (seconds) above which renditions are paused one per poll,
+# and below which they are resumed; the gap keeps them from flapping
+DEFAULT_LATENCY_HIGH = 0.2
+DEFAULT_LATENCY_LOW = 0.05
+LATENCY_SMOOTHING = 0.3
+
+# Size of the fsync'd probe write, about one segment's worth of small writes
+PROBE_BYTES = 64 * 1024
+
+# Seconds a worker gets to exit after SIGTERM before it is killed
+STOP_TIMEOUT = 10.0
+
+
+def parse_cpu_set(text):
+    """Parse a CPU list such as '0-3,8,10-11' into a set of CPU numbers"""
+    cpus = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    if not cpus:
+        raise ValueError(f"Empty CPU set '{text}'")
+    return cpus
+
+
+def default_cpu_sets():
+    """One single-CPU set per CPU this process may run on"""
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = list(range(os.cpu_count() or 1))
+    return [{cpu} for cpu in cpus]
+
+
+def rendition_configs(config):
+    """Split a multi-stream segmenter config into one single-stream config per rendition"""
+    for stream in config['streams']:
+        rendition = f"{stream['bitrate']}k"
+        yield rendition, dict(config, output=str(Path(config['output']) / rendition), streams=[stream])
+
+
+class RenditionWorker:
+    """One segmenter process for one rendition of one channel"""
+
+    def __init__(self, channel, rendition, bitrate, config_file, output_dir, cpus):
+        self.channel = channel
+        self.rendition = rendition
+        self.bitrate = bitrate
+        self.config_file = config_file
+        self.playlist = Path(output_dir) / PLAYLIST_NAME
+        self.cpus = cpus
+        self.process = None
+        self.started_at = None
+        self.next_start = 0.0
+        self.backoff = RESTART_BACKOFF_MIN
+        self.restarts = 0
+        self.paused = False
+        self.segments = 0
+        self.rate = 0.0
+        self._sequence = None
+        self._sampled_at = None
+        self._metrics = None
+
+    @property
+    def name(self):
+        return f'{self.channel}/{self.rendition}'
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def sample(self, now):
+        """Update segments and segments/sec from the playlist's media sequence; returns new segments"""
+        try:
+            playlist = MediaPlaylist.load(self.playlist)
+        except (OSError, ValueError):
+            return 0
+        sequence = playlist.media_sequence + len(playlist.segments)
+        produced = 0
+        # A restarted segmenter starts its sequence over; count from the new playlist
+        if self._sequence is not None and sequence >= self._sequence and now > self._sampled_at:
+            produced = sequence - self._sequence
+            self.segments += produced
+            self.rate = produced / (now - self._sampled_at)
+        self._sequence = sequence
+        self._sampled_at = now
+        return produced
+
+    def status(self):
+        if self.paused:
+            state = 'paused'
+        elif self.running():
+            state = 'running'
+        else:
+            state = 'restarting'
+        return {
+            'pid': self.process.pid if self.running() else None,
+            'state': state,
+            'cpus': sorted(self.cpus) if self.cpus else None,
+            'restarts': self.restarts,
+            'segments': self.segments,
+            'segments_per_sec': self.rate
+        }
+
+
+class SegmenterSupervisor:
+    """Keep every channel rendition segmenting in its own process
+
+    command(config_file) returns the argv that segments one rendition config. Workers
+    are spread over cpu_sets (least-loaded first) and pinned with sched_setaffinity.
+    A worker that exits is restarted with exponential backoff. While smoothed disk write
+    latency under probe_dir is above latency_high, no worker is (re)started and the
+    highest-bitrate running renditions are paused (SIGSTOP) one per poll, so lower
+    renditions keep up; they resume (SIGCONT) once latency falls below latency_low.
+    """
+
+    def __init__(self, command, state_dir, probe_dir=None, cpu_sets=None, poll_interval=1.0, report_interval=10.0,
+                 latency_high=DEFAULT_LATENCY_HIGH, latency_low=DEFAULT_LATENCY_LOW, status_file=None,
+                 registry=metrics.REGISTRY):
+        self.command = command
+        self.state_dir = Path(state_dir)
+        self.probe_dir = Path(probe_dir) if probe_dir else self.state_dir
+        self.cpu_sets = cpu_sets if cpu_sets is not None else default_cpu_sets()
+        self.poll_interval = poll_interval
+        self.report_interval = report_interval
+        self.latency_high = latency_high
+        self.latency_low = latency_low
+        self.status_file = status_file
+        self.registry = registry
+        self.workers = []
+        self.disk_latency = None
+        self.writer = AtomicFileWriter()
+        self._latency_gauge = registry.gauge(
+            'scte35_segmenter_disk_write_seconds', 'Smoothed fsync write latency under the segment output directory')
+        self._paused = []
+        self._stopping = False
+        self._affinity_warned = False
+
+    def add_channel(self, channel, config):
+        """Write one config per rendition of a channel's segmenter config and queue its workers"""
+        (self.state_dir / 'configs').mkdir(parents=True, exist_ok=True)
+        for rendition, rendition_config in rendition_configs(config):
+            config_file = self.state_dir / 'configs' / f'{channel}_{rendition}.json'
+            with open(config_file, 'w') as f:
+                json.dump(rendition_config, f, indent=2)
+            worker = RenditionWorker(
+                channel, rendition, rendition_config['streams'][0]['bitrate'], config_file,
+                rendition_config['output'], self._least_loaded_cpus()
+            )
+            worker._metrics = self._bind_metrics(worker)
+            self.workers.append(worker)
+        logger.info(f"Added channel {channel} with {len(config['streams'])} renditions")
+
+    def _least_loaded_cpus(self):
+        if not self.cpu_sets:
+            return None
+        load = [sum(1 for worker in self.workers if worker.cpus is cpus) for cpus in self.cpu_sets]
+        return self.cpu_sets[load.index(min(load))]
+
+    def _bind_metrics(self, worker):
+        labels = (worker.channel, worker.rendition)
+        return {
+            'rate': self.registry.gauge(
+                'scte35_segmenter_segments_per_second', 'Segments written per second by one rendition',
+                ('channel', 'rendition')).labels(*labels),
+            'restarts': self.registry.counter(
+                'scte35_segmenter_restarts', 'Segmenter worker restarts after an exit',
+                ('channel', 'rendition')).labels(*labels),
+            'paused': self.registry.gauge(
+                'scte35_segmenter_paused', '1 while a rendition is paused for disk backpressure',
+                ('channel', 'rendition')).labels(*labels)
+        }
+
+    def _start(self, worker, now):
+        log_dir = self.state_dir / 'logs'
+        log_dir.mkdir(parents=True, exist_ok=True)
+        with open(log_dir / f'{worker.channel}_{worker.rendition}.log', 'ab') as log:
+            worker.process = subprocess.Popen(
+                self.command(str(worker.config_file)), stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT
+            )
+        worker.started_at = now
+        if worker.cpus:
+            try:
+                os.sched_setaffinity(worker.process.pid, worker.cpus)
+            except (AttributeError, OSError) as e:
+                if not self._affinity_warned:
+                    self._affinity_warned = True
+                    logger.warning(f"Could not pin segmenter workers to CPU sets: {e}")
+        logger.info(f"Started {worker.name} (pid {worker.process.pid}, cpus {sorted(worker.cpus) if worker.cpus else 'any'})")
+
+    def _check(self, worker, now, admit):
+        """Restart a worker whose process exited, once its backoff has passed"""
+        if worker.process is not None and worker.process.poll() is None:
+            if now - worker.started_at >= STABLE_AFTER:
+                worker.backoff = RESTART_BACKOFF_MIN
+            return
+        if worker.process is not None:
+            returncode = worker.process.returncode
+            worker.process = None
+            if worker.paused:
+                self._paused.remove(worker)
+                worker.paused = False
+                worker._metrics['paused'].set(0)
+            worker.restarts += 1
+            worker._metrics['restarts'].inc()
+            worker.next_start = now + worker.backoff
+            logger.warning(f"{worker.name} exited with {returncode}; restarting in {worker.backoff:.0f}s")
+            worker.backoff = min(worker.backoff * 2, RESTART_BACKOFF_MAX)
+            return
+        if admit and now >= worker.next_start:
+            self._start(worker, now)
+
+    def probe_disk_latency(self):
+        """Time one fsync'd write under probe_dir and return the smoothed latency"""
+        path = self.probe_dir / '.segmenter-latency-probe'
+        started = time.perf_counter()
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, b'\0' * PROBE_BYTES)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        latency = time.perf_counter() - started
+        if self.disk_latency is None:
+            self.disk_latency = latency
+        else:
+            self.disk_latency += LATENCY_SMOOTHING * (latency - self.disk_latency)
+        self._latency_gauge.set(self.disk_latency)
+        return self.disk_latency
+
+    def _apply_backpressure(self):
+        """Pause or resume one rendition per poll; returns whether workers may be (re)started"""
+        if self.disk_latency > self.latency_high:
+            running = [worker for worker in self.workers if worker.running() and not worker.paused]
+            # Keep at least one rendition of every channel writing
+            channels = {}
+            for worker in running:
+                channels[worker.channel] = channels.get(worker.channel, 0) + 1
+            candidates = [worker for worker in running if channels[worker.channel] > 1]
+            if candidates:
+                worker = max(candidates, key=lambda candidate: candidate.bitrate)
+                worker.process.send_signal(signal.SIGSTOP)
+                worker.paused = True
+                worker._metrics['paused'].set(1)
+                self._paused.append(worker)
+                logger.warning(f"Disk write latency {self.disk_latency * 1000:.0f} ms: paused {worker.name}")
+            return False
+
+        if self.disk_latency < self.latency_low and self._paused:
+            worker = self._paused.pop()
+            if worker.running():
+                worker.process.send_signal(signal.SIGCONT)
+            worker.paused = False
+            worker._metrics['paused'].set(0)
+            logger.info(f"Disk write latency {self.disk_latency * 1000:.0f} ms: resumed {worker.name}")
+        return True
+
+    def sample(self, now):
+        """Refresh segments/sec for every rendition"""
+        for worker in self.workers:
+            produced = worker.sample(now)
+            worker._metrics['rate'].set(worker.rate)
+            if produced:
+                metrics.inc('segments', produced, script='x9k3-supervisor')
+
+    def status(self):
+        """Return per-channel, per-rendition worker state and rates"""
+        channels = {}
+        for worker in self.workers:
+            channels.setdefault(worker.channel, {})[worker.rendition] = worker.status()
+        return {
+            'workers': len(self.workers),
+            'running': sum(1 for worker in self.workers if worker.running()),
+            'paused': len(self._paused),
+            'disk_write_latency': self.disk_latency,
+            'segments_per_sec': sum(worker.rate for worker in self.workers),
+            'channels': channels
+        }
+
+    def poll(self, now=None):
+        """One supervision pass: probe the disk, apply backpressure, restart exited workers"""
+        now = time.monotonic() if now is None else now
+        try:
+            self.probe_disk_latency()
+            admit = self._apply_backpressure()
+        except OSError as e:
+            logger.warning(f"Disk latency probe failed under {self.probe_dir}: {e}")
+            admit = True
+        for worker in self.workers:
+            self._check(worker, now, admit)
+
+    def report(self, now=None):
+        """Sample rates, log a summary and write the status file"""
+        self.sample(time.monotonic() if now is None else now)
+        status = self.status()
+        logger.info(
+            f"{status['running']}/{status['workers']} renditions running, {status['paused']} paused, "
+            f"{status['segments_per_sec']:.2f} segments/s, disk write latency {(status['disk_write_latency'] or 0) * 1000:.1f} ms"
+        )
+        if self.status_file:
+            self.writer.write(self.status_file, json.dumps(status, indent=2))
+        return status
+
+    def run(self):
+        """Supervise until SIGTERM or SIGINT, then stop every worker"""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.probe_dir.mkdir(parents=True, exist_ok=True)
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.request_stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.request_stop())
+        logger.info(f"Supervising {len(self.workers)} renditions on {len(self.cpu_sets)} CPU sets")
+
+        next_report = time.monotonic() + self.report_interval
+        try:
+            while not self._stopping:
+                self.poll()
+                now = time.monotonic()
+                if now >= next_report:
+                    self.report(now)
+                    next_report = now + self.report_interval
+                time.sleep(self.poll_interval)
+        finally:
+            self.stop()
+
+    def request_stop(self):
+        self._stopping = True
+
+    def stop(self):
+        """Terminate every worker, killing any that outlive STOP_TIMEOUT"""
+        self._stopping = True
+        live = [worker for worker in self.workers if worker.running()]
+        for worker in live:
+            if worker.paused:
+                worker.process.send_signal(signal.SIGCONT)
+                worker.paused = False
+            worker.process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for worker in live:
+            try:
+                worker.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{worker.name} did not exit after SIGTERM; killing it")
+                worker.process.kill()
+                worker.process.wait()
+        self._paused.clear()
+        logger.info(f"Stopped {len(live)} segmenter workers")
@@ -0,0 +1,58 @@
+"""
+SCTE-35 Toolkit
+Importable entry points for the hyphenated scripts, so a long-running caller (e.g. the
+web app) can use SCTE35Tools, AdBreakGenerator and friends in-process instead of paying
+interpreter and import startup on every call. Each script is loaded on first use.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Public name -> the script that defines it
+EXPORTS = {
+    'SCTE35Tools': 'scte35-tools',
+    'X9k3Segmenter': 'x9k3-segmenter',
+    'AdBreakGenerator': 'adbreak-generator',
+    'SCTE35Analyzer': 'scte35-analyzer',
+    'SCTE35AnalyzerService': 'scte35-analyzer'
+}
+
+__all__ = ['load_script', *EXPORTS]
+
+
+def load_script(name):
+    """Import scripts/<name>.py once and return the module
+
+    The module is registered under its underscored name (scte35_tools), so repeated
+    calls and pickling in process pools see the same module.
+    """
+    module_name = name.replace('-', '_')
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPTS_DIR / f'{name}.py')
+    if spec is None:
+        raise ModuleNotFoundError(f"No script named '{name}' in {SCRIPTS_DIR}", name=module_name)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+
+def __getattr__(name):
+    script = EXPORTS.get(name)
+    if script is None:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(load_script(script), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,400 @@
+"""
+Variant Measurement
+Peak and average bitrate of HLS variant playlists from their recent segments, and codecs,
+resolution and frame rate read from the segments' MPEG-TS headers, cached per segment
+"""
+
+import json
+import logging
+import math
+import os
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from hls_playlist import AtomicFileWriter, MediaPlaylist
+from lazy_imports import lazy_import
+from mpegts import (
+    PAT_PID, PTS_HZ, TS_PACKET_SIZE, SectionAssembler, find_sync_offset, packet_payload, packet_pids,
+    parse_pat, parse_pes_pts, parse_pmt, pts_delta
+)
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Segments measured from the end of each variant playlist
+DEFAULT_RECENT_SEGMENTS = 10
+
+# Bump when the cached per-segment media record changes shape
+CACHE_VERSION = 1
+
+STREAM_TYPE_H264 = 0x1B
+STREAM_TYPE_HEVC = 0x24
+STREAM_TYPE_AAC = 0x0F
+
+# Codecs that need nothing from the bitstream beyond the PMT stream_type
+STREAM_TYPE_CODECS = {
+    0x03: 'mp4a.40.34',
+    0x04: 'mp4a.40.34',
+    0x81: 'ac-3',
+    0x87: 'ec-3'
+}
+
+# H.264 profiles whose SPS carries chroma format, bit depth and scaling lists
+H264_HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135)
+
+# Access units searched for a sequence parameter set before giving up on resolution
+MAX_SPS_UNITS = 8
+
+
+class BitReader:
+    """MSB-first bit reader with Exp-Golomb codes for parameter set parsing"""
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def bits(self, count):
+        value = 0
+        for _ in range(count):
+            byte = self.data[self.position >> 3]
+            value = (value << 1) | ((byte >> (7 - (self.position & 7))) & 1)
+            self.position += 1
+        return value
+
+    def skip(self, count):
+        self.position += count
+
+    def ue(self):
+        zeros = 0
+        while not self.bits(1):
+            zeros += 1
+        return (1 << zeros) - 1 + self.bits(zeros)
+
+    def se(self):
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def iter_nal_units(data):
+    """Split an Annex B byte stream on start codes"""
+    start = data.find(b'\x00\x00\x01')
+    while start != -1:
+        start += 3
+        end = data.find(b'\x00\x00\x01', start)
+        nal = data[start:end] if end != -1 else data[start:]
+        yield nal.rstrip(b'\x00')
+        start = end
+
+
+def rbsp(nal):
+    """Remove emulation prevention bytes"""
+    return nal.replace(b'\x00\x00\x03', b'\x00\x00')
+
+
+def parse_h264_sps(nal):
+    """Return (codecs, width, height) from an H.264 SPS NAL unit"""
+    profile_idc, constraints, level_idc = nal[1], nal[2], nal[3]
+    reader = BitReader(rbsp(nal[4:]))
+    reader.ue()
+
+    chroma_format_idc = 1
+    if profile_idc in H264_HIGH_PROFILES:
+        chroma_format_idc = reader.ue()
+        if chroma_format_idc == 3:
+            reader.skip(1)
+        reader.ue()
+        reader.ue()
+        reader.skip(1)
+        if reader.bits(1):
+            for i in range(12 if chroma_format_idc == 3 else 8):
+                if reader.bits(1):
+                    last = next_scale = 8
+                    for _ in range(16 if i < 6 else 64):
+                        if next_scale:
+                            next_scale = (last + reader.se()) % 256
+                        last = next_scale or last
+
+    reader.ue()
+    pic_order_cnt_type = reader.ue()
+    if pic_order_cnt_type == 0:
+        reader.ue()
+    elif pic_order_cnt_type == 1:
+        reader.skip(1)
+        reader.se()
+        reader.se()
+        for _ in range(reader.ue()):
+            reader.se()
+    reader.ue()
+    reader.skip(1)
+
+    width_mbs = reader.ue() + 1
+    height_map_units = reader.ue() + 1
+    frame_mbs_only = reader.bits(1)
+    if not frame_mbs_only:
+        reader.skip(1)
+    reader.skip(1)
+
+    width = width_mbs * 16
+    height = (2 - frame_mbs_only) * height_map_units * 16
+    if reader.bits(1):
+        crop_x = 2 if chroma_format_idc in (1, 2) else 1
+        crop_y = (2 if chroma_format_idc == 1 else 1) * (2 - frame_mbs_only)
+        left, right, top, bottom = reader.ue(), reader.ue(), reader.ue(), reader.ue()
+        width -= crop_x * (left + right)
+        height -= crop_y * (top + bottom)
+
+    return f'avc1.{profile_idc:02x}{constraints:02x}{level_idc:02x}', width, height
+
+
+def parse_hevc_sps(nal):
+    """Return (codecs, width, height) from an HEVC SPS NAL unit"""
+    reader = BitReader(rbsp(nal[2:]))
+    reader.skip(4)
+    max_sub_layers_minus1 = reader.bits(3)
+    reader.skip(1)
+
+    profile_space = reader.bits(2)
+    tier = reader.bits(1)
+    profile_idc = reader.bits(5)
+    compatibility = reader.bits(32)
+    constraints = [reader.bits(8) for _ in range(6)]
+    level_idc = reader.bits(8)
+
+    sub_layers = [(reader.bits(1), reader.bits(1)) for _ in range(max_sub_layers_minus1)]
+    if max_sub_layers_minus1:
+        reader.skip(2 * (8 - max_sub_layers_minus1))
+    for profile_present, level_present in sub_layers:
+        reader.skip(88 * profile_present + 8 * level_present)
+
+    reader.ue()
+    chroma_format_idc = reader.ue()
+    if chroma_format_idc == 3:
+        reader.skip(1)
+    width = reader.ue()
+    height = reader.ue()
+    if reader.bits(1):
+        crop_x = 2 if chroma_format_idc in (1, 2) else 1
+        crop_y = 2 if chroma_format_idc == 1 else 1
+        left, right, top, bottom = reader.ue(), reader.ue(), reader.ue(), reader.ue()
+        width -= crop_x * (left + right)
+        height -= crop_y * (top + bottom)
+
+    # ISO/IEC 14496-15 Annex E: compatibility flags bit-reversed, trailing zero constraint bytes dropped
+    while constraints and not constraints[-1]:
+        constraints.pop()
+    codecs = 'hvc1.{}{}.{:X}.{}{}'.format(
+        ('', 'A', 'B', 'C')[profile_space], profile_idc, int(f'{compatibility:032b}'[::-1], 2),
+        'H' if tier else 'L', level_idc
+    )
+    codecs += ''.join(f'.{byte:X}' for byte in constraints)
+    return codecs, width, height
+
+
+def parse_adts_codecs(data):
+    """Return the RFC 6381 codecs string of the first ADTS AAC frame"""
+    for i in range(len(data) - 2):
+        if data[i] == 0xFF and data[i + 1] & 0xF6 == 0xF0:
+            return f'mp4a.40.{(data[i + 2] >> 6) + 1}'
+    return None
+
+
+def _pes_data(unit):
+    """Strip the PES header from a reassembled PES packet"""
+    if len(unit) < 9 or unit[:3] != b'\x00\x00\x01':
+        return b''
+    return unit[9 + unit[8]:]
+
+
+def _pes_units(packets, pids, pid):
+    """Yield the elementary stream data of each PES packet on a PID"""
+    unit = None
+    for i in np.flatnonzero(pids == pid):
+        packet = packets[i].tobytes()
+        payload = packet_payload(packet)
+        if payload is None:
+            continue
+        if packet[1] & 0x40:
+            if unit is not None:
+                yield _pes_data(bytes(unit))
+            unit = bytearray(payload)
+        elif unit is not None:
+            unit.extend(payload)
+    if unit is not None:
+        yield _pes_data(bytes(unit))
+
+
+def _find_pmt(packets, pids):
+    """Parse the PMT of the first program listed in the PAT"""
+    assembler = SectionAssembler()
+    pmt_pid = None
+    for i in np.flatnonzero(pids == PAT_PID):
+        for section in assembler.push(packets[i].tobytes()):
+            programs = parse_pat(section) if section[0] == 0x00 else {}
+            if programs:
+                pmt_pid = programs[min(programs)]
+        if pmt_pid is not None:
+            break
+    if pmt_pid is None:
+        raise ValueError("No PAT in segment")
+
+    assembler = SectionAssembler()
+    for i in np.flatnonzero(pids == pmt_pid):
+        for section in assembler.push(packets[i].tobytes()):
+            if section[0] == 0x02:
+                return parse_pmt(section)
+    raise ValueError("No PMT in segment")
+
+
+def _frame_rate(packets, pids, pid):
+    """Frame rate from the median PTS step between the video PES packets"""
+    starts = np.flatnonzero((pids == pid) & ((packets[:, 1] & 0x40) != 0))
+    pts = []
+    for i in starts:
+        payload = packet_payload(packets[i].tobytes())
+        value = parse_pes_pts(payload) if payload is not None else None
+        if value is not None:
+            pts.append(value)
+    if len(pts) < 2:
+        return None
+    # Presentation order differs from decode order with B-frames, so sort relative to the first
+    offsets = sorted(pts_delta(value, pts[0]) for value in pts)
+    steps = [b - a for a, b in zip(offsets, offsets[1:]) if b > a]
+    return round(PTS_HZ / float(np.median(steps)), 3) if steps else None
+
+
+def probe_segment(path):
+    """Read codecs, resolution and frame rate from one MPEG-TS segment"""
+    data = Path(path).read_bytes()
+    offset = find_sync_offset(data)
+    count = (len(data) - offset) // TS_PACKET_SIZE
+    packets = np.frombuffer(data, dtype=np.uint8, count=count * TS_PACKET_SIZE, offset=offset)
+    packets = packets.reshape(count, TS_PACKET_SIZE)
+    pids = packet_pids(packets)
+
+    media = {'codecs': [], 'resolution': None, 'frame_rate': None}
+    for stream in _find_pmt(packets, pids)['streams']:
+        stream_type, pid = stream['stream_type'], stream['pid']
+
+        if stream_type in (STREAM_TYPE_H264, STREAM_TYPE_HEVC):
+            parse_sps, sps_type = (
+                (parse_h264_sps, lambda nal: nal[0] & 0x1F == 7) if stream_type == STREAM_TYPE_H264
+                else (parse_hevc_sps, lambda nal: (nal[0] >> 1) & 0x3F == 33)
+            )
+            for n, unit in enumerate(_pes_units(packets, pids, pid)):
+                sps = next((nal for nal in iter_nal_units(unit) if nal and sps_type(nal)), None)
+                if sps is not None:
+                    codecs, width, height = parse_sps(sps)
+                    media['codecs'].append(codecs)
+                    media['resolution'] = f'{width}x{height}'
+                    break
+                if n + 1 >= MAX_SPS_UNITS:
+                    break
+            media['frame_rate'] = _frame_rate(packets, pids, pid)
+
+        elif stream_type == STREAM_TYPE_AAC:
+            codecs = next(filter(None, map(parse_adts_codecs, _pes_units(packets, pids, pid))), None)
+            if codecs:
+                media['codecs'].append(codecs)
+
+        elif stream_type in STREAM_TYPE_CODECS:
+            media['codecs'].append(STREAM_TYPE_CODECS[stream_type])
+
+    return media
+
+
+class VariantProber:
+    """Measure variant playlists for master playlist EXT-X-STREAM-INF attributes
+
+    BANDWIDTH is the peak and AVERAGE-BANDWIDTH the mean of segment size / EXTINF over the
+    most recent segments. Each segment's size and media probe is cached by path, size and
+    mtime (and kept in cache_file between runs), so re-measuring a live playlist only reads
+    the segments added since the last run.
+    """
+
+    def __init__(self, cache_file=None, recent_segments=DEFAULT_RECENT_SEGMENTS):
+        self.cache_file = cache_file
+        self.recent_segments = recent_segments
+        self.writer = AtomicFileWriter()
+        self.hits = 0
+        self.misses = 0
+        self._segments = None
+
+    def _cache(self):
+        if self._segments is None:
+            self._segments = {}
+            if self.cache_file and os.path.exists(self.cache_file):
+                try:
+                    with open(self.cache_file, 'r') as f:
+                        cache = json.load(f)
+                    if cache.get('version') == CACHE_VERSION:
+                        self._segments = cache['segments']
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable probe cache {self.cache_file}: {e}")
+        return self._segments
+
+    def segment_info(self, path):
+        """Return {'size', 'media'} for a segment, probing it only when new or changed"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        segments = self._cache()
+        cached = segments.get(path)
+        if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        try:
+            media = probe_segment(path)
+        except (ValueError, IndexError) as e:
+            logger.debug(f"Could not read media attributes from {path}: {e}")
+            media = None
+        cached = segments[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'media': media}
+        return cached
+
+    def measure(self, playlist_file, uri=None):
+        """Return a variant dict (uri, bandwidth, average_bandwidth, codecs, resolution, frame_rate)"""
+        playlist = MediaPlaylist.load(playlist_file)
+        base = Path(playlist_file).parent
+        recent = [segment for segment in playlist.segments if segment['duration'] > 0][-self.recent_segments:]
+
+        peak = 0.0
+        bits = 0
+        duration = 0.0
+        media = None
+        for segment in recent:
+            location = urlsplit(segment['uri'])
+            if location.scheme or location.netloc:
+                continue
+            try:
+                info = self.segment_info(base / unquote(location.path))
+            except FileNotFoundError:
+                # Expired from a live window between reading the playlist and the segment
+                continue
+            peak = max(peak, info['size'] * 8 / segment['duration'])
+            bits += info['size'] * 8
+            duration += segment['duration']
+            media = info['media'] or media
+
+        if not duration:
+            raise ValueError(f"No local segments to measure in {playlist_file}")
+
+        variant = {
+            'uri': uri or str(playlist_file),
+            'bandwidth': math.ceil(peak),
+            'average_bandwidth': math.ceil(bits / duration)
+        }
+        if media:
+            if media['codecs']:
+                variant['codecs'] = ','.join(media['codecs'])
+            if media['resolution']:
+                variant['resolution'] = media['resolution']
+            if media['frame_rate']:
+                variant['frame_rate'] = media['frame_rate']
+        return variant
+
+    def save(self):
+        """Write the segment cache, dropping segments that no longer exist"""
+        if not self.cache_file or self._segments is None:
+            return
+        self._segments = {path: info for path, info in self._segments.items() if os.path.exists(path)}
+        self.writer.write(self.cache_file, json.dumps({'version': CACHE_VERSION, 'segments': self._segments}))
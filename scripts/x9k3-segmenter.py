@@ -7,11 +7,22 @@ Uses the x9k3 library for ABR HLS segmentation with SCTE-35 support
 import argparse
 import json
 import logging
+import os
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
-import x9k3
-import threefive
+import metrics
+from cue_encoder import CueEncoder
+from hls_playlist import AtomicFileWriter, MediaPlaylist, parse_datetime
+from lazy_imports import lazy_import
+from live_playlist import LivePlaylist, SegmentReaper
+from schedule_stream import read_schedule
+from segmenter_supervisor import SegmenterSupervisor, parse_cpu_set
+from variant_probe import DEFAULT_RECENT_SEGMENTS, VariantProber
+
+# Only start and run use x9k3; config, inject, master and supervise never load it
+x9k3 = lazy_import('x9k3')
 
 # Configure logging
 logging.basicConfig(
@@ -24,8 +35,11 @@ class X9k3Segmenter:
     def __init__(self):
         self.output_dir = Path("/var/www/hls")
         self.log_dir = Path("/app/logs")
+        self.encoder = CueEncoder()
+        self.writer = AtomicFileWriter()
+        self.prober = VariantProber()
         
-    def create_segmenter_config(self, input_url, output_name, bitrates, resolutions, scte35_enabled=True):
+    def create_segmenter_config(self, input_url, output_name, bitrates, resolutions, scte35_enabled=True, dvr_depth=None):
         """Create x9k3 segmenter configuration"""
         try:
             config = {
@@ -34,7 +48,9 @@ class X9k3Segmenter:
                 'segments': 6,
                 'segment_duration': 6,
                 'playlist_size': 5,
-                'delete_segments': True,
+                # With a DVR window the live playlist window deletes segments, not x9k3
+                'delete_segments': dvr_depth is None,
+                'dvr_depth': dvr_depth,
                 'scte35': scte35_enabled,
                 'streams': []
             }
@@ -93,31 +109,166 @@ class X9k3Segmenter:
             logger.error(f"Error starting segmentation: {e}")
             raise
     
-    def inject_scte35_markers(self, m3u8_file, scte35_markers, output_file=None):
-        """Inject SCTE-35 markers into HLS playlist"""
+    def create_live_playlist(self, output_file, segment_duration=6, playlist_size=5, dvr_depth=None, delete_segments=True):
+        """Create a sliding-window live playlist; with dvr_depth it holds that many seconds instead of playlist_size segments"""
+        try:
+            reaper = SegmentReaper() if delete_segments else None
+            live = LivePlaylist(
+                output_file,
+                segment_duration,
+                window=None if dvr_depth else playlist_size,
+                dvr_depth=dvr_depth,
+                reaper=reaper,
+                writer=self.writer
+            )
+            
+            window = f"{dvr_depth}s DVR window" if dvr_depth else f"{playlist_size} segment window"
+            logger.info(f"Created live playlist {output_file} with a {window}")
+            return live
+            
+        except Exception as e:
+            logger.error(f"Error creating live playlist: {e}")
+            raise
+    
+    def publish_window(self, source_file, live, poll_interval=None):
+        """Follow a segmenter's playlist and publish its segments through a live playlist window
+        
+        New segments are found by media sequence on each reload of source_file and appended
+        with their tags (SCTE-35, discontinuities, program date time). Returns the number of
+        segments published once the source ends with EXT-X-ENDLIST.
+        """
+        source_dir = os.path.dirname(os.path.abspath(source_file))
+        output_dir = os.path.dirname(os.path.abspath(live.path))
+        next_sequence = None
+        published = 0
+        
+        try:
+            while True:
+                try:
+                    playlist = MediaPlaylist.load(source_file)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Error reloading {source_file}: {e}")
+                    playlist = None
+                
+                if playlist is not None:
+                    end = playlist.media_sequence + len(playlist.segments)
+                    restarted = next_sequence is not None and end < next_sequence
+                    if next_sequence is None or restarted:
+                        # First load publishes the whole source window; a restarted segmenter continues after a discontinuity
+                        next_sequence = playlist.media_sequence
+                    
+                    added = 0
+                    for index in range(max(next_sequence - playlist.media_sequence, 0), len(playlist.segments)):
+                        segment = playlist.segments[index]
+                        tags = [line for line in segment['lines'][:-1] if not line.startswith('#EXTINF:')]
+                        if restarted and not added and '#EXT-X-DISCONTINUITY' not in tags:
+                            tags.insert(0, '#EXT-X-DISCONTINUITY')
+                        
+                        uri = segment['uri']
+                        path = None
+                        if '://' not in uri:
+                            path = os.path.join(source_dir, uri)
+                            uri = os.path.relpath(path, output_dir)
+                        live.add_segment(uri, segment['duration'], tags, path)
+                        added += 1
+                    next_sequence = max(next_sequence, end)
+                    
+                    if added:
+                        live.publish()
+                        self.writer.sync()
+                        published += added
+                        metrics.inc('segments', added, script='x9k3-segmenter')
+                    
+                    if '#EXT-X-ENDLIST' in playlist.trailer:
+                        live.end()
+                        logger.info(f"Source ended; published {published} segments, media sequence {live.media_sequence}")
+                        return published
+                
+                # Without an explicit interval, reload at half the target duration as players do
+                time.sleep(poll_interval or live.target_duration / 2)
+            
+        except Exception as e:
+            logger.error(f"Error publishing live playlist window: {e}")
+            raise
+    
+    def create_supervisor(self, channels, state_dir, **options):
+        """Create a supervisor running one segmenter process per rendition of every channel"""
+        try:
+            script = str(Path(__file__).resolve())
+            supervisor = SegmenterSupervisor(
+                lambda config_file: [sys.executable, script, 'run', config_file],
+                state_dir,
+                **options
+            )
+            
+            for channel in channels:
+                config = self.create_segmenter_config(
+                    channel['input'],
+                    channel['name'],
+                    channel.get('bitrates', [1000, 2500, 5000]),
+                    channel.get('resolutions', ['1280x720', '1920x1080', '1920x1080']),
+                    channel.get('scte35', True)
+                )
+                supervisor.add_channel(channel['name'], config)
+            
+            logger.info(f"Created supervisor for {len(channels)} channels, {len(supervisor.workers)} renditions")
+            return supervisor
+            
+        except Exception as e:
+            logger.error(f"Error creating segmenter supervisor: {e}")
+            raise
+    
+    @metrics.timed('playlist_inject_seconds', script='x9k3-segmenter')
+    def inject_scte35_markers(self, m3u8_file, scte35_markers, output_file=None, start_time=None):
+        """Inject SCTE-35 markers into HLS playlist
+        
+        Wall-clock scheduled times are placed via EXT-X-PROGRAM-DATE-TIME, or start_time
+        (the wall-clock time of the first segment) when the playlist has none. Markers
+        that cannot be placed are skipped with a warning.
+        """
         try:
             if output_file is None:
                 output_file = m3u8_file.replace('.m3u8', '_scte35.m3u8')
             
-            # Parse the playlist
-            with open(m3u8_file, 'r') as f:
-                playlist_content = f.read()
-            
-            # Inject SCTE-35 markers
-            # This is a simplified version - in production, you'd use x9k3's built-in SCTE-35 support
-            modified_content = playlist_content
+            # Parse the playlist once into segments with cumulative start times
+            playlist = MediaPlaylist.load(m3u8_file)
+            if start_time is not None and playlist.epoch_start is None:
+                moment = start_time if isinstance(start_time, datetime) else parse_datetime(start_time)
+                playlist.epoch_start = moment.timestamp()
             
+            # Place each marker on the first segment boundary at or after its scheduled time
+            insertions = {}
+            unplaced = 0
+            unresolved = 0
             for marker in scte35_markers:
-                # Find the appropriate segment to inject the marker
-                # This would need more sophisticated timing logic
-                scte35_tag = f'#EXT-X-SCTE35:{marker["data"]}\n'
-                modified_content = modified_content.replace('#EXTINF:', scte35_tag + '#EXTINF:')
+                try:
+                    offset = playlist.offset_for(marker['scheduled_time'])
+                except (TypeError, ValueError) as e:
+                    if not unresolved:
+                        logger.warning(f"Cannot place SCTE-35 marker {marker.get('id')}: {e}")
+                    unresolved += 1
+                    continue
+                index = playlist.boundary_at_or_after(offset)
+                if index is None:
+                    unplaced += 1
+                    continue
+                insertions.setdefault(index, []).append(f'#EXT-X-SCTE35:{marker["data"]}')
+            
+            if unresolved:
+                logger.warning(f"{unresolved} SCTE-35 markers have no position in {m3u8_file} and were not injected")
             
-            # Write the modified playlist
-            with open(output_file, 'w') as f:
-                f.write(modified_content)
+            if unplaced:
+                logger.warning(f"{unplaced} SCTE-35 markers fall after the end of {m3u8_file} and were not injected")
+            unplaced += unresolved
+            metrics.inc('cues', len(scte35_markers) - unplaced, operation='inject')
+            metrics.inc('segments', len(playlist.segments), script='x9k3-segmenter')
             
-            logger.info(f"Injected {len(scte35_markers)} SCTE-35 markers into {output_file}")
+            # Write the modified playlist in one pass, atomically replacing the served file
+            if not self.writer.write(output_file, playlist.render(insertions)):
+                logger.info(f"Playlist {output_file} unchanged, skipped rewrite")
+                return output_file
+            
+            logger.info(f"Injected {len(scte35_markers) - unplaced} SCTE-35 markers into {output_file}")
             return output_file
             
         except Exception as e:
@@ -131,11 +282,21 @@ class X9k3Segmenter:
             master_content += "#EXT-X-VERSION:3\n"
             
             for variant in variant_playlists:
-                master_content += f'#EXT-X-STREAM-INF:BANDWIDTH={variant["bandwidth"]},RESOLUTION={variant["resolution"]}\n'
+                attributes = [f'BANDWIDTH={variant["bandwidth"]}']
+                if variant.get('average_bandwidth'):
+                    attributes.append(f'AVERAGE-BANDWIDTH={variant["average_bandwidth"]}')
+                if variant.get('codecs'):
+                    attributes.append(f'CODECS="{variant["codecs"]}"')
+                if variant.get('resolution'):
+                    attributes.append(f'RESOLUTION={variant["resolution"]}')
+                if variant.get('frame_rate'):
+                    attributes.append(f'FRAME-RATE={variant["frame_rate"]:.3f}')
+                master_content += f'#EXT-X-STREAM-INF:{",".join(attributes)}\n'
                 master_content += f'{variant["uri"]}\n'
             
-            with open(output_file, 'w') as f:
-                f.write(master_content)
+            if not self.writer.write(output_file, master_content):
+                logger.info(f"Master playlist {output_file} unchanged, skipped rewrite")
+                return output_file
             
             logger.info(f"Created master playlist: {output_file}")
             return output_file
@@ -144,38 +305,41 @@ class X9k3Segmenter:
             logger.error(f"Error creating master playlist: {e}")
             raise
     
+    def measure_variants(self, variant_playlists):
+        """Measure bitrate, codecs, resolution and frame rate of variant playlists from their segments"""
+        try:
+            variants = [self.prober.measure(variant_file, variant_file) for variant_file in variant_playlists]
+            self.prober.save()
+            
+            logger.info(f"Measured {len(variants)} variants (segment cache: {self.prober.hits} hits, {self.prober.misses} misses)")
+            return variants
+            
+        except Exception as e:
+            logger.error(f"Error measuring variant playlists: {e}")
+            raise
+    
     def generate_scte35_markers(self, ad_breaks):
         """Generate SCTE-35 markers for ad breaks"""
         try:
             markers = []
             
             for ad_break in ad_breaks:
-                # Create splice_insert marker
-                cue = threefive.Cue()
-                cue.command = threefive.SpliceInsert()
-                cue.command.splice_event_id = int(ad_break['id'].replace('ad', ''))
-                cue.command.splice_event_cancel_indicator = False
-                cue.command.out_of_network_indicator = True
-                cue.command.program_splice_flag = True
-                cue.command.duration_flag = True
-                cue.command.splice_immediate_flag = False
-                cue.command.break_duration = threefive.BreakDuration()
-                cue.command.break_duration.auto_return = True
-                cue.command.break_duration.duration = ad_break['duration'] * 90000
-                cue.command.avail_num = 1
-                cue.command.avails_expected = 1
-                
-                cue.encode()
+                # Create splice_insert marker from the cached template
+                data = self.encoder.splice_insert(
+                    int(ad_break['id'].replace('ad', '')),
+                    ad_break['duration'],
+                    ad_break.get('pts_time')
+                )
                 
                 markers.append({
                     'id': ad_break['id'],
                     'scheduled_time': ad_break['scheduled_time'],
                     'duration': ad_break['duration'],
-                    'data': cue.encode().hex(),
-                    'cue': cue
+                    'data': data.hex()
                 })
             
-            logger.info(f"Generated {len(markers)} SCTE-35 markers")
+            stats = self.encoder.stats()
+            logger.info(f"Generated {len(markers)} SCTE-35 markers (cue cache: {stats['hits']} hits, {stats['misses']} misses)")
             return markers
             
         except Exception as e:
@@ -193,8 +357,25 @@ def main():
     start_parser.add_argument('--bitrates', nargs='+', type=int, default=[1000, 2500, 5000], help='Bitrates in kbps')
     start_parser.add_argument('--resolutions', nargs='+', default=['1280x720', '1920x1080', '1920x1080'], help='Resolutions')
     start_parser.add_argument('--scte35', action='store_true', default=True, help='Enable SCTE-35')
+    start_parser.add_argument('--dvr-depth', type=float, help='DVR window in seconds; segments are then kept for the window command to prune')
     start_parser.add_argument('--session-id', help='Session ID')
     
+    # Run one configuration command (used by supervise workers)
+    run_parser = subparsers.add_parser('run', help='Run segmentation from a configuration file')
+    run_parser.add_argument('config_file', help='Configuration file path')
+    run_parser.add_argument('--session-id', help='Session ID')
+    
+    # Supervise many channels command
+    supervise_parser = subparsers.add_parser('supervise', help='Run and supervise one segmenter process per channel rendition')
+    supervise_parser.add_argument('channels_file', help='Channels JSON file ({"channels": [{"name", "input", "bitrates", "resolutions", "scte35"}]})')
+    supervise_parser.add_argument('--state-dir', default='/app/state/segmenters', help='Directory for rendition configs and worker logs')
+    supervise_parser.add_argument('--cpu-sets', nargs='+', help='CPU sets to pin workers to, e.g. 0-1 2-3 (default: one per CPU)')
+    supervise_parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between supervision passes')
+    supervise_parser.add_argument('--report-interval', type=float, default=10.0, help='Seconds between segments/sec reports')
+    supervise_parser.add_argument('--latency-high', type=float, default=0.2, help='Disk write latency (s) above which renditions are paused')
+    supervise_parser.add_argument('--latency-low', type=float, default=0.05, help='Disk write latency (s) below which paused renditions resume')
+    supervise_parser.add_argument('--status-file', help='Write per-rendition status JSON here on every report')
+    
     # Create config command
     config_parser = subparsers.add_parser('config', help='Create segmenter configuration')
     config_parser.add_argument('--input', required=True, help='Input URL')
@@ -202,20 +383,40 @@ def main():
     config_parser.add_argument('--bitrates', nargs='+', type=int, default=[1000, 2500, 5000], help='Bitrates in kbps')
     config_parser.add_argument('--resolutions', nargs='+', default=['1280x720', '1920x1080', '1920x1080'], help='Resolutions')
     config_parser.add_argument('--scte35', action='store_true', default=True, help='Enable SCTE-35')
+    config_parser.add_argument('--dvr-depth', type=float, help='DVR window in seconds; segments are then kept for the window command to prune')
     config_parser.add_argument('--config-file', help='Configuration file path')
     
     # Inject SCTE-35 command
     inject_parser = subparsers.add_parser('inject', help='Inject SCTE-35 markers')
     inject_parser.add_argument('m3u8_file', help='HLS playlist file')
-    inject_parser.add_argument('ad_breaks_file', help='Ad breaks JSON file')
+    inject_parser.add_argument('ad_breaks_file', help='Ad breaks JSON, NDJSON or CSV file')
     inject_parser.add_argument('--output', help='Output file path')
+    inject_parser.add_argument('--start-time', help='Wall-clock time of the first segment (ISO format), for playlists without EXT-X-PROGRAM-DATE-TIME')
+    inject_parser.add_argument('--fsync', choices=['none', 'always', 'batch'], default='none', help='fsync policy for the atomic playlist write')
+    
+    # Sliding-window live playlist command
+    window_parser = subparsers.add_parser('window', help='Publish a segmenter playlist through a sliding live window')
+    window_parser.add_argument('source', help='Playlist written by the segmenter')
+    window_parser.add_argument('--output', required=True, help='Live playlist file to publish')
+    window_parser.add_argument('--playlist-size', type=int, default=5, help='Segments in the window (without --dvr-depth)')
+    window_parser.add_argument('--dvr-depth', type=float, help='Seconds of segments in the window')
+    window_parser.add_argument('--segment-duration', type=float, default=6, help='Target segment duration in seconds')
+    window_parser.add_argument('--keep-segments', action='store_true', help='Do not delete segments that leave the window')
+    window_parser.add_argument('--poll-interval', type=float, help='Seconds between source reloads (default: half the target duration)')
+    window_parser.add_argument('--fsync', choices=['none', 'always', 'batch'], default='none', help='fsync policy for the atomic playlist write')
     
     # Create master playlist command
     master_parser = subparsers.add_parser('master', help='Create master playlist')
     master_parser.add_argument('variants', nargs='+', help='Variant playlist files')
     master_parser.add_argument('--output', required=True, help='Output master playlist file')
+    master_parser.add_argument('--fsync', choices=['none', 'always', 'batch'], default='none', help='fsync policy for the atomic playlist write')
+    master_parser.add_argument('--measure', action='store_true', help='Measure bandwidth, codecs, resolution and frame rate from each variant\'s segments')
+    master_parser.add_argument('--segments', type=int, default=DEFAULT_RECENT_SEGMENTS, help='Recent segments measured per variant')
+    master_parser.add_argument('--probe-cache', help='Per-segment measurement cache file, so repeated runs only probe new segments')
     
+    metrics.add_arguments(parser)
     args = parser.parse_args()
+    metrics.configure_from_args(args)
     
     if not args.command:
         parser.print_help()
@@ -230,7 +431,8 @@ def main():
                 args.output,
                 args.bitrates,
                 args.resolutions,
-                args.scte35
+                args.scte35,
+                args.dvr_depth
             )
             
             config_file = f"/tmp/x9k3_config_{args.output}.json"
@@ -239,13 +441,34 @@ def main():
             
             segmenter.start_segmentation(config_file, args.session_id)
         
+        elif args.command == 'run':
+            segmenter.start_segmentation(args.config_file, args.session_id)
+        
+        elif args.command == 'supervise':
+            with open(args.channels_file, 'r') as f:
+                channels = json.load(f)['channels']
+            
+            supervisor = segmenter.create_supervisor(
+                channels,
+                args.state_dir,
+                probe_dir=segmenter.output_dir,
+                cpu_sets=[parse_cpu_set(cpus) for cpus in args.cpu_sets] if args.cpu_sets else None,
+                poll_interval=args.poll_interval,
+                report_interval=args.report_interval,
+                latency_high=args.latency_high,
+                latency_low=args.latency_low,
+                status_file=args.status_file
+            )
+            supervisor.run()
+        
         elif args.command == 'config':
             config = segmenter.create_segmenter_config(
                 args.input,
                 args.output,
                 args.bitrates,
                 args.resolutions,
-                args.scte35
+                args.scte35,
+                args.dvr_depth
             )
             
             config_file = args.config_file or f"/tmp/x9k3_config_{args.output}.json"
@@ -255,24 +478,45 @@ def main():
             print(f"Created configuration: {config_file}")
         
         elif args.command == 'inject':
-            with open(args.ad_breaks_file, 'r') as f:
-                ad_breaks = json.load(f)
-            
-            markers = segmenter.generate_scte35_markers(ad_breaks)
-            output = segmenter.inject_scte35_markers(args.m3u8_file, markers, args.output)
+            segmenter.writer.fsync = args.fsync
+            markers = segmenter.generate_scte35_markers(read_schedule(args.ad_breaks_file))
+            output = segmenter.inject_scte35_markers(args.m3u8_file, markers, args.output, args.start_time)
+            segmenter.writer.sync()
             print(f"Injected SCTE-35 markers: {output}")
         
+        elif args.command == 'window':
+            segmenter.writer.fsync = args.fsync
+            live = segmenter.create_live_playlist(
+                args.output,
+                args.segment_duration,
+                args.playlist_size,
+                args.dvr_depth,
+                not args.keep_segments
+            )
+            try:
+                published = segmenter.publish_window(args.source, live, args.poll_interval)
+            finally:
+                if live.reaper is not None:
+                    live.reaper.close()
+            print(f"Published {published} segments to {args.output}")
+        
         elif args.command == 'master':
-            variants = []
-            for variant_file in args.variants:
-                # Parse bitrate and resolution from filename (simplified)
-                variants.append({
-                    'uri': variant_file,
-                    'bandwidth': 2500000,  # Default bandwidth
-                    'resolution': '1920x1080'  # Default resolution
-                })
+            if args.measure:
+                segmenter.prober = VariantProber(args.probe_cache, args.segments)
+                variants = segmenter.measure_variants(args.variants)
+            else:
+                variants = []
+                for variant_file in args.variants:
+                    # Parse bitrate and resolution from filename (simplified)
+                    variants.append({
+                        'uri': variant_file,
+                        'bandwidth': 2500000,  # Default bandwidth
+                        'resolution': '1920x1080'  # Default resolution
+                    })
             
+            segmenter.writer.fsync = args.fsync
             output = segmenter.create_master_playlist(variants, args.output)
+            segmenter.writer.sync()
             print(f"Created master playlist: {output}")
     
     except Exception as e:
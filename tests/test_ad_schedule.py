@@ -0,0 +1,156 @@
+import pytest
+
+from ad_schedule import AdBreakTable, ConflictIndex
+from schedule_stream import schedule_stream, validate_stream
+from toolkit import load_script
+
+BUMPER = [{'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 5, 'ad_id': 'bumper'}]
+
+UNSORTED = [
+    {'id': 'ad2', 'scheduled_time': '2026-10-18T13:00:00Z', 'duration': 30, 'ad_id': 'b'},
+    {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 30, 'ad_id': 'a', 'name': 'Opener'},
+    {'id': 'ad3', 'scheduled_time': '2026-10-18T14:00:00Z', 'duration': 60, 'ad_id': 'c'}
+]
+
+
+class SidecarRecorder:
+    def __init__(self):
+        self.entries = None
+
+    def generate_sidecar(self, entries, output_file, provider_id, provider_name):
+        self.entries = list(entries)
+        return output_file
+
+
+def test_overlap_is_reported_against_every_earlier_break():
+    table = AdBreakTable.from_records([
+        {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 120, 'ad_id': 'a'},
+        {'id': 'ad2', 'scheduled_time': '2026-10-18T12:00:30Z', 'duration': 30, 'ad_id': 'b'},
+        {'id': 'ad3', 'scheduled_time': '2026-10-18T12:00:50Z', 'duration': 30, 'ad_id': 'c'}
+    ])
+
+    pairs = [(conflict['id'], conflict['other_id']) for conflict in table.conflicts()]
+
+    assert pairs == [('ad2', 'ad1'), ('ad3', 'ad1'), ('ad3', 'ad2')]
+
+
+def test_back_to_back_breaks_and_other_channels_do_not_overlap():
+    table = AdBreakTable.from_records([
+        {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 30, 'ad_id': 'a'},
+        {'id': 'ad2', 'scheduled_time': '2026-10-18T12:00:30Z', 'duration': 30, 'ad_id': 'b'},
+        {'id': 'ad3', 'scheduled_time': '2026-10-18T12:00:10Z', 'duration': 30, 'ad_id': 'c', 'channel': 'west'}
+    ])
+
+    assert table.conflicts() == []
+
+
+def test_duplicate_splice_event_id_is_a_conflict():
+    table = AdBreakTable.from_records([
+        {'id': 'first', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 30, 'ad_id': 'a', 'splice_event_id': 7},
+        {'id': 'second', 'scheduled_time': '2026-10-18T13:00:00Z', 'duration': 30, 'ad_id': 'b', 'splice_event_id': 7}
+    ])
+
+    [conflict] = table.conflicts()
+
+    assert conflict['type'] == 'duplicate_event_id'
+    assert (conflict['id'], conflict['other_id']) == ('second', 'first')
+
+
+def test_break_shorter_than_a_segment_is_a_conflict():
+    table = AdBreakTable.from_records([
+        {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 5, 'ad_id': 'bumper'}
+    ])
+
+    [conflict] = table.conflicts(min_duration=6)
+
+    assert conflict['type'] == 'short'
+
+
+def test_batch_and_incremental_checks_find_the_same_pairs():
+    ad_breaks = [
+        {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 300, 'ad_id': 'a'},
+        {'id': 'ad2', 'scheduled_time': '2026-10-18T12:01:00Z', 'duration': 30, 'ad_id': 'b'},
+        {'id': 'ad3', 'scheduled_time': '2026-10-18T12:01:20Z', 'duration': 30, 'ad_id': 'c'},
+        {'id': 'ad4', 'scheduled_time': '2026-10-18T12:10:00Z', 'duration': 30, 'ad_id': 'd', 'splice_event_id': 2},
+        {'id': 'ad5', 'scheduled_time': '2026-10-18T12:20:00Z', 'duration': 30, 'ad_id': 'e', 'splice_event_id': 2}
+    ]
+    index = ConflictIndex()
+
+    incremental = [(c['type'], c['id'], c['other_id']) for ad_break in ad_breaks for c in index.add(ad_break)]
+    batch = [(c['type'], c['id'], c['other_id']) for c in AdBreakTable.from_records(ad_breaks).conflicts()]
+
+    assert sorted(batch) == sorted(incremental)
+
+
+def test_iter_records_carries_pts_time_and_type():
+    table = AdBreakTable.from_records([
+        {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 30, 'ad_id': 'a', 'pts_time': 12.5,
+         'type': 'time_signal'},
+        {'id': 'ad2', 'scheduled_time': '2026-10-18T13:00:00Z', 'duration': 30, 'ad_id': 'b'}
+    ])
+
+    scheduled, _ = table.schedule(0)
+    first, second = scheduled.iter_records()
+
+    assert (first['pts_time'], first['type']) == (12.5, 'time_signal')
+    assert 'pts_time' not in second and 'type' not in second
+
+
+def test_conflicts_are_warnings_by_default():
+    generator = load_script('adbreak-generator').AdBreakGenerator()
+
+    assert len(generator.load_ad_breaks(BUMPER)) == 1
+    assert [ad_break['id'] for ad_break in generator.stream_ad_breaks(iter(BUMPER), skip_past=False)] == ['ad1']
+
+
+def test_strict_conflicts_raise():
+    generator = load_script('adbreak-generator').AdBreakGenerator(strict_conflicts=True)
+
+    with pytest.raises(ValueError, match='shorter than one'):
+        generator.load_ad_breaks(BUMPER)
+    with pytest.raises(ValueError, match='shorter than one'):
+        list(generator.stream_ad_breaks(iter(BUMPER), skip_past=False))
+
+
+def test_validation_errors_stay_fatal():
+    generator = load_script('adbreak-generator').AdBreakGenerator()
+
+    with pytest.raises(ValueError, match='validation failed'):
+        generator.load_ad_breaks([{'id': 'ad1', 'scheduled_time': 'not a time', 'duration': 30, 'ad_id': 'a'}])
+
+
+def test_iter_records_keeps_unparseable_time_as_none():
+    table = AdBreakTable.from_records([{'id': 'ad1', 'scheduled_time': 'not a time', 'duration': 30, 'ad_id': 'a'}])
+
+    [record] = table.iter_records()
+
+    assert record['scheduled_time'] is None
+
+
+def test_streamed_and_batch_sidecars_hand_adbreak3_the_same_entries(monkeypatch, tmp_path):
+    module = load_script('adbreak-generator')
+    generator = module.AdBreakGenerator()
+    recorder = SidecarRecorder()
+    monkeypatch.setattr(module, 'adbreak3', recorder)
+
+    generator.generate_sidecar_file(generator.schedule_ad_breaks(UNSORTED, '2026-10-18T00:00:00Z'), tmp_path / 'batch.json')
+    batch = recorder.entries
+    generator.stream_sidecar_file(generator.stream_ad_breaks(iter(UNSORTED), '2026-10-18T00:00:00Z'), tmp_path / 'stream.json')
+
+    assert [entry['ad_id'] for entry in batch] == ['a', 'b', 'c']
+    assert recorder.entries == batch
+
+
+def test_break_beyond_the_reorder_window_is_dropped_not_fatal():
+    ad_breaks = [
+        {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:00Z', 'duration': 30, 'ad_id': 'a'},
+        {'id': 'ad3', 'scheduled_time': '2026-10-18T14:00:00Z', 'duration': 30, 'ad_id': 'c'},
+        {'id': 'ad4', 'scheduled_time': '2026-10-18T15:00:00Z', 'duration': 30, 'ad_id': 'd'},
+        {'id': 'ad2', 'scheduled_time': '2026-10-18T13:00:00Z', 'duration': 30, 'ad_id': 'b'}
+    ]
+    stats = {}
+
+    scheduled = schedule_stream(validate_stream(iter(ad_breaks)), window=1, stats=stats, skip_past=False)
+
+    assert [ad_break['id'] for ad_break in scheduled] == ['ad1', 'ad3', 'ad4']
+    assert stats == {'scheduled': 3, 'skipped': 0, 'late': 1}
@@ -0,0 +1,42 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import threefive
+
+from toolkit import load_script
+
+
+class ListSink:
+    target = 'list://'
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, data, record):
+        self.sent.append((data, record))
+
+    def close(self):
+        pass
+
+
+def test_dispatch_keeps_pts_time_and_cue_type():
+    generator = load_script('adbreak-generator').AdBreakGenerator()
+    start = datetime.now(timezone.utc) + timedelta(seconds=0.2)
+    ad_breaks = [
+        {'id': 'ad1', 'scheduled_time': start.isoformat(), 'duration': 30, 'ad_id': 'a', 'channel': 'east',
+         'pts_time': 123.5},
+        {'id': 'ad2', 'scheduled_time': (start + timedelta(seconds=0.1)).isoformat(), 'duration': 30, 'ad_id': 'b', 'channel': 'west',
+         'pts_time': 200.0, 'type': 'time_signal'}
+    ]
+    sink = ListSink()
+
+    stats = asyncio.run(generator.dispatch_ad_breaks(ad_breaks, [sink], lead_time=0.05, pts_clock=(0.0, 0.0)))
+
+    assert stats['dispatched'] == 2
+    cues = {record['id']: threefive.Cue(data) for data, record in sink.sent}
+    for cue in cues.values():
+        cue.decode()
+    assert cues['ad1'].command.command_type == 5
+    assert cues['ad1'].command.pts_time == 123.5
+    assert cues['ad2'].command.command_type == 6
+    assert cues['ad2'].command.pts_time == 200.0
@@ -0,0 +1,79 @@
+import threefive
+
+from cue_encoder import CueEncoder, build_splice_insert, build_time_signal, crc32_mpeg2, encoded_cue_bytes
+from toolkit import load_script
+
+
+def test_patched_splice_insert_matches_fresh_encode():
+    encoder = CueEncoder()
+    encoder.splice_insert(1, 30.0, 10.0)
+
+    data = encoder.splice_insert(4242, 30.0, 1234.5)
+
+    assert encoder.hits == 1
+    assert data == encoded_cue_bytes(build_splice_insert(4242, 30.0, 1234.5))
+
+
+def test_patched_splice_insert_without_pts_matches_fresh_encode():
+    encoder = CueEncoder()
+    encoder.splice_insert(1, 15.0)
+
+    assert encoder.splice_insert(77, 15.0) == encoded_cue_bytes(build_splice_insert(77, 15.0))
+
+
+def test_patched_time_signal_matches_fresh_encode():
+    encoder = CueEncoder()
+    encoder.time_signal(1, 30.0, 10.0)
+
+    data = encoder.time_signal(2, 30.0, 95443.7)
+
+    assert encoder.hits == 1
+    assert data == encoded_cue_bytes(build_time_signal(2, 30.0, 95443.7))
+
+
+def test_patched_section_has_valid_crc():
+    data = CueEncoder().splice_insert(9, 60.0, 42.0)
+
+    assert crc32_mpeg2(data[:-4]) == int.from_bytes(data[-4:], 'big')
+
+
+def test_templates_are_evicted_least_recently_used():
+    encoder = CueEncoder(max_templates=2)
+    encoder.splice_insert(1, 15.0)
+    encoder.splice_insert(1, 30.0)
+    encoder.splice_insert(1, 15.0)
+    encoder.splice_insert(1, 60.0)
+
+    encoder.splice_insert(1, 15.0)
+    encoder.splice_insert(1, 30.0)
+
+    assert encoder.stats() == {'hits': 2, 'misses': 4, 'templates': 2, 'hit_ratio': 2 / 6}
+
+
+def test_create_splice_insert_returns_cue_and_encode_returns_bytes():
+    tools = load_script('scte35-tools').SCTE35Tools()
+
+    cue = tools.create_splice_insert('ad7', 30, pts_time=12.0)
+    data = tools.encode_splice_insert('ad7', 30, pts_time=12.0)
+
+    assert isinstance(cue, threefive.Cue)
+    assert encoded_cue_bytes(cue) == data
+
+
+def test_time_signal_template_is_shared_across_durations():
+    encoder = CueEncoder()
+    encoder.time_signal(1, 15.0, 10.0)
+
+    encoder.time_signal(2, 30.0, 20.0)
+    encoder.time_signal(3, 60.0, 30.0)
+
+    assert encoder.stats()['templates'] == 1
+    assert encoder.hits == 2
+
+
+def test_pts_time_zero_is_encoded():
+    cue = threefive.Cue(CueEncoder().splice_insert(5, 30.0, 0.0))
+    cue.decode()
+
+    assert cue.command.time_specified_flag
+    assert cue.command.pts_time == 0.0
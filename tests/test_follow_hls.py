@@ -0,0 +1,84 @@
+import os
+
+from toolkit import load_script
+
+HEADER = '#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:6\n#EXT-X-MEDIA-SEQUENCE:{sequence}\n'
+
+
+def segment(number, *tags):
+    return ''.join(f'{tag}\n' for tag in tags) + f'#EXTINF:6.000,\nseg{number}.ts\n'
+
+
+def replace(path, content):
+    """Rewrite the playlist the way a segmenter sliding its window does: a new file renamed over it"""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        f.write(content)
+    os.replace(temporary, path)
+
+
+def tags(events):
+    return [(event['sequence'], event['segment'], event['tag']) for event in events]
+
+
+def test_appended_segments_yield_only_new_events(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    path.write_text(HEADER.format(sequence=0) + segment(0) + segment(1, '#EXT-X-CUE-OUT:12'))
+    follower = load_script('scte35-tools').HLSPlaylistFollower(str(path))
+
+    assert tags(follower.poll()) == [(1, 'seg1.ts', 'EXT-X-CUE-OUT')]
+
+    with open(path, 'a') as f:
+        f.write(segment(2, '#EXT-X-CUE-OUT-CONT:ElapsedTime=6,Duration=12') + segment(3, '#EXT-X-CUE-IN'))
+
+    assert tags(follower.poll()) == [(2, 'seg2.ts', 'EXT-X-CUE-OUT-CONT'), (3, 'seg3.ts', 'EXT-X-CUE-IN')]
+    assert follower.poll() == []
+
+
+def test_reload_with_advanced_media_sequence_skips_reported_segments(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    path.write_text(HEADER.format(sequence=0) + segment(0) + segment(1, '#EXT-X-CUE-OUT:12') + segment(2))
+    follower = load_script('scte35-tools').HLSPlaylistFollower(str(path))
+    follower.poll()
+
+    replace(path, HEADER.format(sequence=1) + segment(1, '#EXT-X-CUE-OUT:12') + segment(2) + segment(3, '#EXT-X-CUE-IN'))
+
+    assert tags(follower.poll()) == [(3, 'seg3.ts', 'EXT-X-CUE-IN')]
+    assert follower.media_sequence == 1
+
+
+def test_reload_does_not_repeat_a_pending_tag(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    # The segmenter has written the cue tag but not yet the segment it belongs to
+    path.write_text(HEADER.format(sequence=0) + segment(0) + '#EXT-X-SCTE35:CUE="abc"\n')
+    follower = load_script('scte35-tools').HLSPlaylistFollower(str(path))
+    assert follower.poll() == []
+
+    replace(path, HEADER.format(sequence=0) + segment(0) + segment(1, '#EXT-X-SCTE35:CUE="abc"'))
+
+    events = follower.poll()
+    assert tags(events) == [(1, 'seg1.ts', 'EXT-X-SCTE35')]
+    assert events[0]['value'] == 'CUE="abc"'
+
+
+def test_follow_hls_stops_at_endlist(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    path.write_text(HEADER.format(sequence=5) + segment(5, '#EXT-X-CUE-IN') + '#EXT-X-ENDLIST\n')
+    tools = load_script('scte35-tools').SCTE35Tools()
+
+    assert tags(tools.follow_hls(str(path), poll_interval=0.01)) == [(5, 'seg5.ts', 'EXT-X-CUE-IN')]
+
+
+def test_reload_keeps_a_tag_written_after_the_last_reported_segment(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    path.write_text(HEADER.format(sequence=0) + segment(0) + segment(1))
+    follower = load_script('scte35-tools').HLSPlaylistFollower(str(path))
+    follower.poll()
+
+    replace(path, HEADER.format(sequence=1) + segment(1) + '#EXT-X-CUE-OUT:6\n')
+    assert follower.poll() == []
+
+    with open(path, 'a') as f:
+        f.write('#EXTINF:6.000,\nseg2.ts\n')
+
+    assert tags(follower.poll()) == [(2, 'seg2.ts', 'EXT-X-CUE-OUT')]
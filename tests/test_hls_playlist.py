@@ -0,0 +1,208 @@
+import os
+from datetime import datetime, timezone
+
+from cue_encoder import build_splice_insert
+from hls_playlist import AtomicFileWriter, MediaPlaylist
+from toolkit import load_script
+
+PLAYLIST = '''#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:40
+#EXTINF:6.000,
+seg40.ts
+#EXTINF:6.000,
+seg41.ts
+#EXTINF:6.000,
+seg42.ts
+#EXT-X-ENDLIST
+'''
+
+PLAYLIST_WITH_PDT = PLAYLIST.replace('#EXTINF:6.000,\nseg40.ts', '#EXT-X-PROGRAM-DATE-TIME:2026-10-18T12:00:00Z\n#EXTINF:6.000,\nseg40.ts')
+
+
+def test_parse_reads_segments_and_media_sequence():
+    playlist = MediaPlaylist.parse(PLAYLIST)
+
+    assert playlist.media_sequence == 40
+    assert playlist.starts == [0.0, 6.0, 12.0]
+    assert playlist.total_duration == 18.0
+
+
+def test_boundary_at_or_after():
+    playlist = MediaPlaylist.parse(PLAYLIST)
+
+    assert playlist.boundary_at_or_after(0.0) == 0
+    assert playlist.boundary_at_or_after(6.0) == 1
+    assert playlist.boundary_at_or_after(6.5) == 2
+    assert playlist.boundary_at_or_after(12.5) is None
+
+
+def test_offset_for_wall_clock_time_uses_program_date_time():
+    playlist = MediaPlaylist.parse(PLAYLIST_WITH_PDT)
+
+    assert playlist.offset_for('2026-10-18T12:00:07Z') == 7.0
+    assert playlist.offset_for(3) == 3.0
+
+
+def test_inject_places_marker_by_wall_clock_time(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST_WITH_PDT)
+    segmenter = load_script('x9k3-segmenter').X9k3Segmenter()
+
+    output = segmenter.inject_scte35_markers(str(source), [{'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:05Z', 'data': 'CUE'}])
+
+    lines = open(output).read().splitlines()
+    assert lines[lines.index('seg41.ts') - 2] == '#EXT-X-SCTE35:CUE'
+
+
+def test_inject_skips_wall_clock_marker_without_program_date_time(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST)
+    segmenter = load_script('x9k3-segmenter').X9k3Segmenter()
+    markers = [
+        {'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:05Z', 'data': 'WALL'},
+        {'id': 'ad2', 'scheduled_time': 12, 'data': 'OFFSET'}
+    ]
+
+    output = segmenter.inject_scte35_markers(str(source), markers)
+
+    content = open(output).read()
+    assert '#EXT-X-SCTE35:WALL' not in content
+    assert '#EXT-X-SCTE35:OFFSET\n#EXTINF:6.000,\nseg42.ts' in content
+
+
+def test_inject_start_time_places_wall_clock_marker(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST)
+    segmenter = load_script('x9k3-segmenter').X9k3Segmenter()
+
+    output = segmenter.inject_scte35_markers(
+        str(source), [{'id': 'ad1', 'scheduled_time': '2026-10-18T12:00:05Z', 'data': 'CUE'}],
+        start_time='2026-10-18T12:00:00Z'
+    )
+
+    assert '#EXT-X-SCTE35:CUE\n#EXTINF:6.000,\nseg41.ts' in open(output).read()
+
+
+def test_atomic_writer_skips_unchanged_content(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    writer = AtomicFileWriter()
+
+    assert writer.write(str(path), PLAYLIST)
+    assert not writer.write(str(path), PLAYLIST)
+    assert writer.write(str(path), PLAYLIST_WITH_PDT)
+    assert path.read_text() == PLAYLIST_WITH_PDT
+
+
+def test_inject_into_hls_places_cue_by_pts_and_marks_the_break(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    cue = tools.create_splice_insert('ad1', 12, pts_time=101.0)
+
+    output = tools.inject_scte35_into_hls(str(source), [cue], start_pts=100.0)
+
+    lines = [line for line in open(output).read().splitlines() if line.startswith('#EXT-X-CUE') or line.endswith('.ts')]
+    # Splice point 1s into the playlist lands on the next boundary, seg41
+    assert lines == [
+        'seg40.ts',
+        '#EXT-X-CUE-OUT:12', 'seg41.ts',
+        '#EXT-X-CUE-OUT-CONT:ElapsedTime=6,Duration=12', 'seg42.ts'
+    ]
+
+
+def test_inject_into_hls_returns_to_network_after_the_break(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    cue = tools.create_splice_insert('ad1', 6, pts_time=100.0)
+
+    output = tools.inject_scte35_into_hls(str(source), [cue], start_pts=100.0)
+
+    assert '#EXT-X-CUE-OUT:6\n#EXTINF:6.000,\nseg40.ts\n#EXT-X-CUE-IN\n#EXTINF:6.000,\nseg41.ts' in open(output).read()
+
+
+def test_inject_into_hls_writes_cue_in_for_a_return_splice(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    cue = build_splice_insert(2, 0, pts_time=106.0)
+    cue.command.out_of_network_indicator = False
+    cue.command.duration_flag = False
+    cue.encode()
+
+    output = tools.inject_scte35_into_hls(str(source), [cue], start_pts=100.0)
+
+    content = open(output).read()
+    assert '#EXT-X-CUE-OUT' not in content
+    assert '#EXT-X-CUE-IN\n#EXTINF:6.000,\nseg41.ts' in content
+
+
+def test_inject_into_hls_time_signal_without_duration_opens_no_break(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    cue = tools.create_time_signal('ad3', 30, pts_time=106.0)
+
+    output = tools.inject_scte35_into_hls(str(source), [cue], start_pts=100.0)
+
+    lines = open(output).read().splitlines()
+    assert lines[lines.index('seg41.ts') - 2].startswith('#EXT-X-SCTE35:CUE=')
+    assert not [line for line in lines if line.startswith('#EXT-X-CUE-')]
+
+
+def test_offset_for_accepts_datetime():
+    playlist = MediaPlaylist.parse(PLAYLIST_WITH_PDT)
+
+    assert playlist.offset_for(datetime(2026, 10, 18, 12, 0, 9, tzinfo=timezone.utc)) == 9.0
+
+
+def test_inject_skips_marker_without_scheduled_time(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST_WITH_PDT)
+    segmenter = load_script('x9k3-segmenter').X9k3Segmenter()
+    markers = [{'id': 'ad1', 'scheduled_time': None, 'data': 'NONE'}, {'id': 'ad2', 'scheduled_time': 6, 'data': 'OK'}]
+
+    output = segmenter.inject_scte35_markers(str(source), markers)
+
+    content = open(output).read()
+    assert 'NONE' not in content
+    assert '#EXT-X-SCTE35:OK\n#EXTINF:6.000,\nseg41.ts' in content
+
+
+def test_inject_into_hls_falls_back_to_pts_for_a_bad_scheduled_time(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST_WITH_PDT)
+    tools = load_script('scte35-tools').SCTE35Tools()
+    cue = tools.create_splice_insert('ad1', 6, pts_time=106.0)
+
+    output = tools.inject_scte35_into_hls(str(source), [{'cue': cue, 'scheduled_time': 'soon'}], start_pts=100.0)
+
+    assert '#EXT-X-CUE-OUT:6\n#EXTINF:6.000,\nseg41.ts' in open(output).read()
+
+
+def test_atomic_writer_rewrites_a_file_changed_behind_its_back(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    writer = AtomicFileWriter()
+    writer.write(str(path), PLAYLIST)
+
+    path.write_text('#EXTM3U\n')
+
+    assert writer.write(str(path), PLAYLIST)
+    assert path.read_text() == PLAYLIST
+
+
+def test_atomic_replace_keeps_mode_and_leaves_no_temp_files(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    path.write_text('')
+    path.chmod(0o640)
+    writer = AtomicFileWriter(fsync='batch')
+
+    writer.replace(str(path), b'#EXTM3U\n', PLAYLIST.encode()[8:])
+    writer.sync()
+
+    assert path.read_text() == PLAYLIST
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ['live.m3u8']
+    assert writer.writes == 1
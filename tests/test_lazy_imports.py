@@ -0,0 +1,59 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import toolkit
+from lazy_imports import lazy_import
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+
+
+def test_module_code_runs_on_first_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / 'lazy_probe.py').write_text('import sys\nsys.lazy_probe_loads = getattr(sys, "lazy_probe_loads", 0) + 1\nVALUE = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazy_probe', raising=False)
+    monkeypatch.setattr(sys, 'lazy_probe_loads', 0, raising=False)
+
+    module = lazy_import('lazy_probe')
+    assert sys.lazy_probe_loads == 0
+
+    assert module.VALUE == 42
+    assert sys.lazy_probe_loads == 1
+    assert lazy_import('lazy_probe') is module
+    sys.modules.pop('lazy_probe')
+
+
+def test_missing_module_fails_on_use_not_on_import():
+    module = lazy_import('no_such_scte35_module')
+
+    with pytest.raises(ModuleNotFoundError, match='no_such_scte35_module'):
+        module.Cue
+
+
+def test_loading_the_scripts_does_not_execute_heavy_dependencies():
+    code = (
+        "import sys, toolkit\n"
+        "for name in ('scte35-tools', 'adbreak-generator', 'x9k3-segmenter', 'scte35-analyzer'):\n"
+        "    toolkit.load_script(name)\n"
+        "print(sorted(m for m in sys.modules if m.startswith(('threefive.', 'm3ufu.', 'numpy.', 'x9k3.', 'asyncio.'))))\n"
+    )
+
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS_DIR, stdout=subprocess.PIPE, text=True, check=True)
+
+    assert result.stdout.strip() == '[]'
+
+
+def test_toolkit_resolves_exports_from_their_scripts():
+    assert toolkit.SCTE35Tools is toolkit.load_script('scte35-tools').SCTE35Tools
+    assert toolkit.load_script('scte35-tools') is sys.modules['scte35_tools']
+    with pytest.raises(AttributeError):
+        toolkit.NoSuchTool
+
+
+def test_failed_script_load_is_not_registered():
+    with pytest.raises(FileNotFoundError):
+        toolkit.load_script('no-such-script')
+
+    assert 'no_such_script' not in sys.modules
@@ -0,0 +1,77 @@
+import time
+
+from live_playlist import LivePlaylist, SegmentReaper
+
+
+def test_window_slides_and_advances_media_sequence(tmp_path):
+    live = LivePlaylist(str(tmp_path / 'live.m3u8'), 6, window=3)
+
+    for i in range(5):
+        live.add_segment(f'seg{i}.ts', 6.0)
+
+    content = live.render().decode()
+    assert len(live) == 3
+    assert '#EXT-X-MEDIA-SEQUENCE:2\n' in content
+    assert [line for line in content.splitlines() if line.endswith('.ts')] == ['seg2.ts', 'seg3.ts', 'seg4.ts']
+
+
+def test_dropping_a_discontinuity_advances_discontinuity_sequence(tmp_path):
+    live = LivePlaylist(str(tmp_path / 'live.m3u8'), 6, window=2)
+
+    live.add_segment('seg0.ts', 6.0, tags=('#EXT-X-DISCONTINUITY',))
+    live.add_segment('seg1.ts', 6.0)
+    live.add_segment('seg2.ts', 6.0)
+
+    assert live.discontinuity_sequence == 1
+    assert '#EXT-X-DISCONTINUITY-SEQUENCE:1\n' in live.render().decode()
+
+
+def test_dvr_depth_bounds_the_window_duration(tmp_path):
+    live = LivePlaylist(str(tmp_path / 'live.m3u8'), 6, dvr_depth=18)
+
+    for i in range(10):
+        live.add_segment(f'seg{i}.ts', 6.0)
+
+    assert len(live) == 3
+    assert live.duration == 18.0
+
+
+def test_publish_and_end_write_the_playlist(tmp_path):
+    path = tmp_path / 'live.m3u8'
+    live = LivePlaylist(str(path), 6, window=3)
+    live.add_segment('seg0.ts', 6.0)
+
+    live.publish()
+    assert path.read_bytes() == live.render()
+
+    live.end()
+    assert path.read_text().endswith('seg0.ts\n#EXT-X-ENDLIST\n')
+
+
+def test_dropped_segments_are_reaped_after_their_delay(tmp_path):
+    reaper = SegmentReaper(interval=60)
+    live = LivePlaylist(str(tmp_path / 'live.m3u8'), 6, window=1, reaper=reaper)
+    old = tmp_path / 'seg0.ts'
+    old.write_bytes(b'ts')
+
+    live.add_segment('seg0.ts', 6.0, path=str(old))
+    live.add_segment('seg1.ts', 6.0)
+
+    assert reaper.reap() == 0
+    assert old.exists()
+    # Kept for its own duration plus the window still being served
+    assert reaper.reap(time.monotonic() + 12.5) == 1
+    assert not old.exists()
+    reaper.close()
+
+
+def test_reaper_close_with_flush_deletes_pending_files(tmp_path):
+    reaper = SegmentReaper(interval=60)
+    path = tmp_path / 'seg0.ts'
+    path.write_bytes(b'ts')
+    reaper.schedule(str(path), delay=3600)
+
+    reaper.close(flush=True)
+
+    assert not path.exists()
+    assert reaper.pending() == 0
@@ -0,0 +1,18 @@
+import os
+import stat
+
+from metrics import Registry, write_textfile
+
+
+def test_write_textfile_replaces_the_file_atomically(tmp_path):
+    registry = Registry()
+    cues = registry.counter('scte35_cues', 'Cues encoded')
+    path = tmp_path / 'scte35.prom'
+
+    write_textfile(str(path), registry)
+    cues.inc(3)
+    write_textfile(str(path), registry)
+
+    assert 'scte35_cues_total 3\n' in path.read_text()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert os.listdir(tmp_path) == ['scte35.prom']
@@ -0,0 +1,51 @@
+from mpegts import SectionAssembler, TSHealthMonitor
+
+
+def ts_packet(pid, payload, cc, start=False):
+    header = bytes([0x47, (0x40 if start else 0) | (pid >> 8), pid & 0xFF, 0x10 | (cc & 0x0F)])
+    return header + payload + b'\xff' * (184 - len(payload))
+
+
+def test_section_split_across_packets_is_reassembled():
+    # section_length 300, so the 303-byte section needs a second packet
+    section = bytes([0xFC, 0x31, 0x2C]) + bytes(i & 0x7F for i in range(300))
+    assembler = SectionAssembler()
+
+    first = assembler.push(ts_packet(0x1F4, b'\x00' + section[:183], 0, start=True))
+    second = assembler.push(ts_packet(0x1F4, section[183:], 1))
+
+    assert first == []
+    assert second == [section]
+
+
+def test_two_sections_in_one_packet():
+    a = bytes([0x00, 0xB0, 0x02, 0xAA, 0xBB])
+    b = bytes([0x02, 0xB0, 0x01, 0xCC])
+    assembler = SectionAssembler()
+
+    assert assembler.push(ts_packet(0x1000, b'\x00' + a + b, 0, start=True)) == [a, b]
+
+
+def test_continuity_counter_gap_is_counted():
+    monitor = TSHealthMonitor('test')
+
+    monitor.feed(b''.join(ts_packet(0x100, b'', cc) for cc in (0, 1, 2, 4, 5)))
+
+    assert monitor.counters['cc_errors'] == 1
+
+
+def test_single_duplicate_packet_is_not_a_cc_error():
+    monitor = TSHealthMonitor('test')
+
+    monitor.feed(b''.join(ts_packet(0x100, b'', cc) for cc in (0, 1, 1, 2)))
+
+    assert monitor.counters['cc_errors'] == 0
+
+
+def test_continuity_is_checked_across_chunks():
+    monitor = TSHealthMonitor('test')
+
+    monitor.feed(ts_packet(0x100, b'', 14) + ts_packet(0x100, b'', 15))
+    monitor.feed(ts_packet(0x100, b'', 0) + ts_packet(0x100, b'', 2))
+
+    assert monitor.counters['cc_errors'] == 1
@@ -0,0 +1,38 @@
+import pytest
+
+from cue_encoder import CueEncoder
+from schedule_stream import read_schedule
+from toolkit import load_script
+
+
+def test_read_schedule_uses_the_first_key_present(tmp_path):
+    path = tmp_path / 'cues.json'
+    path.write_text('{"cues": [{"id": "ad1", "duration": 30}]}')
+
+    assert list(read_schedule(str(path), key=('ad_breaks', 'cues'))) == [{'id': 'ad1', 'duration': 30}]
+    assert list(read_schedule(str(path))) == []
+
+
+def test_load_cue_schedule_streams_ndjson(tmp_path):
+    path = tmp_path / 'cues.ndjson'
+    path.write_text('{"id": "ad1", "duration": 30}\nnot json\n')
+    entries = load_script('scte35-tools').SCTE35Tools().load_cue_schedule(str(path))
+
+    # The first entry is yielded before the bad line further down is read
+    assert next(entries) == {'id': 'ad1', 'duration': 30}
+    with pytest.raises(ValueError, match='Line 2'):
+        next(entries)
+
+
+def test_cue_batch_from_csv_schedule(tmp_path):
+    path = tmp_path / 'cues.csv'
+    path.write_text('id,duration,type,pts_time\nad1,30,splice_insert,\nad2,15,time_signal,10\n')
+    output = tmp_path / 'cues.bin'
+    tools = load_script('scte35-tools').SCTE35Tools()
+
+    assert tools.create_cue_batch(tools.load_cue_schedule(str(path)), str(output)) == 2
+
+    data = output.read_bytes()
+    first = CueEncoder().splice_insert(1, 30.0)
+    assert data[:4] == len(first).to_bytes(4, 'big')
+    assert data[4:4 + len(first)] == first
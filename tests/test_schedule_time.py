@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from schedule_time import ScheduledTimeParser
+
+REFERENCE = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def test_parses_iso_with_z_and_fraction():
+    parser = ScheduledTimeParser(REFERENCE)
+
+    assert parser.parse('2026-10-18T12:30:00.25Z') == datetime(2026, 10, 18, 12, 30, 0, 250000, timezone.utc)
+
+
+def test_parses_iso_with_offset():
+    parser = ScheduledTimeParser(REFERENCE)
+
+    moment = parser.parse('2026-10-18T14:30:00+02:00')
+
+    assert moment == datetime(2026, 10, 18, 12, 30, tzinfo=timezone.utc)
+
+
+def test_naive_time_uses_default_tz():
+    parser = ScheduledTimeParser(REFERENCE, default_tz=timezone(timedelta(hours=-5)))
+
+    assert parser.parse('2026-10-18 07:00') == datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def test_relative_seconds_count_from_reference_time():
+    parser = ScheduledTimeParser(REFERENCE)
+
+    assert parser.parse('90') == REFERENCE + timedelta(seconds=90)
+    assert parser.parse(12.5) == REFERENCE + timedelta(seconds=12.5)
+
+
+def test_matching_format_moves_to_the_front():
+    parser = ScheduledTimeParser(REFERENCE)
+
+    parser.parse('30')
+
+    assert parser._parsers[0] == parser._parse_relative
+
+
+def test_rejects_unrecognized_time():
+    with pytest.raises(ValueError, match='Unrecognized scheduled time'):
+        ScheduledTimeParser(REFERENCE).parse('next tuesday')
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+from test_scte35_tools import SCTE35_PID, write_ts
+from toolkit import load_script
+
+FFPROBE_OUTPUT = {
+    'programs': [{'program_id': 1, 'pmt_pid': 4096, 'pcr_pid': 256,
+                  'streams': [{'id': '0x100'}, {'id': '0x101'}, {'id': '0x1f4'}]}],
+    'streams': [
+        {'index': 0, 'id': '0x100', 'codec_type': 'video', 'codec_name': 'h264', 'profile': 'High',
+         'width': 1920, 'height': 1080, 'avg_frame_rate': '30000/1001', 'codec_tag_string': '[27][0][0][0]', 'codec_tag': '0x001b'},
+        {'index': 1, 'id': '0x101', 'codec_type': 'audio', 'codec_name': 'aac', 'sample_rate': '48000',
+         'channel_layout': 'stereo', 'codec_tag_string': '[15][0][0][0]', 'codec_tag': '0x000f'},
+        {'index': 2, 'id': '0x1f4', 'codec_type': 'data', 'codec_name': 'scte_35',
+         'codec_tag_string': '[134][0][0][0]', 'codec_tag': '0x0086'}
+    ]
+}
+
+
+class FakeProbe:
+    """Stands in for analyze_native, tracking how many probes run at once"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, analyzer):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return {'input_url': analyzer.input_url, 'streams': []}
+
+
+def service_with(monkeypatch, probe, **kwargs):
+    module = load_script('scte35-analyzer')
+    monkeypatch.setattr(module.SCTE35Analyzer, 'analyze_native', lambda analyzer: probe(analyzer))
+    return module.SCTE35AnalyzerService(backend='native', **kwargs)
+
+
+def test_second_request_is_served_from_cache(monkeypatch):
+    probe = FakeProbe()
+    service = service_with(monkeypatch, probe)
+
+    async def run():
+        first = await service.analyze('udp://239.0.0.1:1234')
+        second = await service.analyze('udp://239.0.0.1:1234')
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first is second
+    assert probe.calls == 1
+    assert (service.stats['probes'], service.stats['cache_hits']) == (1, 1)
+
+
+def test_probes_are_limited_to_the_worker_count(monkeypatch):
+    probe = FakeProbe(delay=0.05)
+    service = service_with(monkeypatch, probe, workers=2)
+
+    results = asyncio.run(service.analyze_many([f'udp://239.0.0.{i}:1234' for i in range(6)]))
+
+    assert len(results) == 6
+    assert probe.calls == 6
+    assert probe.peak == 2
+
+
+def test_native_probe_timeout_is_counted(monkeypatch):
+    service = service_with(monkeypatch, FakeProbe(delay=0.3), timeout=0.05)
+
+    result = asyncio.run(service.analyze('udp://239.0.0.1:1234'))
+
+    assert 'timed out' in result['error']
+    assert service.stats['timeouts'] == 1
+    assert service.stats['probes'] == 0
+
+
+
+def test_ffprobe_json_is_sorted_into_stream_lists():
+    analyzer = load_script('scte35-analyzer').SCTE35Analyzer('udp://239.0.0.1:1234')
+
+    info = analyzer.parse_probe_output(json.dumps(FFPROBE_OUTPUT), '')
+
+    assert info['programs'] == [{'program_id': 1, 'pmt_pid': 4096, 'pcr_pid': 256, 'stream_pids': [0x100, 0x101, 0x1F4]}]
+    assert info['scte35_detected']
+    assert [s['pid'] for s in info['scte35_streams']] == [0x1F4]
+    assert info['video_streams'][0]['details'] == 'h264, High, 1920x1080, 30000/1001 fps'
+    assert info['audio_streams'][0]['details'] == 'aac, 48000 Hz, stereo'
+
+
+def test_service_runs_ffprobe_with_the_profile_limits(monkeypatch, tmp_path):
+    # A stand-in ffprobe on PATH that records its arguments and prints canned JSON
+    (tmp_path / 'probe.json').write_text(json.dumps(FFPROBE_OUTPUT))
+    ffprobe = tmp_path / 'ffprobe'
+    ffprobe.write_text(f'#!/bin/sh\necho "$@" > {tmp_path}/args\ncat {tmp_path}/probe.json\n')
+    ffprobe.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    module = load_script('scte35-analyzer')
+    service = module.SCTE35AnalyzerService(backend='ffprobe', profile='fast')
+
+    info = asyncio.run(service.analyze('udp://239.0.0.1:1234'))
+
+    profile = module.PROBE_PROFILES['fast']
+    args = (tmp_path / 'args').read_text().split()
+    assert args[args.index('-probesize') + 1] == str(profile['probesize'])
+    assert args[-1] == 'udp://239.0.0.1:1234'
+    assert info['backend'] == 'ffprobe'
+    assert [s['pid'] for s in info['scte35_streams']] == [0x1F4]
+
+
+def test_native_backend_reports_pmt_streams_and_first_cues(tmp_path):
+    path = tmp_path / 'capture.ts'
+    write_ts(path, [10.0, 70.0])
+    analyzer = load_script('scte35-analyzer').SCTE35Analyzer(str(path), backend='native')
+
+    info = analyzer.analyze_native(max_cues=1)
+
+    assert info['programs'] == [{'program_id': 1, 'pmt_pid': 0x1000, 'pcr_pid': 0x100, 'stream_pids': [0x100, SCTE35_PID]}]
+    assert [s['pid'] for s in info['video_streams']] == [0x100]
+    assert [s['pid'] for s in info['scte35_streams']] == [SCTE35_PID]
+    assert [(c['pid'], c['splice_event_id'], c['pts_time']) for c in info['first_cues']] == [(SCTE35_PID, 1, 10.0)]
+    assert info['capture']['packets'] == 4
+
+
+def test_native_backend_captures_a_udp_feed(tmp_path):
+    path = tmp_path / 'capture.ts'
+    write_ts(path, [10.0])
+    data = path.read_bytes()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    analyzer = load_script('scte35-analyzer').SCTE35Analyzer(f'udp://127.0.0.1:{port}', backend='native', capture_bytes=len(data))
+
+    def send():
+        time.sleep(0.2)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            sender.sendto(data, ('127.0.0.1', port))
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    info = analyzer.analyze_native()
+    sender.join()
+
+    assert info['capture']['bytes'] == len(data)
+    assert info['scte35_detected']
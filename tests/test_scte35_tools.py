@@ -0,0 +1,86 @@
+import base64
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from cue_encoder import CueEncoder
+from toolkit import load_script
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'scripts' / 'scte35-tools.py'
+SCTE35_PID = 0x1F4
+
+
+def ts_packet(pid, payload, cc):
+    header = bytes([0x47, 0x40 | (pid >> 8), pid & 0xFF, 0x10 | (cc & 0x0F)])
+    return header + b'\x00' + payload + b'\xff' * (183 - len(payload))
+
+
+def psi_section(table_id, body):
+    # CRC left as zeros; neither threefive nor the scanner checks it on PAT/PMT
+    length = 5 + len(body) + 4
+    return bytes([table_id, 0xB0 | (length >> 8), length & 0xFF, 0x00, 0x01, 0xC1, 0x00, 0x00]) + body + b'\x00' * 4
+
+
+def write_ts(path, pts_times):
+    """Write a PAT, a PMT with H.264 and SCTE-35 PIDs, and one splice_insert packet per pts_time"""
+    pat = psi_section(0x00, bytes([0x00, 0x01, 0xF0, 0x00]))
+    streams = bytes([0x1B, 0xE1, 0x00, 0xF0, 0x00, 0x86, 0xE0 | (SCTE35_PID >> 8), SCTE35_PID & 0xFF, 0xF0, 0x00])
+    pmt = psi_section(0x02, bytes([0xE1, 0x00, 0xF0, 0x00]) + streams)
+    encoder = CueEncoder()
+    packets = [ts_packet(0x0000, pat, 0), ts_packet(0x1000, pmt, 0)]
+    packets += [ts_packet(SCTE35_PID, encoder.splice_insert(i + 1, 30, pts), i) for i, pts in enumerate(pts_times)]
+    Path(path).write_bytes(b''.join(packets))
+
+
+def run_ndjson(*args):
+    result = subprocess.run([sys.executable, str(SCRIPT), *args, '--format', 'ndjson', '--output', '-'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+def test_parse_ts_ndjson_writes_one_compact_record_per_cue(tmp_path):
+    path = tmp_path / 'capture.ts'
+    write_ts(path, [10.0, 70.0])
+
+    records = run_ndjson('parse_ts', str(path))
+
+    assert [(r['splice_event_id'], r['pts_time'], r['pid']) for r in records] == [(1, 10.0, SCTE35_PID), (2, 70.0, SCTE35_PID)]
+    assert all('cue' not in record for record in records)
+
+
+def test_parse_ts_ndjson_with_scanner_numbers_packets(tmp_path):
+    path = tmp_path / 'capture.ts'
+    write_ts(path, [10.0])
+
+    [record] = run_ndjson('parse_ts', str(path), '--scanner')
+
+    assert (record['packet_number'], record['duration']) == (2, 30.0)
+
+
+def test_parse_hls_ndjson_keeps_stdout_to_records(tmp_path):
+    cue = base64.b64encode(CueEncoder().splice_insert(1, 30, 10.0)).decode('ascii')
+    path = tmp_path / 'stream.m3u8'
+    path.write_text(
+        '#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXTINF:6.000,\nseg0.ts\n'
+        f'#EXT-X-SCTE35:CUE="{cue}"\n#EXTINF:6.000,\nseg1.ts\n#EXT-X-ENDLIST\n'
+    )
+
+    [record] = run_ndjson('parse_hls', str(path))
+
+    assert record['segment'].endswith('seg1.ts')
+    assert record['scte35_data'] == cue
+
+
+def test_parse_batch_merges_a_directory_by_file_then_pts(tmp_path):
+    write_ts(tmp_path / 'b.ts', [50.0])
+    (tmp_path / 'day').mkdir()
+    write_ts(tmp_path / 'day' / 'a.ts', [30.0, 20.0])
+    (tmp_path / 'notes.txt').write_text('not a capture')
+    tools = load_script('scte35-tools').SCTE35Tools()
+
+    cues, summary = tools.parse_scte35_batch(str(tmp_path), workers=2, scanner=True)
+
+    assert [(Path(c['file']).name, c['pts_time']) for c in cues] == [('b.ts', 50.0), ('a.ts', 20.0), ('a.ts', 30.0)]
+    assert (summary['files'], summary['cues'], summary['workers']) == (2, 3, 2)
+    assert summary['bytes'] == 188 * 7
@@ -0,0 +1,89 @@
+import asyncio
+import base64
+import json
+
+from cue_encoder import CueEncoder
+from toolkit import load_script
+
+PLAYLIST = '#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXTINF:6.000,\nseg0.ts\n#EXTINF:6.000,\nseg1.ts\n#EXT-X-ENDLIST\n'
+
+
+class BufferWriter:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def serve(worker, payload):
+    """Feed one request stream through the worker and return everything it wrote"""
+    async def run():
+        worker._start_pool()
+        reader = asyncio.StreamReader()
+        reader.feed_data(payload)
+        reader.feed_eof()
+        writer = BufferWriter()
+        try:
+            await worker.serve_stream(reader, writer)
+        finally:
+            worker.pool.shutdown(wait=True)
+        return bytes(writer.data)
+
+    return asyncio.run(run())
+
+
+def test_binary_response_carries_cue_bytes_as_an_attachment():
+    worker = load_script('scte35-worker').SCTE35Worker(workers=1)
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': 'SCTE35Tools.encode_splice_insert', 'params': ['ad7', 30],
+               'binary': True}
+
+    output = serve(worker, json.dumps(request).encode() + b'\n')
+
+    line, _, attachment = output.partition(b'\n')
+    response = json.loads(line)
+    assert response['result'] == {'$binary': 0}
+    assert response['attachments'] == [len(attachment)]
+    assert attachment == CueEncoder().splice_insert(7, 30)
+
+
+def test_base64_response_without_binary_flag():
+    worker = load_script('scte35-worker').SCTE35Worker(workers=1)
+    request = {'jsonrpc': '2.0', 'id': 'a', 'method': 'SCTE35Tools.encode_time_signal', 'params': ['ad1', 30, '0x1', 'P', 5.0]}
+
+    response = json.loads(serve(worker, json.dumps(request).encode() + b'\n'))
+
+    assert response['id'] == 'a'
+    assert base64.b64decode(response['result']) == CueEncoder().time_signal(1, 30, 5.0)
+
+
+def test_inject_into_hls_decodes_attached_and_base64_cues(tmp_path):
+    source = tmp_path / 'stream.m3u8'
+    source.write_text(PLAYLIST)
+    encoder = CueEncoder()
+    attached = encoder.splice_insert(1, 6.0, 100.0)
+    inline = base64.b64encode(encoder.time_signal(2, 0, 106.0)).decode('ascii')
+    request = {'jsonrpc': '2.0', 'id': 2, 'method': 'SCTE35Tools.inject_scte35_into_hls',
+               'params': [str(source), [{'$binary': 0}, inline], None, 100.0], 'attachments': [len(attached)]}
+    worker = load_script('scte35-worker').SCTE35Worker(workers=1)
+
+    response = json.loads(serve(worker, json.dumps(request).encode() + b'\n' + attached))
+
+    content = open(response['result']).read()
+    assert '#EXT-X-CUE-OUT:6\n#EXTINF:6.000,\nseg0.ts' in content
+    assert f'#EXT-X-CUE-IN\n#EXT-X-SCTE35:CUE="{inline}"\n#EXTINF:6.000,\nseg1.ts' in content
+
+
+def test_start_segmentation_is_not_exposed():
+    worker = load_script('scte35-worker').SCTE35Worker(workers=1)
+    request = {'jsonrpc': '2.0', 'id': 3, 'method': 'X9k3Segmenter.start_segmentation', 'params': []}
+
+    response = json.loads(serve(worker, json.dumps(request).encode() + b'\n'))
+
+    assert response['error']['code'] == -32601
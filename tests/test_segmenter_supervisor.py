@@ -0,0 +1,91 @@
+import sys
+import time
+
+from metrics import Registry
+from segmenter_supervisor import RESTART_BACKOFF_MIN, STABLE_AFTER, SegmenterSupervisor
+
+CONFIG = {'output': 'out', 'streams': [{'bitrate': 800}, {'bitrate': 3000}]}
+
+
+def supervisor_for(tmp_path, code, latencies=None):
+    """A supervisor whose workers run code; latencies, if given, replace the disk probe one poll at a time"""
+    supervisor = SegmenterSupervisor(lambda config_file: [sys.executable, '-c', code], tmp_path / 'state',
+                                     cpu_sets=[], registry=Registry())
+    if latencies is not None:
+        def probe():
+            supervisor.disk_latency = latencies.pop(0)
+            return supervisor.disk_latency
+        supervisor.probe_disk_latency = probe
+    supervisor.add_channel('news', dict(CONFIG, output=str(tmp_path / 'out')))
+    return supervisor
+
+
+def wait_for_exit(workers):
+    for worker in workers:
+        worker.process.wait(10)
+
+
+def process_state(worker):
+    with open(f'/proc/{worker.process.pid}/stat') as f:
+        return f.read().rsplit(')', 1)[1].split()[0]
+
+
+def wait_for_state(worker, states):
+    deadline = time.monotonic() + 5
+    while process_state(worker) not in states and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return process_state(worker)
+
+
+def test_exited_worker_restarts_with_doubling_backoff(tmp_path):
+    supervisor = supervisor_for(tmp_path, 'raise SystemExit(3)', latencies=[0.0] * 5)
+    worker = supervisor.workers[0]
+
+    supervisor.poll(now=0.0)
+    wait_for_exit(supervisor.workers)
+    supervisor.poll(now=0.1)
+    assert (worker.restarts, worker.process, worker.next_start) == (1, None, 0.1 + RESTART_BACKOFF_MIN)
+
+    supervisor.poll(now=0.5)
+    assert worker.process is None
+
+    supervisor.poll(now=1.2)
+    wait_for_exit(supervisor.workers)
+    supervisor.poll(now=1.3)
+    assert worker.restarts == 2
+    assert worker.next_start == 1.3 + 2 * RESTART_BACKOFF_MIN
+
+
+def test_backoff_resets_once_a_worker_stays_up(tmp_path):
+    supervisor = supervisor_for(tmp_path, 'import time; time.sleep(30)', latencies=[0.0] * 2)
+    worker = supervisor.workers[0]
+    worker.backoff = 16.0
+    try:
+        supervisor.poll(now=0.0)
+        supervisor.poll(now=STABLE_AFTER)
+
+        assert worker.backoff == RESTART_BACKOFF_MIN
+    finally:
+        supervisor.stop()
+
+
+def test_high_disk_latency_pauses_the_top_rendition_until_it_recovers(tmp_path):
+    supervisor = supervisor_for(tmp_path, 'import time; time.sleep(30)', latencies=[0.0, 1.0, 1.0, 0.0])
+    low, high = supervisor.workers
+    try:
+        supervisor.poll(now=0.0)
+
+        supervisor.poll(now=1.0)
+        assert (high.paused, low.paused) == (True, False)
+        assert wait_for_state(high, 'T') == 'T'
+
+        # The last writing rendition of a channel is never paused
+        supervisor.poll(now=2.0)
+        assert not low.paused
+
+        supervisor.poll(now=3.0)
+        assert not high.paused
+        assert wait_for_state(high, 'SR') in 'SR'
+        assert supervisor.status()['paused'] == 0
+    finally:
+        supervisor.stop()
@@ -0,0 +1,86 @@
+import os
+
+from variant_probe import VariantProber, parse_adts_codecs, parse_h264_sps, parse_hevc_sps, probe_segment
+
+# SPS NAL units as written by x264 (1920x1080 High@4.0, cropped from 1088) and x265 (1280x720 Main@3.1)
+H264_SPS = bytes.fromhex('67640028acd940780227e584000003000400000300f03c60c658')
+HEVC_SPS = bytes.fromhex('42010101600000030090000003000003005da00280802d165959a4932b9a020000030002000003003c10')
+
+# ADTS header of an AAC-LC frame, 44.1 kHz stereo
+ADTS_FRAME = bytes.fromhex('fff150802e7ffc') + b'\x00' * 16
+
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+
+
+def ts_packet(pid, payload, cc, start):
+    header = bytes([0x47, (0x40 if start else 0) | (pid >> 8), pid & 0xFF, 0x10 | (cc & 0x0F)])
+    return header + payload + b'\xff' * (184 - len(payload))
+
+
+def psi_section(table_id, body):
+    length = 5 + len(body) + 4
+    return b'\x00' + bytes([table_id, 0xB0 | (length >> 8), length & 0xFF, 0x00, 0x01, 0xC1, 0x00, 0x00]) + body + b'\x00' * 4
+
+
+def pes(stream_id, pts, data):
+    pts_bytes = bytes([
+        0x21 | ((pts >> 29) & 0x0E), (pts >> 22) & 0xFF, ((pts >> 14) & 0xFE) | 1, (pts >> 7) & 0xFF, ((pts << 1) & 0xFE) | 1
+    ])
+    return bytes([0x00, 0x00, 0x01, stream_id, 0x00, 0x00, 0x80, 0x80, 0x05]) + pts_bytes + data
+
+
+def write_segment(path, video_pts=(0, 9009, 3003, 6006)):
+    """One segment with an H.264 PES per PTS (SPS in the first) and one AAC PES"""
+    pat = psi_section(0x00, bytes([0x00, 0x01, 0xF0, 0x00]))
+    pmt = psi_section(0x02, bytes([0xE1, 0x00, 0xF0, 0x00, 0x1B, 0xE1, 0x00, 0xF0, 0x00, 0x0F, 0xE1, 0x01, 0xF0, 0x00]))
+    packets = [ts_packet(0x0000, pat, 0, True), ts_packet(0x1000, pmt, 0, True)]
+    for cc, pts in enumerate(video_pts):
+        nal = b'\x00\x00\x00\x01' + (H264_SPS if cc == 0 else b'\x41\x9a')
+        packets.append(ts_packet(VIDEO_PID, pes(0xE0, pts, nal), cc, True))
+    packets.append(ts_packet(AUDIO_PID, pes(0xC0, 0, ADTS_FRAME), 0, True))
+    path.write_bytes(b''.join(packets))
+
+
+def test_h264_sps_with_cropping():
+    assert parse_h264_sps(H264_SPS) == ('avc1.640028', 1920, 1080)
+
+
+def test_hevc_sps():
+    assert parse_hevc_sps(HEVC_SPS) == ('hvc1.1.6.L93.90', 1280, 720)
+
+
+def test_adts_codecs():
+    assert parse_adts_codecs(b'\x00\x00' + ADTS_FRAME) == 'mp4a.40.2'
+    assert parse_adts_codecs(b'\x00' * 8) is None
+
+
+def test_probe_segment_reads_codecs_resolution_and_frame_rate(tmp_path):
+    path = tmp_path / 'seg0.ts'
+    write_segment(path)
+
+    # PTS steps of 3003 in presentation order, although decode order has B-frames
+    assert probe_segment(path) == {'codecs': ['avc1.640028', 'mp4a.40.2'], 'resolution': '1920x1080', 'frame_rate': 29.97}
+
+
+def test_second_measure_is_served_from_the_segment_cache(tmp_path):
+    for i in range(2):
+        write_segment(tmp_path / f'seg{i}.ts')
+    playlist = tmp_path / 'index.m3u8'
+    playlist.write_text('#EXTM3U\n#EXT-X-TARGETDURATION:2\n#EXTINF:2.000,\nseg0.ts\n#EXTINF:1.000,\nseg1.ts\n')
+    size = os.path.getsize(tmp_path / 'seg0.ts')
+    prober = VariantProber(cache_file=str(tmp_path / 'probe-cache.json'))
+
+    first = prober.measure(str(playlist), uri='720p/index.m3u8')
+    second = prober.measure(str(playlist), uri='720p/index.m3u8')
+
+    assert first == second == {
+        'uri': '720p/index.m3u8', 'bandwidth': size * 8, 'average_bandwidth': -(-size * 16 // 3),
+        'codecs': 'avc1.640028,mp4a.40.2', 'resolution': '1920x1080', 'frame_rate': 29.97
+    }
+    assert (prober.misses, prober.hits) == (2, 2)
+
+    prober.save()
+    reloaded = VariantProber(cache_file=str(tmp_path / 'probe-cache.json'))
+    reloaded.measure(str(playlist))
+    assert (reloaded.misses, reloaded.hits) == (0, 2)